@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# Token-by-token decoding throughput of the PyTorch Mamba/Mamba2 mixers,
+# `static_decode_step` against the previous decoding path (`static_decode=False`).
+# $ python benchmarks/benchmark_recurrent_decode.py --model mamba2 --device cpu
+
+import argparse
+import time
+
+import torch
+
+from fla.models.mamba.configuration_mamba import MambaConfig
+from fla.models.mamba.modeling_mamba import MambaCache, MambaMixer
+from fla.models.mamba2.configuration_mamba2 import Mamba2Config
+from fla.models.mamba2.modeling_mamba2 import Mamba2Cache, Mamba2Mixer
+
+
+def sync(device):
+    if device.type == 'cuda':
+        torch.cuda.synchronize()
+
+
+@torch.no_grad()
+def benchmark(mixer, cache, forward, hidden_size, batch_size, prompt_len, steps, warmup, device, dtype):
+    x = torch.randn(batch_size, prompt_len, hidden_size, device=device, dtype=dtype)
+    forward(mixer, x, cache)
+    cache.seqlen_offset = prompt_len
+    x = torch.randn(batch_size, 1, hidden_size, device=device, dtype=dtype)
+    for _ in range(warmup):
+        forward(mixer, x, cache)
+        cache.seqlen_offset += 1
+    sync(device)
+    start = time.perf_counter()
+    for _ in range(steps):
+        forward(mixer, x, cache)
+        cache.seqlen_offset += 1
+    sync(device)
+    return batch_size * steps / (time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recurrent decoding benchmarking")
+    parser.add_argument("--model", type=str, default="mamba2", choices=["mamba", "mamba2"])
+    parser.add_argument("--hidden_size", type=int, default=1024)
+    parser.add_argument("--batch_sizes", type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument("--prompt_len", type=int, default=16)
+    parser.add_argument("--steps", type=int, default=256)
+    parser.add_argument("--warmup", type=int, default=16)
+    parser.add_argument("--device", type=str, default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--dtype", type=str, default="float32")
+    args = parser.parse_args()
+
+    device, dtype = torch.device(args.device), getattr(torch, args.dtype)
+    torch.manual_seed(0)
+    if args.model == "mamba":
+        config_cls, mixer_cls, cache_cls = MambaConfig, MambaMixer, MambaCache
+        kwargs = dict(hidden_size=args.hidden_size)
+
+        def forward(mixer, x, cache):
+            return mixer.slow_forward(x, cache)
+    else:
+        config_cls, mixer_cls, cache_cls = Mamba2Config, Mamba2Mixer, Mamba2Cache
+        kwargs = dict(hidden_size=args.hidden_size, num_heads=args.hidden_size // 32, n_groups=1)
+
+        def forward(mixer, x, cache):
+            return mixer.torch_forward(x, cache)
+
+    mixers = {}
+    for static_decode in (False, True):
+        config = config_cls(num_hidden_layers=1, static_decode=static_decode, **kwargs)
+        mixers[static_decode] = mixer_cls(config, layer_idx=0).to(device=device, dtype=dtype).eval()
+    mixers[True].load_state_dict(mixers[False].state_dict())
+
+    print(f"{args.model}, hidden_size {args.hidden_size}, {device}, {dtype}")
+    print(f"{'batch_size':>12}{'previous (tok/s)':>20}{'static (tok/s)':>20}{'speedup':>10}")
+    for batch_size in args.batch_sizes:
+        results = [
+            benchmark(mixers[static_decode], cache_cls(config, batch_size, dtype=dtype, device=device), forward,
+                      args.hidden_size, batch_size, args.prompt_len, args.steps, args.warmup, device, dtype)
+            for static_decode in (False, True)
+        ]
+        print(f"{batch_size:>12}{results[0]:>20.1f}{results[1]:>20.1f}{results[1] / results[0]:>10.2f}")
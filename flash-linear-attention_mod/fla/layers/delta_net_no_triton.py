@@ -12,9 +12,8 @@ import torch.nn as nn
 from torch.nn.modules.normalization import RMSNorm # requires pytorch 2.4
 from einops import rearrange
 from fla.modules import FusedRMSNormSwishGate, ShortConvolution
-from fla.ops.delta_rule import (chunk_delta_rule, fused_chunk_delta_rule,
-                                fused_recurrent_delta_rule, delta_rule_recurrence,
-                                delta_rule_chunkwise, gla_mod_recurrent, gla_mod_chunk)
+from fla.modules.convolution import fused_short_convolution
+from fla.ops.registry import op_registry, resolve_op
 from torch.nn import functional as F
 
 if TYPE_CHECKING:
@@ -105,7 +104,10 @@ class DeltaNetNoTriton(nn.Module):
 
         self.silu = nn.SiLU()
 
-        assert mode in ['chunk', 'fused_chunk', 'fused_recurrent', 'naive', 'naive_chunk', 'gla_mod_recurrent', 'gla_mod_chunk'], f"Not supported mode `{mode}`."
+        # `auto` picks the first delta rule kernel available for the device, dtype and shapes of the inputs,
+        # an explicit mode that is not available falls back to the next one in `fla.ops.registry.op_fallback_order`
+        self.op_family = 'gla_mod' if mode.startswith('gla_mod') else 'delta_rule'
+        assert mode == 'auto' or mode in op_registry[self.op_family], f"Not supported mode `{mode}`."
         assert self.key_dim % num_heads == 0, f"key dim must be divisible by num_heads of {num_heads}"
         assert self.value_dim % num_heads == 0, f"value dim must be divisible by num_heads of {num_heads}"
 
@@ -157,8 +159,6 @@ class DeltaNetNoTriton(nn.Module):
             output_attentions: Optional[bool] = False,
             **kwargs
     ) -> Tuple[torch.Tensor, Optional[torch.Tensor], Optional[Cache]]:
-        mode = self.mode
-
         if self.norm_first:
             hidden_states = self.norm(hidden_states)
 
@@ -169,15 +169,14 @@ class DeltaNetNoTriton(nn.Module):
                 attention_mask = attention_mask[:, -1:]
 
         if self.use_short_conv:
-            conv_state_q = last_state[0] if use_cache else None
-            conv_state_k = last_state[1] if use_cache else None
-            conv_state_v = last_state[2] if use_cache else None
+            # one ring buffer for the q/k/v convolutions, see `init_state`
+            conv_state = last_state[0] if use_cache else None
+            conv_position = last_state[1] if use_cache else None
             k = self.k_proj(hidden_states)
             v = self.v_proj(hidden_states)
             q = self.q_proj(hidden_states)
-            q = self.q_conv1d(q, attention_mask, conv_state_q)
-            k = self.k_conv1d(k, attention_mask, conv_state_k)
-            v = self.v_conv1d(v, attention_mask, conv_state_v)
+            q, k, v = fused_short_convolution((self.q_conv1d, self.k_conv1d, self.v_conv1d), (q, k, v),
+                                              attention_mask, conv_state, conv_position)
         else:
             q = (self.q_proj(hidden_states))
             k = (self.k_proj(hidden_states))
@@ -219,29 +218,13 @@ class DeltaNetNoTriton(nn.Module):
         state = past_key_values[self.layer_idx][-1] if use_cache else None
 
 
-        if mode == 'naive':
-            o, recurrent_state = delta_rule_recurrence(q, k, v, beta, state, output_final_state=use_cache)
-        elif mode == 'naive_chunk':
-            o, recurrent_state = delta_rule_chunkwise(q, k, v, beta, self.chunk_size, state, output_final_state=use_cache)
-        elif mode == 'gla_mod_recurrent':
-            o, recurrent_state = gla_mod_recurrent(q, k, v, beta, state, output_final_state=use_cache)
-        elif mode == 'gla_mod_chunk':
-            o, recurrent_state = gla_mod_chunk(q, k, v, beta, self.chunk_size, state, output_final_state=use_cache)
-        elif mode == 'fused_recurrent':
-            o, recurrent_state = fused_recurrent_delta_rule(q, k, v, beta, state, output_final_state=use_cache)
-        elif mode == 'fused_chunk':
-            assert self.chunk_size in [16, 32, 64]
-            o, recurrent_state = fused_chunk_delta_rule(q, k, v, beta, self.chunk_size, state,
-                                                        output_final_state=use_cache)
-        elif mode == 'chunk':
-            assert self.chunk_size in [16, 32, 64]
-            o, recurrent_state = chunk_delta_rule(q, k, v, beta, self.chunk_size, state, output_final_state=use_cache)
-        else:
-            raise NotImplementedError(f"Not supported mode `{mode}`.")
+        _, op = resolve_op(self.op_family, self.mode, q.device, q.dtype, head_dim=self.head_qk_dim,
+                           chunk_size=self.chunk_size, decoding=q.shape[2] == 1)
+        o, recurrent_state = op(q, k, v, beta, self.chunk_size, state, use_cache)
 
         if past_key_values is not None:
             if self.use_short_conv:
-                state = (conv_state_q, conv_state_k, conv_state_v, recurrent_state)
+                state = (conv_state, conv_position, recurrent_state)
             else:
                 state = (recurrent_state,)
             past_key_values.update(state, self.layer_idx)
@@ -263,9 +246,8 @@ class DeltaNetNoTriton(nn.Module):
         param = next(self.parameters())
         state = tuple()
         if self.use_short_conv:
-            # for q/k/v each
-            state += (param.new_zeros(batch_size, self.key_dim, self.conv_size),
-                      param.new_zeros(batch_size, self.key_dim, self.conv_size),
-                      param.new_zeros(batch_size, self.value_dim, self.conv_size))
+            # the ring buffer of the concatenated q/k/v channels and the number of tokens seen
+            state += (param.new_zeros(batch_size, 2 * self.key_dim + self.value_dim, self.conv_size),
+                      param.new_zeros(batch_size, dtype=torch.long))
         state += (param.new_zeros(batch_size, self.num_heads, self.head_qk_dim, self.head_v_dim),)
         return state
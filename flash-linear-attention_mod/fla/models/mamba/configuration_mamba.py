@@ -81,6 +81,9 @@ class MambaConfig(PretrainedConfig):
             Whether or not to rescale `out_proj` weights when initializing. Default: `False`.
         use_cache (`bool`, *optional*):
             Whether or not the cache should be used. Default: `True`.
+        static_decode (`bool`, *optional*):
+            Whether the PyTorch implementation decodes with `MambaMixer.static_decode_step`, which updates the cache
+            strictly inplace and keeps the conv states as ring buffers. Default: `True`.
 
 
     Example:
@@ -125,6 +128,7 @@ class MambaConfig(PretrainedConfig):
         time_step_floor: float = 1e-4,
         rescale_prenorm_residual: bool = False,
         use_cache: bool = True,
+        static_decode: bool = True,
         fuse_norm: bool = True,
         fuse_cross_entropy: bool = True,
         tie_word_embeddings: bool = False,
@@ -154,6 +158,7 @@ class MambaConfig(PretrainedConfig):
         self.rescale_prenorm_residual = rescale_prenorm_residual
         self.residual_in_fp32 = residual_in_fp32
         self.use_cache = use_cache
+        self.static_decode = static_decode
         self.fuse_cross_entropy = fuse_cross_entropy
         self.fuse_norm = fuse_norm
 
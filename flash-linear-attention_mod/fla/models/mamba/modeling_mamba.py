@@ -27,6 +27,7 @@ from transformers.utils import ModelOutput, logging
 
 from fla.models.mamba.configuration_mamba import MambaConfig
 from fla.modules import FusedCrossEntropyLoss, RMSNorm
+from fla.modules.convolution import ring_conv_weights, short_convolution_step
 
 logger = logging.get_logger(__name__)
 
@@ -64,6 +65,10 @@ class MambaCache:
             i: torch.zeros(batch_size, intermediate_size, ssm_state_size, device=device, dtype=dtype)
             for i in range(config.num_hidden_layers)
         }
+        # scratch buffers of the decoding steps, shared by all the layers
+        self.conv_workspace = torch.empty_like(self.conv_states[0])
+        self.ssm_workspace = torch.empty(batch_size, intermediate_size, ssm_state_size, device=device,
+                                         dtype=torch.float32)
 
 
 class MambaMixer(nn.Module):
@@ -111,6 +116,8 @@ class MambaMixer(nn.Module):
         self.D = nn.Parameter(torch.ones(self.intermediate_size))
         self.out_proj = nn.Linear(self.intermediate_size, self.hidden_size, bias=config.use_bias)
         self.use_bias = config.use_bias
+        self.static_decode = config.static_decode
+        self._decode_key, self._decode_constants = None, None
 
         if not is_fast_path_available:
             logger.warning_once(
@@ -212,6 +219,8 @@ class MambaMixer(nn.Module):
 
     # fmt: off
     def slow_forward(self, input_states, cache_params: Optional[MambaCache] = None):
+        if cache_params is not None and cache_params.seqlen_offset > 0 and self.static_decode:
+            return self.static_decode_step(input_states, cache_params)
         batch_size, seq_len, _ = input_states.shape
         dtype = input_states.dtype
         # 1. Gated MLP's linear projection
@@ -238,6 +247,9 @@ class MambaMixer(nn.Module):
                     hidden_states,
                     (self.conv_kernel_size - hidden_states.shape[-1], 0)
                 )
+                if self.static_decode:
+                    # ring buffer layout for `static_decode_step`
+                    conv_state = conv_state.roll(seq_len % self.conv_kernel_size, dims=-1)
                 cache_params.conv_states[self.layer_idx].copy_(conv_state)
                 # [batch, intermediate_size, seq_len]
                 hidden_states = self.act(self.conv1d(hidden_states)[..., :seq_len])
@@ -291,6 +303,61 @@ class MambaMixer(nn.Module):
         return contextualized_states
     # fmt: on
 
+    def decode_constants(self):
+        """
+        The input independent tensors of `static_decode_step`, computed once and reused until a parameter is
+        updated inplace (which bumps its version) or moved to another storage.
+        """
+        params = (self.A_log, self.D, self.conv1d.weight)
+        key = tuple((p.data_ptr(), p._version) for p in params)
+        if key != self._decode_key:
+            with torch.no_grad():
+                self._decode_constants = (
+                    # [intermediate_size, ssm_state_size]
+                    -torch.exp(self.A_log.float()),
+                    # [intermediate_size]
+                    self.D.float(),
+                    # [conv_kernel_size, intermediate_size, conv_kernel_size]
+                    ring_conv_weights(self.conv1d.weight[:, 0]),
+                )
+            self._decode_key = key
+        return self._decode_constants
+
+    def static_decode_step(self, input_states, cache_params: MambaCache):
+        """
+        Decoding step of `slow_forward` updating the states of `cache_params` strictly inplace, without copying them.
+        The conv state is a ring buffer indexed by `cache_params.seqlen_offset`, the discretized A is written into
+        `cache_params.ssm_workspace` and the input independent tensors come from `decode_constants`. Inference only.
+        """
+        dtype = input_states.dtype
+        A, D, conv_weights = self.decode_constants()
+        # [batch, intermediate_size]
+        hidden_states, gate = self.in_proj(input_states[:, 0]).chunk(2, dim=-1)
+        hidden_states = self.act(short_convolution_step(
+            hidden_states,
+            cache_params.conv_states[self.layer_idx],
+            conv_weights,
+            cache_params.seqlen_offset,
+            self.conv1d.bias,
+            cache_params.conv_workspace
+        )).to(dtype)
+
+        time_step, B, C = torch.split(
+            self.x_proj(hidden_states), [self.time_step_rank, self.ssm_state_size, self.ssm_state_size], dim=-1
+        )
+        discrete_time_step = nn.functional.softplus(self.dt_proj(time_step)).float()
+        ssm_state = cache_params.ssm_states[self.layer_idx]
+        # [batch, intermediate_size, ssm_state_size]
+        discrete_A = torch.mul(A, discrete_time_step[..., None], out=cache_params.ssm_workspace).exp_()
+        ssm_state.mul_(discrete_A)
+        ssm_state.addcmul_(
+            (discrete_time_step * hidden_states)[..., None].to(ssm_state.dtype), B[:, None].to(ssm_state.dtype)
+        )
+        # [batch, intermediate_size]
+        scan_output = torch.matmul(ssm_state, C[..., None].to(ssm_state.dtype)).squeeze(-1)
+        scan_output = (scan_output + hidden_states * D) * self.act(gate)
+        return self.out_proj(scan_output.to(dtype))[:, None]
+
     def forward(self, hidden_states, cache_params: Optional[MambaCache] = None):
         if is_fast_path_available and "cuda" in self.x_proj.weight.device.type:
             return self.cuda_kernels_forward(hidden_states, cache_params)
@@ -84,6 +84,12 @@ class Mamba2Config(PretrainedConfig):
             Whether to use RMS norm or not.
         chunk_size (`int`, *optional*, defaults to 256):
             Size of the chunks that will comprise the sequence.
+        positive_and_negative (`bool`, *optional*, defaults to `False`):
+            Whether to use the transitions `2 * exp(A * dt) - 1` in (-1, 1] instead of `exp(A * dt)`.
+            Only supported by the PyTorch implementation.
+        static_decode (`bool`, *optional*, defaults to `True`):
+            Whether the PyTorch implementation decodes with `Mamba2Mixer.static_decode_step`, which updates the cache
+            strictly inplace and keeps the conv states as ring buffers.
         tie_word_embeddings (`bool`, *optional*, defaults to `False`):
             Whether to tie word embeddings or not.
     """
@@ -119,6 +125,8 @@ class Mamba2Config(PretrainedConfig):
         use_cache: bool = True,
         rms_norm: bool = True,
         chunk_size: int = 256,
+        positive_and_negative: bool = False,
+        static_decode: bool = True,
         fuse_cross_entropy: bool = True,
         tie_word_embeddings: bool = False,
         **kwargs,
@@ -155,6 +163,8 @@ class Mamba2Config(PretrainedConfig):
         self.rms_norm = rms_norm
         self.state_size = state_size
         self.chunk_size = chunk_size
+        self.positive_and_negative = positive_and_negative
+        self.static_decode = static_decode
         self.time_step_limit = time_step_limit
         self.fuse_cross_entropy = fuse_cross_entropy
         self.tie_word_embeddings = tie_word_embeddings
@@ -26,6 +26,7 @@ from transformers.utils import ModelOutput, logging
 
 from fla.models.mamba2.configuration_mamba2 import Mamba2Config
 from fla.modules import FusedCrossEntropyLoss, FusedRMSNormSwishGate, RMSNorm
+from fla.modules.convolution import ring_conv_weights, short_convolution_step
 
 logger = logging.get_logger(__name__)
 
@@ -103,6 +104,88 @@ def segment_sum(input_tensor):
     return tensor_segsum
 
 
+def ssd_chunk_scan(
+    hidden_states: torch.Tensor,
+    A: torch.Tensor,
+    B: torch.Tensor,
+    C: torch.Tensor,
+    chunk_size: int,
+    initial_states: Optional[torch.Tensor] = None,
+    positive_and_negative: bool = False,
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    """
+    Chunked SSD (state space duality) scan of h_t = a_t h_{t-1} + B_t x_t^T, y_t = h_t C_t.
+
+    With `positive_and_negative`, the transitions are a_t = 2 exp(A_t) - 1 in (-1, 1] instead of exp(A_t).
+    Their products are then tracked as log magnitudes, whose segment sums give the decays as usual, and a parity
+    channel counting the negative transitions, whose parity gives the sign.
+
+    This is the same algorithm as `ssd_minimal_discrete` in mamba_ssm/modules/ssd_minimal.py of mamba_dev,
+    keep the two in sync.
+
+    Args:
+        hidden_states: [bsz, seq_len, num_heads, head_dim], already multiplied by dt
+        A: [bsz, seq_len, num_heads], log transitions A * dt
+        B, C: [bsz, seq_len, num_heads, state_size]
+        initial_states: [bsz, num_heads, head_dim, state_size]
+
+    Returns:
+        y: [bsz, seq_len, num_heads, head_dim]
+        final_state: [bsz, num_heads, head_dim, state_size]
+    """
+    seq_len = hidden_states.shape[1]
+    # padded steps have A = 0, i.e. a = 1 in both modes, and x = 0, so they leave the state unchanged
+    pad_size = -seq_len % chunk_size
+    hidden_states, A, B, C = [reshape_into_chunks(t, pad_size, chunk_size) for t in (hidden_states, A, B, C)]
+
+    # [bsz, -1, chunk_size, num_heads] -> [bsz, num_heads, -1, chunk_size]
+    A = A.permute(0, 3, 1, 2)
+    sign = None
+    if positive_and_negative:
+        transitions = 2 * torch.exp(A) - 1
+        # number of negative transitions since the chunk start
+        parity = (transitions < 0).cumsum(-1)
+        sign = 1 - 2 * (parity % 2).to(A.dtype)
+        # a zero transition gets a finite log magnitude, so that exp of it (and its gradient) is 0
+        A = transitions.abs().clamp_min(torch.finfo(A.dtype).tiny).log()
+    A_cumsum = torch.cumsum(A, dim=-1)
+
+    # 1. intra-chunk outputs (diagonal blocks), L[i, j] = a_i ... a_{j+1}
+    L = torch.exp(segment_sum(A))
+    if sign is not None:
+        L = L * sign[..., :, None] * sign[..., None, :]
+    Y_diag = torch.einsum("bclhn,bcshn,bhcls,bcshp->bclhp", C, B, L, hidden_states)
+
+    # 2. states at the end of each chunk (right term of the low-rank factorization of the off-diagonal blocks)
+    decay_states = torch.exp(A_cumsum[:, :, :, -1:] - A_cumsum)
+    if sign is not None:
+        decay_states = decay_states * sign[:, :, :, -1:] * sign
+    states = torch.einsum("bclhn,bhcl,bclhp->bchpn", B, decay_states, hidden_states)
+
+    # 3. inter-chunk recurrence, states at the chunk borders
+    if initial_states is None:
+        initial_states = torch.zeros_like(states[:, :1])
+    else:
+        initial_states = initial_states[:, None].to(states.dtype)
+    states = torch.cat([initial_states, states], dim=1)
+    decay_chunk = torch.exp(segment_sum(nn.functional.pad(A_cumsum[:, :, :, -1], (1, 0))))
+    if sign is not None:
+        chunk_sign = nn.functional.pad(sign[:, :, :, -1], (1, 0), value=1.).cumprod(-1)
+        decay_chunk = decay_chunk * chunk_sign[..., :, None] * chunk_sign[..., None, :]
+    new_states = torch.einsum("bhzc,bchpn->bzhpn", decay_chunk, states)
+    states, final_state = new_states[:, :-1], new_states[:, -1]
+
+    # 4. state -> output conversion per chunk (left term of the low-rank factorization)
+    state_decay_out = torch.exp(A_cumsum)
+    if sign is not None:
+        state_decay_out = state_decay_out * sign
+    Y_off = torch.einsum("bclhn,bchpn,bhcl->bclhp", C, states, state_decay_out)
+
+    # [bsz, -1, chunk_size, num_heads, head_dim] -> [bsz, seq_len, num_heads, head_dim]
+    y = (Y_diag + Y_off).reshape(Y_diag.shape[0], -1, *Y_diag.shape[-2:])[:, :seq_len]
+    return y, final_state
+
+
 class Mamba2Cache:
     """
     Arguments:
@@ -115,6 +198,8 @@ class Mamba2Cache:
         seqlen_offset: int
         dtype: torch.dtype
         conv_states: Dict[int, torch.Tensor] # layer_idx -> [batch_size, intermediate_size, conv_kernel_size]
+            ring buffers (the input of timestep t in column t % conv_kernel_size) with `config.static_decode`
+            in the PyTorch implementation
         ssm_states: Dict[int, torch.Tensor] # layer_idx -> [batch_size, intermediate_size, ssm_state_size]
     """
 
@@ -151,6 +236,8 @@ class Mamba2Cache:
             )
             for i in range(config.num_hidden_layers)
         }
+        # scratch buffer of the decoding steps, shared by all the layers
+        self.conv_workspace = torch.empty_like(self.conv_states[0])
         self.activation = config.hidden_act
         self.act = ACT2FN[config.hidden_act]
 
@@ -201,6 +288,9 @@ class Mamba2Mixer(nn.Module):
         self.n_groups = config.n_groups
         self.head_dim = config.head_dim
         self.chunk_size = config.chunk_size
+        self.positive_and_negative = config.positive_and_negative
+        self.static_decode = config.static_decode
+        self._decode_key, self._decode_constants = None, None
 
         self.time_step_limit = config.time_step_limit
         self.time_step_min = config.time_step_min
@@ -431,6 +521,8 @@ class Mamba2Mixer(nn.Module):
         cache_position: Optional[torch.LongTensor] = None,
         attention_mask: Optional[torch.Tensor] = None
     ):
+        if cache_params is not None and cache_params.seqlen_offset > 0 and self.static_decode:
+            return self.static_decode_step(input_states, cache_params)
         batch_size, seq_len, _ = input_states.shape
         dtype = input_states.dtype
         # Gated MLP's linear projection
@@ -461,6 +553,9 @@ class Mamba2Mixer(nn.Module):
                     hidden_states,
                     (self.conv_kernel_size - hidden_states.shape[-1], 0)
                 )
+                if self.static_decode:
+                    # ring buffer layout for `static_decode_step`
+                    conv_state = conv_state.roll(hidden_states.shape[-1] % self.conv_kernel_size, dims=-1)
                 cache_params.conv_states[self.layer_idx].copy_(conv_state)
                 hidden_states = self.act(self.conv1d(
                     hidden_states).transpose(1, 2))[:, :seq_len, :]  # [batch, intermediate_size, seq_len]
@@ -491,6 +586,8 @@ class Mamba2Mixer(nn.Module):
                                           self.ssm_state_size).to(dtype=torch.float32)
             # [bsz, num_heads, head_dim, state_size]
             dA = torch.exp(dt[..., None] * A)
+            if self.positive_and_negative:
+                dA = 2 * dA - 1
 
             # Discretize B
             # [bsz, n_groups * state_size] -> [bsz, n_groups, 1, state_size] ->
@@ -536,81 +633,32 @@ class Mamba2Mixer(nn.Module):
             # [bsz, num_heads, head_dim] -> [bsz, 1, intermediate_size]
             y = y.reshape(batch_size, -1)[:, None, ...]
         else:
-            # begin ssd naive implementation without einsums
+            # begin ssd naive implementation
             dt = nn.functional.softplus(dt + self.dt_bias)
             dt = torch.clamp(dt, self.time_step_min)  # , self.time_step_max)
             hidden_states = hidden_states.reshape(batch_size, seq_len, -1, self.head_dim).float()
             B = B.reshape(batch_size, seq_len, -1, self.ssm_state_size).float()
             C = C.reshape(batch_size, seq_len, -1, self.ssm_state_size).float()
-            B = B.repeat(1, 1, self.num_heads // self.n_groups, 1)
-            C = C.repeat(1, 1, self.num_heads // self.n_groups, 1)
-            pad_size = self.chunk_size - (seq_len % self.chunk_size)
-
-            D_residual = self.D[..., None] * pad_tensor_by_size(hidden_states, pad_size)
-
-            # Discretize x and A
-            hidden_states = hidden_states * dt[..., None]
-            A = A.to(hidden_states.dtype) * dt
-
-            # Rearrange into blocks/chunks
-            hidden_states, A, B, C = [reshape_into_chunks(t, pad_size, self.chunk_size) for t in (hidden_states, A, B, C)]
-
-            # [bsz, -1, chunk_size, num_heads] -> [bsz, num_heads, -1, chunk_size]
-            A = A.permute(0, 3, 1, 2)
-            A_cumsum = torch.cumsum(A, dim=-1)
-
-            # 1. Compute the output for each intra-chunk (diagonal blocks)
-            # This is the analog of a causal mask
-            L = torch.exp(segment_sum(A))
-
-            # First, contraction of C and B to get G (attention-weights like)
-            G_intermediate = C[:, :, :, None, :, :] * B[:, :, None, :, :, :]  # shape: (b, c, l, s, h, n)
-            G = G_intermediate.sum(dim=-1)  # shape: (b, c, l, s, h)
-
-            # Step 2: Compute M, equivalent to applying attention mask to weights
-            M_intermediate = G[..., None] * L.permute(0, 2, 3, 4, 1)[..., None]
-            M = M_intermediate.sum(dim=-1)
+            B = B.repeat_interleave(self.num_heads // self.n_groups, dim=2)
+            C = C.repeat_interleave(self.num_heads // self.n_groups, dim=2)
 
-            # Step 3: Compute Y_diag (apply to values)
-            Y_diag = (M[..., None] * hidden_states[:, :, None]).sum(3)
-
-            # (right term of low-rank factorization of off-diagonal blocks; B terms)
-
-            decay_states = torch.exp((A_cumsum[:, :, :, -1:] - A_cumsum))
-            B_decay_contraction = B * decay_states.permute(0, 2, 3, 1)[..., None]
-            # permute back B * decay states
-            states = (B_decay_contraction.permute(0, 1, 3, 2, 4)[..., None]
-                      * hidden_states.permute(0, 1, 3, 2, 4)[..., None, :]).sum(dim=3).permute(0, 1, 2, 4, 3)
+            D_residual = self.D[..., None] * hidden_states
 
             if cache_params is not None and cache_params.seqlen_offset > 0:
-                previous_states = cache_params.ssm_states[self.layer_idx][:, None, ...]
+                previous_states = cache_params.ssm_states[self.layer_idx]
             else:
-                previous_states = torch.zeros_like(states[:, :1])
-            states = torch.cat([previous_states, states], dim=1)
-            decay_chunk = torch.exp(segment_sum(nn.functional.pad(A_cumsum[:, :, :, -1], (1, 0))))
-
-            states_permuted = states.permute(0, 2, 1, 3, 4)
-            result = (decay_chunk[..., None, None] * states_permuted[:, :, None, ...]).sum(dim=2)
-            new_states = result.permute(0, 2, 1, 3, 4)
-            states, ssm_state = new_states[:, :-1], new_states[:, -1]
-
-            # Compute state -> output conversion per chunk
-            # (left term of low-rank factorization of off-diagonal blocks; C terms)
-            state_decay_out = torch.exp(A_cumsum)
-            # compute Yoff
-            C_times_states = (C[..., None, :] * states[:, :, None, ...])
-            state_decay_out_permuted = state_decay_out.permute(0, 2, 3, 1)
-            Y_off = (C_times_states.sum(-1) * state_decay_out_permuted[..., None])
-            # Add output of intra-chunk and inter-chunk terms (diagonal and off-diagonal blocks)
-
-            y = Y_diag + Y_off
-            # [bsz, -1, self.chunk_size, num_heads, head_dim] -> [bsz, (padded) seq_len, num_heads, head_dim]
-            y = y.reshape(batch_size, -1, self.num_heads, self.head_dim)
-
+                previous_states = None
+            # Discretize x and A
+            y, ssm_state = ssd_chunk_scan(
+                hidden_states * dt[..., None],
+                A.to(hidden_states.dtype) * dt,
+                B,
+                C,
+                self.chunk_size,
+                initial_states=previous_states,
+                positive_and_negative=self.positive_and_negative,
+            )
             y = y + D_residual
-            # Cutting off padded chunks
-            if pad_size > 0:
-                y = y[:, :seq_len, :, :]
 
             # move reshape to naive method
             y = y.reshape(batch_size, seq_len, -1)
@@ -624,6 +672,74 @@ class Mamba2Mixer(nn.Module):
         return contextualized_states
     # fmt: on
 
+    def decode_constants(self):
+        """
+        The input independent tensors of `static_decode_step`, computed once and reused until a parameter is
+        updated inplace (which bumps its version) or moved to another storage.
+        """
+        params = (self.A_log, self.dt_bias, self.D, self.conv1d.weight)
+        key = tuple((p.data_ptr(), p._version) for p in params)
+        if key != self._decode_key:
+            with torch.no_grad():
+                self._decode_constants = (
+                    # [num_heads]
+                    -torch.exp(self.A_log.float()),
+                    # [num_heads]
+                    self.dt_bias.float(),
+                    # [n_groups, num_heads // n_groups, 1]
+                    self.D.float().view(self.n_groups, -1, 1),
+                    # [conv_kernel_size, conv_dim, conv_kernel_size]
+                    ring_conv_weights(self.conv1d.weight[:, 0]),
+                )
+            self._decode_key = key
+        return self._decode_constants
+
+    def static_decode_step(self, input_states, cache_params: Mamba2Cache):
+        """
+        Decoding step of `torch_forward` updating the states of `cache_params` strictly inplace, without copying them.
+        The conv state is a ring buffer indexed by `cache_params.seqlen_offset`, B and C are broadcast over the heads
+        of their group and the input independent tensors come from `decode_constants`. Inference only.
+        """
+        batch_size = input_states.shape[0]
+        dtype = input_states.dtype
+        A, dt_bias, D, conv_weights = self.decode_constants()
+        projected_states = self.in_proj(input_states[:, 0])
+        d_mlp = (projected_states.shape[-1] - 2 * self.intermediate_size - 2
+                 * self.n_groups * self.ssm_state_size - self.num_heads) // 2
+        _, _, gate, hidden_states, dt = projected_states.split(
+            [d_mlp, d_mlp, self.intermediate_size, self.conv_dim, self.num_heads], dim=-1
+        )
+
+        hidden_states = self.act(short_convolution_step(
+            hidden_states,
+            cache_params.conv_states[self.layer_idx],
+            conv_weights,
+            cache_params.seqlen_offset,
+            self.conv1d.bias,
+            cache_params.conv_workspace
+        )).to(dtype)
+        hidden_states, B, C = torch.split(hidden_states, [self.intermediate_size, self.n_groups * self.ssm_state_size,
+                                                          self.n_groups * self.ssm_state_size], dim=-1)
+
+        dt = nn.functional.softplus(dt.float() + dt_bias).clamp_(min=self.time_step_min)  # [batch, num_heads]
+        dA = torch.exp(dt * A)
+        if self.positive_and_negative:
+            dA = 2 * dA - 1
+
+        # [bsz, num_heads, head_dim, state_size] -> [bsz, n_groups, num_heads // n_groups, head_dim, state_size]
+        ssm_state = cache_params.ssm_states[self.layer_idx]
+        ssm_state = ssm_state.view(batch_size, self.n_groups, -1, self.head_dim, self.ssm_state_size)
+        x = hidden_states.view(batch_size, self.n_groups, -1, self.head_dim)
+        dt = dt.view(batch_size, self.n_groups, -1, 1)
+        B = B.view(batch_size, self.n_groups, 1, 1, self.ssm_state_size).to(ssm_state.dtype)
+        C = C.view(batch_size, self.n_groups, 1, self.ssm_state_size, 1).to(ssm_state.dtype)
+        ssm_state.mul_(dA.view(batch_size, self.n_groups, -1, 1, 1))
+        ssm_state.addcmul_((x * dt).unsqueeze(-1).to(ssm_state.dtype), B)
+        y = torch.matmul(ssm_state, C).squeeze(-1) + x * D  # [bsz, n_groups, num_heads // n_groups, head_dim]
+
+        scan_output = self.norm(y.reshape(batch_size, 1, -1), o=gate[:, None])
+        return self.out_proj(scan_output.to(dtype))
+
     def forward(
         self,
         hidden_states,
@@ -631,7 +747,8 @@ class Mamba2Mixer(nn.Module):
         cache_position: Optional[torch.LongTensor] = None,
         attention_mask: Optional[torch.Tensor] = None,
     ):
-        if is_fast_path_available and "cuda" in self.in_proj.weight.device.type:
+        # the kernels only support the transitions exp(A * dt) in (0, 1]
+        if is_fast_path_available and "cuda" in self.in_proj.weight.device.type and not self.positive_and_negative:
             return self.cuda_kernels_forward(
                 hidden_states, cache_params, cache_position, attention_mask
             )
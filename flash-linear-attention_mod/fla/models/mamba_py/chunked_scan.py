@@ -0,0 +1,128 @@
+import torch
+
+"""
+
+A memory-bounded alternative to pscan for the selective scan.
+pscan takes deltaA and BX as full (B, L, ED, N) tensors (padded to a power of two length) and returns all the hidden states hs.
+Here, deltaA and BX are formed chunk by chunk of the sequence and the hidden states are contracted with C right away,
+so only (B, chunk_size, ED, N) tensors are alive at any time, for any L.
+The backward pass recomputes the hidden states of each chunk from the state at its start, the only one that is saved.
+
+xlstm/mamba/mamba.py imports it from here.
+
+"""
+
+def associative_scan(A, X, h0):
+    """
+    Computes H[t] = A[t] * H[t-1] + X[t] with H[-1] = h0 along the length dim,
+    with log2(T) steps of the Hillis-Steele scan. There are no divisions, A can be negative or zero.
+
+    Args:
+        A, X : (B, T, D, N)
+        h0 : (B, D, N)
+
+    Returns:
+        H : (B, T, D, N)
+    """
+
+    offset = 1
+    while offset < A.size(1):
+        X = torch.cat([X[:, :offset], torch.addcmul(X[:, offset:], A[:, offset:], X[:, :-offset])], dim=1)
+        A = torch.cat([A[:, :offset], A[:, offset:] * A[:, :-offset]], dim=1)
+        offset *= 2
+    return torch.addcmul(X, A, h0.unsqueeze(1))
+
+def discretize(x, delta, A, B, positive_and_negative):
+    """
+    Args:
+        x, delta : (B, T, ED)
+        A : (ED, N)
+        B : (B, T, N)
+
+    Returns:
+        deltaA : (B, T, ED, N), in [-1, 1] with positive_and_negative
+        deltaA_grad : (B, T, ED, N), the derivative of deltaA wrt delta * A
+        BX : (B, T, ED, N)
+    """
+
+    deltaA = torch.exp(delta.unsqueeze(-1) * A)
+    if positive_and_negative:
+        deltaA_grad = deltaA * 2
+        deltaA = deltaA_grad - 1
+    else:
+        deltaA_grad = deltaA
+    BX = (delta * x).unsqueeze(-1) * B.unsqueeze(2)
+    return deltaA, deltaA_grad, BX
+
+class ChunkedSelectiveScan(torch.autograd.Function):
+    @staticmethod
+    def forward(ctx, x, delta, A, B, C, positive_and_negative, chunk_size):
+        """
+        Args:
+            x, delta : (B, L, ED)
+            A : (ED, N)
+            B, C : (B, L, N)
+
+        Returns:
+            y : (B, L, ED), without the D * x term
+        """
+
+        h = x.new_zeros(x.size(0), x.size(2), A.size(1), dtype=torch.promote_types(x.dtype, A.dtype)) # (B, ED, N)
+        hs_start, ys = [], []
+        for t in range(0, x.size(1), chunk_size):
+            chunk = slice(t, t + chunk_size)
+            hs_start.append(h)
+            deltaA, _, BX = discretize(x[:, chunk], delta[:, chunk], A, B[:, chunk], positive_and_negative)
+            hs = associative_scan(deltaA, BX, h) # (B, T, ED, N)
+            ys.append((hs @ C[:, chunk].unsqueeze(-1)).squeeze(3)) # (B, T, ED, N) @ (B, T, N, 1) -> (B, T, ED, 1)
+            h = hs[:, -1]
+
+        ctx.positive_and_negative = positive_and_negative
+        ctx.chunk_size = chunk_size
+        ctx.save_for_backward(x, delta, A, B, C, torch.stack(hs_start, dim=1))
+        return torch.cat(ys, dim=1)
+
+    @staticmethod
+    def backward(ctx, grad_output):
+        x, delta, A, B, C, hs_start = ctx.saved_tensors
+        chunk_size = ctx.chunk_size
+
+        grad_x, grad_delta = torch.empty_like(x), torch.empty_like(delta)
+        grad_A = torch.zeros_like(A)
+        grad_B, grad_C = torch.empty_like(B), torch.empty_like(C)
+        # gradient flowing into the state at the end of the current chunk from the later ones
+        grad_h = torch.zeros_like(hs_start[:, 0])
+        for c, t in reversed(list(enumerate(range(0, x.size(1), chunk_size)))):
+            chunk = slice(t, t + chunk_size)
+            x_c, delta_c, B_c, C_c, grad_y = x[:, chunk], delta[:, chunk], B[:, chunk], C[:, chunk], grad_output[:, chunk]
+            h0 = hs_start[:, c]
+            deltaA, deltaA_grad, BX = discretize(x_c, delta_c, A, B_c, ctx.positive_and_negative)
+            hs = associative_scan(deltaA, BX, h0)
+
+            # dH[t] = C[t] dy[t] + A[t+1] * dH[t+1], the same scan in reverse
+            deltaA_next = torch.cat([deltaA[:, 1:], torch.ones_like(deltaA[:, :1])], dim=1)
+            grad_hs = associative_scan(deltaA_next.flip(1), (grad_y.unsqueeze(-1) * C_c.unsqueeze(2)).flip(1), grad_h).flip(1)
+            grad_h = deltaA[:, 0] * grad_hs[:, 0]
+
+            grad_deltaA = grad_hs * torch.cat([h0.unsqueeze(1), hs[:, :-1]], dim=1) * deltaA_grad # wrt delta * A
+            grad_hs_B = (grad_hs @ B_c.unsqueeze(-1)).squeeze(3) # (B, T, ED)
+            grad_x[:, chunk] = grad_hs_B * delta_c
+            grad_delta[:, chunk] = (grad_deltaA * A).sum(-1) + grad_hs_B * x_c
+            grad_A += (grad_deltaA * delta_c.unsqueeze(-1)).sum(dim=(0, 1))
+            grad_B[:, chunk] = (grad_hs * (delta_c * x_c).unsqueeze(-1)).sum(2)
+            grad_C[:, chunk] = (hs * grad_y.unsqueeze(-1)).sum(2)
+
+        return grad_x, grad_delta, grad_A, grad_B, grad_C, None, None
+
+def selective_scan_chunked(x, delta, A, B, C, positive_and_negative=False, chunk_size=64):
+    """
+    Args:
+        x, delta : (B, L, ED)
+        A : (ED, N)
+        B, C : (B, L, N)
+
+    Returns:
+        y : (B, L, ED), sum_n H[t] * C[t] without the D * x term
+    """
+
+    return ChunkedSelectiveScan.apply(x, delta, A, B, C, positive_and_negative, chunk_size)
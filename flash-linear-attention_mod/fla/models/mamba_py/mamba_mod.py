@@ -4,6 +4,7 @@ from typing import Union
 
 import torch
 from fla.models.mamba_py.mamba import Mamba, MambaBlock, RMSNorm, ResidualBlock
+from fla.models.mamba_py.chunked_scan import selective_scan_chunked
 from fla.models.mamba_py.pscan import pscan
 from torch import nn
 
@@ -35,6 +36,8 @@ class MambaLMConfig:
     mup_base_width: float = 128  # width=d_model
 
     pscan: bool = True  #  use parallel scan mode or sequential mode when training
+    chunked_scan: bool = False  #  scan chunk by chunk in parallel scan mode, without the (B, L, ED, N) tensors
+    scan_chunk_size: int = 64
     use_cuda: bool = False  # use official CUDA implementation when training (not compatible with (b)float16)
 
     def __post_init__(self):
@@ -63,6 +66,10 @@ class PositiveNegativeMambaBlock(MambaBlock):
 
         #  y : (B, L, ED)
 
+        if self.config.chunked_scan:
+            y = selective_scan_chunked(x, delta, A, B, C, self.positive_and_negative, self.config.scan_chunk_size)
+            return y + D * x
+
         deltaA = torch.exp(delta.unsqueeze(-1) * A)  #  (B, L, ED, N)
         if self.positive_and_negative:
             deltaA = deltaA * 2 - 1
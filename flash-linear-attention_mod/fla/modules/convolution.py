@@ -3,8 +3,7 @@
 # from https://github.com/HazyResearch/zoology/blob/main/zoology/mixers/convolution.py
 
 import math
-import warnings
-from typing import Optional
+from typing import Optional, Tuple
 
 import torch
 import torch.nn as nn
@@ -104,17 +103,7 @@ class ShortConvolution(nn.Conv1d):
             assert activation in ['silu', 'swish'], f"Activation `{activation}` not supported yet."
             self.activation = activation
 
-        if causal_conv1d_fn is None:
-            if use_fast_conv1d:
-                raise RuntimeError(
-                    "Please either install `causal-conv1d>=1.4.0` to enable fast causal short convolution CUDA kernel "
-                    "or set `use_fast_conv1d` to False"
-                )
-            else:
-                warnings.warn(
-                    "The naive Pytorch verison is very slow in practice, "
-                    "please run `pip install causal-conv1d>=1.4.0` to install fast causal short convolution CUDA kernel"
-                )
+        # without `causal-conv1d>=1.4.0` or on other devices than CUDA, `short_convolution` is used instead
         self.use_fast_conv1d = use_fast_conv1d
 
     def extra_repr(self):
@@ -142,7 +131,8 @@ class ShortConvolution(nn.Conv1d):
         self,
         x: torch.Tensor,
         mask: Optional[torch.Tensor] = None,
-        cache: Optional[torch.Tensor] = None
+        cache: Optional[torch.Tensor] = None,
+        position: Optional[torch.Tensor] = None
     ) -> torch.Tensor:
         """
         Args:
@@ -152,30 +142,34 @@ class ShortConvolution(nn.Conv1d):
                 Attention mask dealing with padded positions.
             cache (`Optional[torch.Tensor]`):
                 Previous cache tensor of shape `[batch_size, hidden_size, kernel_size]`,
+            position (`Optional[torch.Tensor]`):
+                Number of timesteps in the cache of shape `[batch_size]`. If given, the cache is a ring buffer
+                handled by `short_convolution` on all devices, see `init_state`.
         Returns:
             Tensor of shape `[batch_size, seq_len, hidden_size]`. The `cache` (if provided) is updated inplace.
         """
 
         if mask is not None:
             x = x.mul_(mask.unsqueeze(-1))
+        if position is not None:
+            return short_convolution(x, rearrange(self.weight, "d 1 w -> d w"), self.bias, self.activation,
+                                     cache, position)
         if cache is not None and x.shape[1] == 1:
             return self.step(x, cache)
         x = rearrange(x, "b l d -> b d l")
         # Update state (B D W)
         if cache is not None:
             cache.copy_(F.pad(x, (self.kernel_size[0] - x.shape[-1], 0)))
-        if self.use_fast_conv1d:
+        if self._use_fast_conv1d(x):
             x = causal_conv1d_fn(
                 x=x,
                 weight=rearrange(self.weight, "d 1 w -> d w"),
                 bias=self.bias,
                 activation=self.activation,
             )
-        else:
-            x = self._conv_forward(x, self.weight, self.bias)[..., :x.shape[-1]]
-            if self.activation is not None:
-                x = ACT2FN[self.activation](x)
-        return rearrange(x, "b d l -> b l d")
+            return rearrange(x, "b d l -> b l d")
+        return short_convolution(rearrange(x, "b d l -> b l d"), rearrange(self.weight, "d 1 w -> d w"), self.bias,
+                                 self.activation)
 
     def step(
         self,
@@ -185,7 +179,7 @@ class ShortConvolution(nn.Conv1d):
         assert x.shape[1] == 1, "Only support decoding with 1 token at a time for now"
 
         x = x.squeeze(1)
-        if self.use_fast_conv1d:
+        if self._use_fast_conv1d(x):
             x = causal_conv1d_update(
                 x=x,
                 conv_state=cache,
@@ -201,14 +195,164 @@ class ShortConvolution(nn.Conv1d):
             if self.bias is not None:
                 x = x + self.bias
             if self.activation is not None:
-                x = ACT2FN[self.activation](x).to(dtype=dtype)
+                x = apply_activation(x, self.activation).to(dtype=dtype)
         return x.unsqueeze(1)
 
+    def _use_fast_conv1d(self, x: torch.Tensor) -> bool:
+        return self.use_fast_conv1d and causal_conv1d_fn is not None and x.is_cuda
+
+    def init_state(self, batch_size: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Returns a zero ring buffer cache and position for `forward`.
+        """
+        return (self.weight.new_zeros(batch_size, self.hidden_size, self.kernel_size[0]),
+                self.weight.new_zeros(batch_size, dtype=torch.long))
+
     @property
     def state_size(self) -> int:
         return self.hidden_size * self.kernel_size
 
 
+def apply_activation(x: torch.Tensor, activation: str) -> torch.Tensor:
+    """
+    `ACT2FN[activation](x)` on GPUs. Its `silu`/`swish` is a jiterator kernel, which only runs on CUDA and ROCm,
+    so other devices use `F.silu`.
+    """
+    if activation in ('silu', 'swish') and not x.is_cuda:
+        return F.silu(x)
+    return ACT2FN[activation](x)
+
+
+def short_convolution(
+    x: torch.Tensor,
+    weight: torch.Tensor,
+    bias: Optional[torch.Tensor] = None,
+    activation: Optional[str] = None,
+    cache: Optional[torch.Tensor] = None,
+    position: Optional[torch.Tensor] = None
+) -> torch.Tensor:
+    """
+    Pure PyTorch causal depthwise convolution, the fallback of the `causal_conv1d` kernels.
+
+    With `cache` and `position`, it continues from and updates a streaming state. The cache is a ring buffer:
+    the input of timestep t is stored in column t % kernel_size, so a decoding step writes a single column instead
+    of shifting the whole cache. A zero cache with position 0 is the initial state.
+
+    Args:
+        x (`torch.Tensor`):
+            Tensor of shape `[batch_size, seq_len, hidden_size]`.
+        weight (`torch.Tensor`):
+            Depthwise kernel of shape `[hidden_size, kernel_size]`.
+        cache (`Optional[torch.Tensor]`):
+            Ring buffer of shape `[batch_size, hidden_size, kernel_size]`, updated inplace.
+        position (`Optional[torch.Tensor]`):
+            Number of timesteps seen so far of shape `[batch_size]` (long), updated inplace.
+    Returns:
+        Tensor of shape `[batch_size, seq_len, hidden_size]`.
+    """
+    B, L, D = x.shape
+    W = weight.shape[-1]
+    x = rearrange(x, "b l d -> b d l")
+    if cache is not None and L == 1:
+        # the weight of the input in column c is the tap for the timestep (position - c) % W steps back
+        taps = W - 1 - (position[:, None] - torch.arange(W, device=x.device)) % W
+        cache.scatter_(-1, (position % W).view(B, 1, 1).expand(B, D, 1), x.to(cache.dtype))
+        y = (cache * weight[:, taps].permute(1, 0, 2)).sum(-1, keepdim=True).to(x.dtype)
+        if bias is not None:
+            y = y + bias[:, None]
+    else:
+        if cache is None:
+            history = x.new_zeros(B, D, W - 1)
+        else:
+            # the last W - 1 inputs in time order
+            cols = (position[:, None] + torch.arange(1 - W, 0, device=x.device)) % W
+            history = cache.gather(-1, cols[:, None].expand(B, D, W - 1)).to(x.dtype)
+        x = torch.cat((history, x), -1)
+        y = F.conv1d(x, weight[:, None].to(x.dtype), bias, groups=D)
+        if cache is not None:
+            cols = (position[:, None] + torch.arange(L - W, L, device=x.device)) % W
+            cache.scatter_(-1, cols[:, None].expand(B, D, W), x[..., -W:].to(cache.dtype))
+    if cache is not None:
+        position.add_(L)
+    if activation is not None:
+        y = apply_activation(y, activation)
+    return rearrange(y, "b d l -> b l d")
+
+
+def fused_short_convolution(
+    convs: Tuple[ShortConvolution, ...],
+    xs: Tuple[torch.Tensor, ...],
+    mask: Optional[torch.Tensor] = None,
+    cache: Optional[torch.Tensor] = None,
+    position: Optional[torch.Tensor] = None
+) -> Tuple[torch.Tensor, ...]:
+    """
+    Applies the short convolutions `convs` (e.g. of q, k and v) to `xs` as one depthwise convolution over
+    the concatenated channels, sharing one ring buffer cache of shape `[batch_size, sum(hidden_size), kernel_size]`,
+    see `short_convolution`.
+    """
+    x = torch.cat(xs, -1)
+    if mask is not None:
+        x = x.mul_(mask.unsqueeze(-1))
+    weight = torch.cat([rearrange(conv.weight, "d 1 w -> d w") for conv in convs])
+    bias = None
+    if any(conv.bias is not None for conv in convs):
+        bias = torch.cat([conv.bias if conv.bias is not None else conv.weight.new_zeros(conv.hidden_size)
+                          for conv in convs])
+    ys = short_convolution(x, weight, bias, cache=cache, position=position).split(
+        [conv.hidden_size for conv in convs], -1)
+    return tuple(y if conv.activation is None else apply_activation(y, conv.activation) for conv, y in zip(convs, ys))
+
+
+def ring_conv_weights(weight: torch.Tensor) -> torch.Tensor:
+    """
+    Precomputes the kernels of `short_convolution_step`.
+
+    Args:
+        weight (`torch.Tensor`):
+            Depthwise kernel of shape `[hidden_size, kernel_size]`.
+    Returns:
+        Tensor of shape `[kernel_size, hidden_size, kernel_size]`: for each column `r` of a ring buffer cache holding
+        the newest input, the taps to apply to each column of the cache.
+    """
+    W = weight.shape[-1]
+    cols = torch.arange(W, device=weight.device)
+    # with the newest input in column r, the input in column c is (r - c) % W steps back
+    taps = W - 1 - (cols[:, None] - cols) % W
+    return weight[:, taps].transpose(0, 1).contiguous()
+
+
+def short_convolution_step(
+    x: torch.Tensor,
+    cache: torch.Tensor,
+    weights: torch.Tensor,
+    position: int,
+    bias: Optional[torch.Tensor] = None,
+    workspace: Optional[torch.Tensor] = None
+) -> torch.Tensor:
+    """
+    One decoding step of `short_convolution` for a batch sharing the same position, with the kernels precomputed by
+    `ring_conv_weights`. The ring buffer cache is updated inplace and, if given, `workspace` (a buffer of the shape of
+    the cache) holds the products, so that only the output is allocated.
+
+    Args:
+        x (`torch.Tensor`):
+            Tensor of shape `[batch_size, hidden_size]`.
+        cache (`torch.Tensor`):
+            Ring buffer of shape `[batch_size, hidden_size, kernel_size]`.
+        position (`int`):
+            Timestep of `x`, i.e. the number of timesteps seen so far.
+    Returns:
+        Tensor of shape `[batch_size, hidden_size]`, without activation.
+    """
+    col = position % cache.shape[-1]
+    cache[:, :, col] = x
+    y = torch.mul(cache, weights[col], out=workspace).sum(-1)
+    if bias is not None:
+        y = y.add_(bias)
+    return y.to(x.dtype)
+
+
 class LongConvolution(nn.Module):
     """
     LongConvolution applies a convolution operation on the input tensor using a fixed
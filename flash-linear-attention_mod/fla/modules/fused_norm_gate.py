@@ -791,6 +791,10 @@ class FusedRMSNormSwishGate(nn.Module):
         return s
 
     def forward(self, x, o, residual=None, prenorm=False, residual_in_fp32=False):
+        if not x.is_cuda and residual is None and not prenorm:
+            # the Triton kernels need a GPU, e.g. for decoding on CPU
+            o = o.reshape(x.shape)
+            return (rms_norm_ref(x, self.weight, self.bias, eps=self.eps, upcast=True) * F.silu(o.float())).to(x.dtype)
         return rms_norm_swish_gate_fn(
             x,
             o,
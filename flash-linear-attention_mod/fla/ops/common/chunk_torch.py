@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+from typing import Optional, Tuple
+
+import torch
+import torch.nn.functional as F
+from einops import rearrange
+
+
+def chunk_gated_linear_attn_torch(
+    q: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    g: torch.Tensor,
+    scale: float,
+    initial_state: Optional[torch.Tensor] = None,
+    output_final_state: bool = False,
+    u: Optional[torch.Tensor] = None,
+    use_negative_gates: bool = False,
+    chunk_size: int = 64,
+    subchunk_size: int = 16
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    r"""
+    Pure PyTorch chunkwise form of the gated linear attention recurrence
+    S_t = diag(gamma_t) S_{t-1} + k_t v_t^T, with o_t = q_t^T S_t.
+    It is the fallback of the Triton kernels on devices without them (e.g. CPU), gradients come from autograd.
+
+    Like the Triton `chunk_*` kernels, the intra-chunk scores are built from subchunks: blocks below the diagonal
+    are matmuls with the gates taken relative to the start of the query subchunk, and the diagonal blocks are
+    computed elementwise. The query factors are then decays in [0, 1], but the key factors are inverse decays >= 1
+    over up to chunk_size steps. That is accurate for the decays exp(g) of log-sigmoid gates, but not for
+    log|2 exp(g) - 1|, which goes to -inf where a negative gate crosses zero: with `use_negative_gates`, every
+    score is computed elementwise from the segment sum of its query/key pair instead, which is a decay in [0, 1].
+
+    Args:
+        q, k (torch.Tensor):
+            queries and keys of shape `(B, H, T, K)`
+        v (torch.Tensor):
+            values of shape `(B, H, T, V)`
+        g (torch.Tensor):
+            log decays of shape `(B, H, T, K)`, or `(B, H, T, 1)` for one decay per head and timestep.
+        scale (float):
+            scale of the queries.
+        u (Optional[torch.Tensor]):
+            RWKV6 bonus of shape `(H, K)`. If given, o_t = q_t^T (S_{t-1} + diag(u) k_t v_t^T) instead.
+        use_negative_gates (bool):
+            Use the decays gamma = 2 exp(g) - 1 in (-1, 1] instead of exp(g). Products of decays are then
+            tracked as a sign and a log magnitude.
+        chunk_size (int):
+            Number of timesteps per chunk, the state is only materialized at chunk borders.
+        subchunk_size (int):
+            Number of timesteps per diagonal block that is computed elementwise.
+    """
+    assert u is None or not use_negative_gates, "the RWKV6 bonus does not support negative gates"
+    orig_dtype = q.dtype
+    # float64 inputs are kept in float64, lower precisions are computed in float32
+    dtype = torch.promote_types(orig_dtype, torch.float32)
+    B, H, T, K, V = *q.shape, v.shape[-1]
+    # short inputs, e.g. single decoding steps, are not padded to a full chunk
+    BC = min(subchunk_size, T)
+    BT = min(chunk_size, BC * -(T // -BC))
+    assert BT % BC == 0, "chunk_size must be a multiple of subchunk_size"
+    # padded timesteps have k = v = 0 and decay 1, they neither read nor write the state
+    pad = -T % BT
+
+    q, k, v, g = map(lambda x: F.pad(x.to(dtype), (0, 0, 0, pad)), (q, k, v, g))
+    q, k, v, g = map(lambda x: rearrange(x, 'b h (n c) d -> b h n c d', c=BT), (q, k, v, g))
+    q = q * scale
+
+    sign = None
+    if use_negative_gates:
+        gate = 2 * g.exp() - 1
+        # sign of the product of the decays since the chunk start
+        sign = torch.where(gate < 0, -1., 1.).to(dtype).cumprod(-2)
+        # a decay of exactly 0 gets a finite log magnitude, exp of it (and its gradient) is 0
+        g = gate.abs().clamp_min(torch.finfo(gate.dtype).tiny).log()
+    # log decay from the chunk start to t, inclusive for the keys and exclusive for the queries of RWKV6
+    gc = g.cumsum(-2)
+    gq = gc if u is None else gc - g
+
+    A = q.new_zeros(B, H, q.shape[2], BT, BT)
+    causal_mask = torch.ones(BT, BT, dtype=torch.bool, device=q.device).tril(0 if u is None else -1)
+    for i in range(0, BT, BC):
+        q_i, gq_i = q[..., i:i+BC, :], gq[..., i:i+BC, :]
+        # with negative gates, all the keys up to the subchunk are scored elementwise
+        j = 0 if sign is not None else i
+        if j > 0:
+            gn = gq[..., i:i+1, :]
+            q_g = q_i * (gq_i - gn).exp()
+            k_g = k[..., :i, :] * (gn - gc[..., :i, :]).exp()
+            A[..., i:i+BC, :i] = q_g @ k_g.transpose(-1, -2)
+        # positions above the diagonal are masked before exp, their gate difference may overflow
+        mask = causal_mask[i:i+BC, j:i+BC, None]
+        decay = (gq_i[..., :, None, :] - gc[..., None, j:i+BC, :]).masked_fill(~mask, -float('inf')).exp()
+        if sign is not None:
+            decay = decay * sign[..., i:i+BC, None, :] * sign[..., None, j:i+BC, :]
+        A[..., i:i+BC, j:i+BC] = (q_i[..., :, None, :] * k[..., None, j:i+BC, :] * decay).sum(-1)
+    o = A @ v
+    if u is not None:
+        o = o + (q * u.to(dtype)[None, :, None, None, :] * k).sum(-1, keepdim=True) * v
+
+    # contribution of each chunk to the state at its end, and the decay of the state over the whole chunk
+    gl = gc[..., -1:, :]
+    k_decay = k * (gl - gc).exp()
+    decay_chunk = gl.exp()
+    q_decay = q * gq.exp()
+    if sign is not None:
+        k_decay = k_decay * sign * sign[..., -1:, :]
+        decay_chunk = decay_chunk * sign[..., -1:, :]
+        q_decay = q_decay * sign
+    kv = k_decay.transpose(-1, -2) @ v
+    decay_chunk = decay_chunk.transpose(-1, -2)
+
+    S = q.new_zeros(B, H, K, V)
+    if initial_state is not None:
+        S = S + initial_state.to(dtype)
+    states = []
+    for n in range(q.shape[2]):
+        states.append(S)
+        S = S * decay_chunk[:, :, n] + kv[:, :, n]
+    o = o + q_decay @ torch.stack(states, 2)
+
+    final_state = S if output_final_state else None
+    return rearrange(o, 'b h n c d -> b h (n c) d')[:, :, :T].to(orig_dtype), final_state
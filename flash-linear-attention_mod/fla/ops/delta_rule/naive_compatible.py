@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import torch
+import torch.nn.functional as F
 from einops import rearrange
 
 
@@ -37,55 +38,90 @@ def delta_rule_recurrence(q, k, v, beta, initial_state= None, output_final_state
     return o, final_state
 
 
-def delta_rule_chunkwise(q, k, v, beta, chunk_size=32, initial_state= None, output_final_state=False):
-    b, h, l, d_k = q.shape
+def delta_rule_chunk_step(q, k, v, beta, S):
+    """
+    One chunk of the delta rule starting from state S.
+    q is already scaled, q, k: (..., c, d_k), v: (..., c, d_v), beta: (..., c), S: (..., d_k, d_v).
+    Returns the chunk output (..., c, d_v) and the state after the chunk.
+    """
+    c = q.shape[-2]
     d_v = v.shape[-1]
-    q = q * (d_k ** -0.5)
-    v = v * beta[..., None]
     k_beta = k * beta[..., None]
-    
-    if chunk_size > l:
-        chunk_size = l
-
-    assert l % chunk_size == 0
-
-    # note that diagonal is masked.
-    mask = torch.triu(torch.ones(chunk_size, chunk_size, dtype=torch.bool, device=q.device), diagonal=0)
-    q, k, v, k_beta = map(lambda x: rearrange(x, 'b h (n c) d -> b h n c d', c=chunk_size), [q, k, v, k_beta])
-    attn = -(k_beta @ k.transpose(-1, -2)).masked_fill(mask, 0)
+    # WY representation: u = T v_beta, w = T k_beta with T = (I + tril(k_beta k^T, -1))^-1,
+    # computed as one unit lower triangular solve instead of forming T row by row
+    strict_lower = torch.tril(torch.ones(c, c, dtype=torch.bool, device=q.device), diagonal=-1)
+    A = (k_beta @ k.transpose(-1, -2)).masked_fill(~strict_lower, 0)
+    uw = torch.linalg.solve_triangular(
+        A, torch.cat([v * beta[..., None], k_beta], dim=-1), upper=False, unitriangular=True
+    )
+    u, w = uw[..., :d_v], uw[..., d_v:]
+
+    v_new = u - w @ S
+    attn = (q @ k.transpose(-1, -2)).masked_fill(strict_lower.T, 0)
+    o = q @ S + attn @ v_new
+    S = S + k.transpose(-1, -2) @ v_new
+    return o, S
+
+
+class DeltaRuleChunkwiseFunction(torch.autograd.Function):
+    """
+    Chunkwise delta rule over (b, h, n, c, d) inputs. Only the states at the chunk borders are stored,
+    the backward pass recomputes each chunk from its initial state.
+    """
+
+    @staticmethod
+    def forward(ctx, q, k, v, beta, initial_state):
+        S = initial_state
+        o, states = [], []
+        for i in range(q.shape[2]):
+            states.append(S)
+            o_i, S = delta_rule_chunk_step(q[:, :, i], k[:, :, i], v[:, :, i], beta[:, :, i], S)
+            o.append(o_i)
+        ctx.save_for_backward(q, k, v, beta, torch.stack(states, dim=2))
+        return torch.stack(o, dim=2), S
+
+    @staticmethod
+    def backward(ctx, do, dS):
+        q, k, v, beta, states = ctx.saved_tensors
+        dq, dk, dv, dbeta = map(torch.zeros_like, (q, k, v, beta))
+        if dS is None:
+            dS = torch.zeros_like(states[:, :, 0])
+        for i in reversed(range(q.shape[2])):
+            with torch.enable_grad():
+                inputs = [t[:, :, i].detach().requires_grad_(True) for t in (q, k, v, beta, states)]
+                o_i, S = delta_rule_chunk_step(*inputs)
+                grads = torch.autograd.grad((o_i, S), inputs, (do[:, :, i], dS))
+            dq[:, :, i], dk[:, :, i], dv[:, :, i], dbeta[:, :, i], dS = grads
+        return dq, dk, dv, dbeta, dS
 
-    for i in range(1, chunk_size):
-        attn[..., i, :i] = attn[..., i, :i] + (attn[..., i, :, None].clone() * attn[..., :, :i].clone()).sum(-2)
 
-    attn = attn + torch.eye(chunk_size, dtype=torch.float, device=q.device)
-    # u
-    k_cumsum = attn @ v
-    # w
-    k_cumdecay = attn @ k_beta
+def delta_rule_chunkwise(q, k, v, beta, chunk_size=32, initial_state= None, output_final_state=False):
+    b, h, l, d_k = q.shape
+    d_v = v.shape[-1]
+    dtype = v.dtype
+    chunk_size = min(chunk_size, l)
+    # padded timesteps have k = v = beta = 0, they neither read nor write the state
+    pad = -l % chunk_size
+    # the triangular solve needs at least single precision
+    cdtype = torch.promote_types(dtype, torch.float32)
+    q = q * (d_k ** -0.5)
+    q, k, v = map(lambda x: F.pad(x.to(cdtype), (0, 0, 0, pad)), [q, k, v])
+    beta = F.pad(beta.to(cdtype), (0, pad))
+    q, k, v = map(lambda x: rearrange(x, 'b h (n c) d -> b h n c d', c=chunk_size), [q, k, v])
+    beta = rearrange(beta, 'b h (n c) -> b h n c', c=chunk_size)
 
-    v = k_cumsum
     if initial_state is None:
-        S = k.new_zeros(b, h, d_k, d_v)
+        S = q.new_zeros(b, h, d_k, d_v)
     else:
-        S = initial_state
-        
-    o = torch.zeros_like(v)
-    mask = torch.triu(torch.ones(chunk_size, chunk_size, dtype=torch.bool, device=q.device), diagonal=1)
-    for i in range(0, l // chunk_size):
-        q_i, k_i, v_i = q[:, :, i], k[:, :, i], v[:, :, i]
-        attn = (q_i @ k_i.transpose(-1, -2)).masked_fill_(mask, 0)
-        v_prime = k_cumdecay[:, :, i] @ S
-        v_new = v_i - v_prime
-        o_inter = q_i @ S
-        o[:, :, i] = o_inter + attn @ v_new
-        # chunk state update
-        S = S + k_i.transpose(-1, -2) @ v_new
-        
+        S = initial_state.to(cdtype)
+
+    o, S = DeltaRuleChunkwiseFunction.apply(q, k, v, beta, S)
+
     final_state = None
     if output_final_state:
-        final_state = S
+        final_state = S.to(dtype)
 
-    return rearrange(o, 'b h n c d -> b h (n c) d'), final_state
+    return rearrange(o, 'b h n c d -> b h (n c) d')[:, :, :l].to(dtype), final_state
 
 
 
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import torch
+import torch.nn.functional as F
 from einops import rearrange
 
 def gla_mod_recurrent(
@@ -38,106 +39,67 @@ def gla_mod_recurrent(
         
     return o.to(orig_dtype), output_state
 
-def gla_mod_chunk(q, k, v, beta, chunk_size=64,
-                  initial_state=None, output_final_state=False,):
-    l = beta.shape[-2]
-    if chunk_size > l:
-        chunk_size = l
-    
-    assert l % chunk_size == 0    
-    
-    q, k, v, beta = map(lambda x: x.float(), (q, k, v, beta))
-    scale = (q.shape[-1] ** -0.5)
-    q = rearrange(q, 'b h (n c) d -> b h n c d', c=chunk_size) * scale
-    k = rearrange(k, 'b h (n c) d -> b h n c d', c=chunk_size)
-    v = rearrange(v, 'b h (n c) d -> b h n c d', c=chunk_size)
-    beta = rearrange(beta, 'b h (n c) -> b h n c', c=chunk_size)
-    gamma = 1 - beta
-    gamma = gamma.cumprod(-1)
-    kv = k.transpose(-1, -2) @ (v *  (gamma[:, :, :, -1, None]/gamma)[..., None])
-    
-    S = torch.zeros_like(kv)
-    if initial_state is not None:
-        S[:,:,0] = initial_state
-
-
-    for i in range(1, gamma.shape[-2]):
-        S[:, :, i] = S[:, :, i-1].clone() * gamma[:, :, i-1, -1, None, None] + kv[:, :, i-1]
+def segsum(x):
+    """
+    x: (..., c) -> (..., c, c) with entry (t, s) = sum_{s < r <= t} x_r for s <= t and -inf above the diagonal.
+    Summing the segments directly avoids differences of large cumulative sums.
+    """
+    c = x.shape[-1]
+    x = x[..., None].expand(*x.shape, c)  # entry (r, s) = x_r
+    x = x.masked_fill(~torch.tril(torch.ones(c, c, dtype=torch.bool, device=x.device), diagonal=-1), 0)
+    x_segsum = torch.cumsum(x, dim=-2)
+    return x_segsum.masked_fill(~torch.tril(torch.ones(c, c, dtype=torch.bool, device=x.device)), -float('inf'))
 
-    inter = (q * gamma[..., None]) @ S
-    attn = q @ k.transpose(-1, -2)
-    attn = attn * gamma[..., None]/gamma[..., None]
-    attn = attn.masked_fill(torch.triu(torch.ones(chunk_size, chunk_size, dtype=bool, device=q.device), diagonal=1), 0)
-    intra = attn @ v
-    o = inter + intra
-    
-    final_state = None
-    if output_final_state:
-        raise NotImplementedError
-    
-    return rearrange(o, 'b h n c d -> b h (n c) d'), final_state
-
-def stable_division(t1, t2):
-    if isinstance(t1, torch.Tensor) and isinstance(t2, torch.Tensor):
-        return torch.exp(t1-t2)
-    elif isinstance(t1, tuple) and isinstance(t2, tuple) and len(t1) == 2 and len(t2)==2:
-        t1_abs_log, t1_sign = t1[0], t1[1]
-        t2_abs_log, t2_sign = t2[0], t2[1]
 
-        
-        return torch.exp(t1_abs_log - t2_abs_log) * t1_sign/t2_sign
-    else:
-        NotImplementedError
- 
-
-def gla_mod_chunk_log_space(q, k, v, beta, chunk_size=64,
+def gla_mod_chunk(q, k, v, beta, chunk_size=64,
                   initial_state=None, output_final_state=False,):
-    l = beta.shape[-2]
-    if chunk_size > l:
-        chunk_size = l
-    
-    assert l % chunk_size == 0    
-    
+    """
+    Chunkwise form of `gla_mod_recurrent`, h_t = (1 - beta_t) h_{t-1} + k_t v_t^T.
+    The decay gamma = 1 - beta may be negative (beta in [0, 2]), so products of decays are tracked as a sign
+    (parity of negative factors) and a log magnitude, which neither overflows nor divides by near-zero decays.
+    """
+    orig_dtype = q.dtype
+    b, h, l, d_k = q.shape
+    d_v = v.shape[-1]
+    chunk_size = min(chunk_size, l)
+    # padded timesteps have k = v = 0 and decay 1, they neither read nor write the state
+    pad = -l % chunk_size
+
     q, k, v, beta = map(lambda x: x.float(), (q, k, v, beta))
-    scale = (q.shape[-1] ** -0.5)
+    q, k, v = map(lambda x: F.pad(x, (0, 0, 0, pad)), (q, k, v))
+    beta = F.pad(beta, (0, pad))
+    scale = (d_k ** -0.5)
     q = rearrange(q, 'b h (n c) d -> b h n c d', c=chunk_size) * scale
     k = rearrange(k, 'b h (n c) d -> b h n c d', c=chunk_size)
     v = rearrange(v, 'b h (n c) d -> b h n c d', c=chunk_size)
     beta = rearrange(beta, 'b h (n c) -> b h n c', c=chunk_size)
-    gamma = 1 - beta
 
-    gamma_abs_log = gamma.abs().log()
-    gamma_sign = torch.sign(gamma)
-    gamma_abs_log = gamma_abs_log.cumsum(-1)
-    # gamma_sign = gamma_sign.cumprod(-1)
-    gamma_sign = (gamma_sign == -1).to(torch.bool).cumsum(dim=-1)
-    gamma_sign = torch.where( gamma_sign == 1, -1, 1).float()
-    gamma = (gamma_abs_log, gamma_sign)
-    
-    gamma_div_1 = stable_division((gamma[0][:, :, :, -1, None], gamma[1]), (gamma[0][:, :, :, -1, None], gamma[1]))[..., None]
-    kv = k.transpose(-1, -2) @ (v *  gamma_div_1)
-    
-    S = torch.zeros_like(kv)
+    gamma = 1 - beta
+    # a decay of exactly 0 gets a finite log magnitude, exp of it (and its gradient) is 0
+    gamma_log = gamma.abs().clamp_min(torch.finfo(gamma.dtype).tiny).log()
+    gamma_sign = torch.where(gamma < 0, -1., 1.).cumprod(-1)  # (b, h, n, c), sign of the decay since chunk start
+    gamma_cum = gamma_sign * gamma_log.cumsum(-1).exp()  # decay from the chunk start to t
+    # decay from s to t within the chunk, 0 for s > t
+    decay = gamma_sign[..., :, None] * gamma_sign[..., None, :] * segsum(gamma_log).exp()  # (b, h, n, c, c)
+
+    intra = ((q @ k.transpose(-1, -2)) * decay) @ v
+    # contribution of each chunk to the state at its end
+    kv = (k * decay[..., -1, :, None]).transpose(-1, -2) @ v  # (b, h, n, d_k, d_v)
+
+    S = q.new_zeros(b, h, d_k, d_v)
     if initial_state is not None:
-        S[:,:,0] = initial_state
-
-    for i in range(1, gamma[0].shape[-2]):
-        S[:, :, i] = S[:, :, i-1].clone() * gamma[1][:, :, i-1, -1, None, None] * torch.exp(gamma[0][:, :, i-1, -1, None, None]) + kv[:, :, i-1]
-
-    inter = (q * gamma_sign[..., None] * torch.exp(gamma_abs_log[..., None])) @ S
-    attn = q @ k.transpose(-1,-2)
-    gamma_div_2 = stable_division((gamma[0][..., None], gamma[1][..., None]), (gamma[0][..., None], gamma[1][..., None]))
-    attn = attn * gamma_div_2
-    attn = attn.masked_fill(torch.triu(torch.ones(chunk_size, chunk_size, dtype=bool, device=q.device), diagonal=1), 0)
-    intra = attn @ v
-    o = inter + intra
-    
+        S = S + initial_state.float()
+    inter = []
+    for i in range(q.shape[2]):
+        inter.append((q[:, :, i] * gamma_cum[:, :, i, :, None]) @ S)
+        S = S * gamma_cum[:, :, i, -1, None, None] + kv[:, :, i]
+    o = torch.stack(inter, dim=2) + intra
+
     final_state = None
     if output_final_state:
-        raise NotImplementedError
-    
-    return rearrange(o, 'b h n c d -> b h (n c) d'), final_state
+        final_state = S
 
+    return rearrange(o, 'b h n c d -> b h (n c) d')[:, :, :l].to(orig_dtype), final_state
 
 
 if __name__ == '__main__':
@@ -164,7 +126,7 @@ if __name__ == '__main__':
     beta_grad, beta.grad = beta.grad.clone(), None
 
 
-    for m in [gla_mod_chunk_log_space, gla_mod_chunk]:
+    for m in [gla_mod_chunk]:
         print(f"Testing {m}")
 
         # Create CUDA events to measure time
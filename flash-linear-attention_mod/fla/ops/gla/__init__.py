@@ -2,10 +2,12 @@
 
 from .chunk import chunk_gla
 from .chunk_fuse import fused_chunk_gla
+from .chunk_torch import chunk_gla_torch
 from .recurrent_fuse import fused_recurrent_gla
 
 __all__ = [
     'chunk_gla',
     'fused_chunk_gla',
+    'chunk_gla_torch',
     'fused_recurrent_gla'
 ]
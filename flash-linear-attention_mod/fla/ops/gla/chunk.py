@@ -10,6 +10,7 @@ import triton.language as tl
 
 from fla.ops.utils import chunk_global_reversed_cumsum, chunk_local_cumsum
 from fla.ops.common.chunk_h import chunk_fwd_h_fn, chunk_bwd_dh_fn
+from fla.ops.gla.chunk_torch import chunk_gla_torch
 from fla.utils import contiguous
 
 
@@ -487,5 +488,7 @@ def chunk_gla(
     assert checkpoint_level in [0, 1, 2]
     if scale is None:
         scale = q.shape[-1] ** -0.5
+    if not q.is_cuda:
+        return chunk_gla_torch(q, k, v, g, scale, initial_state, output_final_state)
     o, final_state = ChunkGLAFunction.apply(q, k, v, g, scale, initial_state, output_final_state, checkpoint_level)
     return o, final_state
@@ -15,6 +15,7 @@ from packaging import version
 
 from fla.ops.gla.chunk_util import (bwd_decay_global_cumsum, fwd_decay_cumsum,
                                     prepare_qg_kg)
+from fla.ops.gla.chunk_torch import chunk_gla_torch
 from fla.utils import autocast_custom_bwd, autocast_custom_fwd, contiguous
 
 
@@ -528,6 +529,8 @@ def fused_chunk_gla(
         scale = q.shape[-1] ** -0.5
     if initial_state is not None:
         initial_state = initial_state.detach()
+    if not q.is_cuda:
+        return chunk_gla_torch(q, k, v, g, scale, initial_state, output_final_state)
     seq_len = q.shape[-2]
     q, k, v, g = map(lambda x: pad(x), [q, k, v, g])
     o, final_state = FusedChunkGLAFunction.apply(
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+
+from typing import Optional, Tuple
+
+import torch
+
+from fla.ops.common.chunk_torch import chunk_gated_linear_attn_torch
+
+
+def chunk_gla_torch(
+    q: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    g: torch.Tensor,
+    scale: Optional[int] = None,
+    initial_state: torch.Tensor = None,
+    output_final_state: bool = False,
+    checkpoint_level: Optional[int] = 2,
+    use_negative_gates: bool = False,
+    chunk_size: int = 64
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    r"""
+    Pure PyTorch version of `chunk_gla`, used on devices without Triton kernels.
+    `checkpoint_level` is accepted for compatibility only, gradients come from autograd.
+    With `use_negative_gates`, the decays are 2 * exp(g) - 1 as in `fused_recurrent_gla`.
+    """
+    if scale is None:
+        scale = q.shape[-1] ** -0.5
+    return chunk_gated_linear_attn_torch(
+        q, k, v, g, scale, initial_state, output_final_state,
+        use_negative_gates=use_negative_gates, chunk_size=chunk_size
+    )
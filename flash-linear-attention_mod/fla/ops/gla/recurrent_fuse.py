@@ -9,6 +9,7 @@ import triton
 import triton.language as tl
 from fla.utils import autocast_custom_bwd, autocast_custom_fwd, contiguous
 from fla.ops.common.fused_recurrent import fused_recurrent 
+from fla.ops.gla.chunk_torch import chunk_gla_torch
 
 def fused_recurrent_gla(
     q: torch.Tensor,
@@ -24,5 +25,8 @@ def fused_recurrent_gla(
 ) -> Tuple[torch.Tensor, torch.Tensor]:
     if scale is None:
         scale = q.shape[-1] ** -0.5
+    if not q.is_cuda and gk is not None and gv is None and not reverse:
+        return chunk_gla_torch(q, k, v, gk, scale, initial_state, output_final_state,
+                               use_negative_gates=use_negative_gates)
     o, final_state = fused_recurrent(q, k, v, None, gk, gv, scale, initial_state, output_final_state, reverse, use_negative_gates)
     return o, final_state
\ No newline at end of file
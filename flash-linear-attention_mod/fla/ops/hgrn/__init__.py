@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from .chunk import chunk_hgrn
+from .chunk_torch import chunk_hgrn_torch
 from .recurrent_fuse import fused_recurrent_hgrn
 
 __all__ = [
     'chunk_hgrn',
+    'chunk_hgrn_torch',
     'fused_recurrent_hgrn'
 ]
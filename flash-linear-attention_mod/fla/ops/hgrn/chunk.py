@@ -25,6 +25,7 @@ import torch
 import triton
 import triton.language as tl
 
+from fla.ops.hgrn.chunk_torch import chunk_hgrn_torch
 from fla.utils import contiguous
 
 
@@ -287,4 +288,6 @@ def chunk_hgrn(
     initial_state: torch.Tensor = None,
     output_final_state: bool = False
 ) -> Tuple[torch.Tensor, torch.Tensor]:
+    if not x.is_cuda:
+        return chunk_hgrn_torch(x, g, initial_state, output_final_state)
     return ChunkHGRNFunction.apply(x, g, initial_state, output_final_state)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+from typing import Tuple
+
+import torch
+import torch.nn.functional as F
+from einops import rearrange
+
+
+def chunk_hgrn_torch(
+    x: torch.Tensor,
+    g: torch.Tensor,
+    initial_state: torch.Tensor = None,
+    output_final_state: bool = False,
+    chunk_size: int = 64
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    r"""
+    Pure PyTorch version of `chunk_hgrn`, used on devices without Triton kernels.
+    The recurrence h_t = exp(g_t) * h_t-1 + x_t is first run inside all chunks at once from a zero state,
+    then the states at the chunk borders are carried over, i.e. chunk_size + T / chunk_size sequential steps.
+    """
+    dtype = x.dtype
+    # float64 inputs are kept in float64, lower precisions are computed in float32
+    compute_dtype = torch.promote_types(dtype, torch.float32)
+    B, H, T, D = x.shape
+    BT = min(chunk_size, T)
+    # padded timesteps have x = 0 and decay 1
+    pad = -T % BT
+    x, g = map(lambda i: rearrange(F.pad(i.to(compute_dtype), (0, 0, 0, pad)), 'b h (n c) d -> b h n c d', c=BT),
+               (x, g))
+
+    h = x.new_zeros(B, H, x.shape[2], D)
+    o = []
+    for i in range(BT):
+        h = g[:, :, :, i].exp() * h + x[:, :, :, i]
+        o.append(h)
+    o = torch.stack(o, 3)
+
+    # decay from the chunk start to t
+    gc = g.cumsum(3).exp()
+    h = x.new_zeros(B, H, D)
+    if initial_state is not None:
+        h = h + initial_state.to(compute_dtype)
+    states = []
+    for n in range(x.shape[2]):
+        states.append(h)
+        h = gc[:, :, n, -1] * h + o[:, :, n, -1]
+    o = o + gc * torch.stack(states, 2)[:, :, :, None]
+
+    final_state = h if output_final_state else None
+    return rearrange(o, 'b h n c d -> b h (n c) d')[:, :, :T].to(dtype), final_state
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+import functools
+import importlib.util
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import torch
+from transformers.utils import logging
+
+from fla.ops.delta_rule import (chunk_delta_rule, delta_rule_chunkwise,
+                                delta_rule_recurrence, fused_chunk_delta_rule,
+                                fused_recurrent_delta_rule, gla_mod_chunk,
+                                gla_mod_recurrent)
+
+logger = logging.get_logger(__name__)
+
+
+@functools.lru_cache(maxsize=None)
+def is_triton_available() -> bool:
+    return importlib.util.find_spec('triton') is not None
+
+
+@dataclass(frozen=True)
+class OpBackend:
+    """
+    One implementation (mode) of an op family.
+    All backends of a family share the call signature of the family, see the `register_op` calls below.
+
+    Args:
+        fn: the implementation.
+        devices: device types it runs on, `None` for any.
+        dtypes: input dtypes it supports, `None` for any.
+        triton: whether it is a Triton kernel.
+        recurrent: whether it steps through time, preferred by `auto` when decoding single tokens.
+        supports: predicate on the shape arguments of `resolve_op` (e.g. head_dim, chunk_size).
+    """
+    fn: Callable
+    devices: Optional[Tuple[str, ...]] = None
+    dtypes: Optional[Tuple[torch.dtype, ...]] = None
+    triton: bool = False
+    recurrent: bool = False
+    supports: Optional[Callable[..., bool]] = None
+
+    def is_available(self, device_type: str, dtype: torch.dtype, **shapes) -> bool:
+        if self.devices is not None and device_type not in self.devices:
+            return False
+        if self.dtypes is not None and dtype not in self.dtypes:
+            return False
+        if self.triton and not is_triton_available():
+            return False
+        return self.supports is None or self.supports(**shapes)
+
+
+# op family -> mode -> backend
+op_registry: Dict[str, Dict[str, OpBackend]] = {}
+# op family -> modes in order of preference, which is the order of the `register_op` calls: the Triton kernels
+# before the PyTorch implementations, chunked before recurrent. `auto` takes the first available one,
+# an unavailable mode falls back to the first available one after it.
+op_fallback_order: Dict[str, List[str]] = {}
+
+
+def register_op(family: str, mode: str, backend: OpBackend):
+    op_registry.setdefault(family, {})[mode] = backend
+    op_fallback_order.setdefault(family, []).append(mode)
+
+
+def resolve_op(family: str, mode: str, device: torch.device, dtype: torch.dtype, **shapes) -> Tuple[str, Callable]:
+    """
+    Returns the mode and implementation of `family` to run for inputs on `device` with `dtype`.
+    `mode` is either a registered mode or `auto`. The shape arguments are passed to the `supports` predicates,
+    `decoding=True` makes `auto` prefer the recurrent modes. The choice is cached and logged once per
+    (family, mode, device, dtype, shapes), so the shapes should not include the sequence length.
+    """
+    device_type = device.type if isinstance(device, torch.device) else torch.device(device).type
+    return _resolve_op(family, mode, device_type, dtype, tuple(sorted(shapes.items())))
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_op(family: str, mode: str, device_type: str, dtype: torch.dtype, shapes: tuple) -> Tuple[str, Callable]:
+    if family not in op_registry:
+        raise ValueError(f"Unknown op family `{family}`, available: {list(op_registry)}.")
+    backends, order = op_registry[family], op_fallback_order[family]
+    if mode == 'auto':
+        candidates = order
+        if dict(shapes).get('decoding', False):
+            candidates = sorted(order, key=lambda m: not backends[m].recurrent)
+    elif mode in backends:
+        candidates = [mode] + order[order.index(mode) + 1:]
+    else:
+        raise ValueError(f"Not supported mode `{mode}` for `{family}`, available: {order + ['auto']}.")
+
+    for candidate in candidates:
+        if backends[candidate].is_available(device_type, dtype, **dict(shapes)):
+            if mode == 'auto':
+                logger.info(f"`{family}`: using mode `{candidate}` for {device_type}/{dtype} with {dict(shapes)}.")
+            elif candidate != mode:
+                logger.warning(f"`{family}`: mode `{mode}` is not available for {device_type}/{dtype} "
+                               f"with {dict(shapes)}, falling back to `{candidate}`.")
+            return candidate, backends[candidate].fn
+    raise RuntimeError(f"No mode of `{family}` is available for {device_type}/{dtype} with {dict(shapes)}.")
+
+
+def _triton_chunk_supports(head_dim: int, chunk_size: int, **kwargs) -> bool:
+    return head_dim <= 256 and chunk_size in [16, 32, 64]
+
+
+# delta rule: fn(q, k, v, beta, chunk_size, initial_state, output_final_state) -> (o, final_state)
+register_op('delta_rule', 'chunk', OpBackend(
+    lambda q, k, v, beta, chunk_size, initial_state, output_final_state:
+        chunk_delta_rule(q, k, v, beta, chunk_size, initial_state, output_final_state),
+    devices=('cuda',), triton=True, supports=_triton_chunk_supports
+))
+register_op('delta_rule', 'fused_chunk', OpBackend(
+    lambda q, k, v, beta, chunk_size, initial_state, output_final_state:
+        fused_chunk_delta_rule(q, k, v, beta, chunk_size, initial_state, output_final_state),
+    devices=('cuda',), triton=True, supports=_triton_chunk_supports
+))
+register_op('delta_rule', 'fused_recurrent', OpBackend(
+    lambda q, k, v, beta, chunk_size, initial_state, output_final_state:
+        fused_recurrent_delta_rule(q, k, v, beta, initial_state=initial_state, output_final_state=output_final_state),
+    devices=('cuda',), triton=True, recurrent=True
+))
+register_op('delta_rule', 'naive_chunk', OpBackend(
+    lambda q, k, v, beta, chunk_size, initial_state, output_final_state:
+        delta_rule_chunkwise(q, k, v, beta, chunk_size, initial_state, output_final_state)
+))
+register_op('delta_rule', 'naive', OpBackend(
+    lambda q, k, v, beta, chunk_size, initial_state, output_final_state:
+        delta_rule_recurrence(q, k, v, beta, initial_state, output_final_state),
+    recurrent=True
+))
+
+# GLA with the decays 1 - beta, same signature as the delta rule
+register_op('gla_mod', 'gla_mod_chunk', OpBackend(
+    lambda q, k, v, beta, chunk_size, initial_state, output_final_state:
+        gla_mod_chunk(q, k, v, beta, chunk_size, initial_state, output_final_state)
+))
+register_op('gla_mod', 'gla_mod_recurrent', OpBackend(
+    lambda q, k, v, beta, chunk_size, initial_state, output_final_state:
+        gla_mod_recurrent(q, k, v, beta, initial_state, output_final_state),
+    recurrent=True
+))
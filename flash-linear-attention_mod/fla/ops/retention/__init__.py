@@ -2,11 +2,13 @@
 
 from .chunk import chunk_retention
 from .chunk_fuse import fused_chunk_retention
+from .chunk_torch import chunk_retention_torch
 from .parallel import parallel_retention
 from .recurrent_fuse import fused_recurrent_retention
 
 __all__ = [
     'chunk_retention',
+    'chunk_retention_torch',
     'fused_chunk_retention',
     'parallel_retention',
     'fused_recurrent_retention'
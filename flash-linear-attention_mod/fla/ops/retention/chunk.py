@@ -7,6 +7,7 @@ import torch
 import triton
 import triton.language as tl
 
+from fla.ops.retention.chunk_torch import chunk_retention_torch
 from fla.utils import autocast_custom_bwd, autocast_custom_fwd, contiguous
 
 
@@ -433,6 +434,8 @@ def chunk_retention(
     assert q.dtype == k.dtype == v.dtype, "q, k, v must have the same dtype"
     if scale is None:
         scale = q.size(-1) ** -0.5
+    if not q.is_cuda:
+        return chunk_retention_torch(q, k, v, initial_state, output_final_state, scale)
     o, final_state = ChunkRetentionFunction.apply(
         q, k, v, initial_state, output_final_state, scale, checkpoint_level)
     return o, final_state
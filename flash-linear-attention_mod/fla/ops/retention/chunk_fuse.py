@@ -8,6 +8,7 @@ import triton
 import triton.language as tl
 from packaging import version
 
+from fla.ops.retention.chunk_torch import chunk_retention_torch
 from fla.utils import autocast_custom_bwd, autocast_custom_fwd, contiguous
 
 # on-the-fly computation without materializing hidden statets into HBMs
@@ -323,5 +324,7 @@ def fused_chunk_retention(
     initial_state: torch.Tensor = None,
     output_final_state: bool = False
 ) -> Tuple[torch.Tensor, torch.Tensor]:
+    if not q.is_cuda:
+        return chunk_retention_torch(q, k, v, initial_state, output_final_state)
     o, final_state = FusedChunkRetentionFunction.apply(q, k, v, initial_state, output_final_state)
     return o, final_state
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+from typing import Tuple
+
+import torch
+
+from fla.ops.common.chunk_torch import chunk_gated_linear_attn_torch
+
+
+def chunk_retention_torch(
+    q: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    initial_state: torch.Tensor = None,
+    output_final_state: bool = False,
+    scale: float = None,
+    checkpoint_level: int = 1,
+    chunk_size: int = 64
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    r"""
+    Pure PyTorch version of `chunk_retention`, used on devices without Triton kernels.
+    `checkpoint_level` is accepted for compatibility only, gradients come from autograd.
+    """
+    B, H, T, _ = q.shape
+    if scale is None:
+        scale = q.shape[-1] ** -0.5
+    # the fixed decay 1 - 2^(-5 - h) of head h
+    g = (1 - q.new_tensor(2., dtype=torch.float).pow(-5. - q.new_tensor(range(H), dtype=torch.float))).log()
+    g = g.view(1, H, 1, 1).expand(B, H, T, 1)
+    return chunk_gated_linear_attn_torch(q, k, v, g, scale, initial_state, output_final_state, chunk_size=chunk_size)
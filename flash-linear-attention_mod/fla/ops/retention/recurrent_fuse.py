@@ -7,6 +7,7 @@ import torch
 import triton
 import triton.language as tl
 
+from fla.ops.retention.chunk_torch import chunk_retention_torch
 from fla.utils import contiguous
 
 # on-the-fly computation without materializing hidden statets into HBMs
@@ -277,5 +278,7 @@ def fused_recurrent_retention(
 ) -> Tuple[torch.Tensor, torch.Tensor]:
     if initial_state is not None:
         initial_state = initial_state.detach()
+    if not q.is_cuda:
+        return chunk_retention_torch(q, k, v, initial_state, output_final_state)
     o, final_state = FusedRecurrentRetentionFunction.apply(q, k, v, initial_state, output_final_state)
     return o, final_state
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 
 from .chunk import chunk_rwkv6
+from .chunk_torch import chunk_rwkv6_torch
 from .recurrent_fuse import fused_recurrent_rwkv6
 
 __all__ = [
     'chunk_rwkv6',
+    'chunk_rwkv6_torch',
     'fused_recurrent_rwkv6'
 ]
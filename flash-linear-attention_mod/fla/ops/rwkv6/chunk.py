@@ -8,6 +8,7 @@ import torch
 import triton
 import triton.language as tl
 
+from fla.ops.rwkv6.chunk_torch import chunk_rwkv6_torch
 from fla.ops.utils import chunk_global_reversed_cumsum
 from fla.utils import contiguous
 
@@ -839,6 +840,8 @@ def chunk_rwkv6(
     assert checkpoint_level in [0, 1]
     if scale is None:
         scale = r.shape[-1] ** -0.5
+    if not r.is_cuda:
+        return chunk_rwkv6_torch(r, k, v, g, u, scale, initial_state, output_final_state)
     o, final_state = ChunkRWKV6Function.apply(r, k, v, g, u, scale, initial_state, output_final_state, checkpoint_level)
     return o, final_state
 
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+from typing import Optional, Tuple
+
+import torch
+
+from fla.ops.common.chunk_torch import chunk_gated_linear_attn_torch
+
+
+def chunk_rwkv6_torch(
+    r: torch.Tensor,
+    k: torch.Tensor,
+    v: torch.Tensor,
+    g: torch.Tensor,
+    u: torch.Tensor,
+    scale: Optional[int] = None,
+    initial_state: torch.Tensor = None,
+    output_final_state: bool = False,
+    checkpoint_level: Optional[int] = 0,
+    chunk_size: int = 64
+) -> Tuple[torch.Tensor, torch.Tensor]:
+    r"""
+    Pure PyTorch version of `chunk_rwkv6`, used on devices without Triton kernels.
+    `checkpoint_level` is accepted for compatibility only, gradients come from autograd.
+    """
+    if scale is None:
+        scale = r.shape[-1] ** -0.5
+    return chunk_gated_linear_attn_torch(
+        r, k, v, g, scale, initial_state, output_final_state, u=u, chunk_size=chunk_size
+    )
@@ -8,6 +8,7 @@ import torch
 import triton
 import triton.language as tl
 
+from fla.ops.rwkv6.chunk_torch import chunk_rwkv6_torch
 from fla.ops.utils import chunk_global_reversed_cumsum
 from fla.utils import autocast_custom_bwd, autocast_custom_fwd, contiguous
 
@@ -364,5 +365,7 @@ def fused_recurrent_rwkv6(
     """
     if scale == -1:
         scale = r.shape[-1] ** -0.5
+    if not r.is_cuda:
+        return chunk_rwkv6_torch(r, k, v, w, u, scale, initial_state, output_final_state)
     o, final_state = FusedRecurrentRWKV6Function.apply(r, k, v, w, u, scale, initial_state, output_final_state)
     return o, final_state
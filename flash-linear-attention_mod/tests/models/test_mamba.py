@@ -0,0 +1,29 @@
+import pytest
+import torch
+
+from fla.models.mamba.configuration_mamba import MambaConfig
+from fla.models.mamba.modeling_mamba import MambaCache, MambaMixer
+
+
+@pytest.mark.parametrize("prompt_len", [2, 5])
+def test_static_decode(prompt_len):
+    torch.manual_seed(42)
+    batch_size, seq_len = 2, 12
+    mixers, caches = [], []
+    for static_decode in (False, True):
+        config = MambaConfig(hidden_size=16, state_size=4, num_hidden_layers=1, static_decode=static_decode)
+        mixers.append(MambaMixer(config, layer_idx=0))
+        caches.append(MambaCache(config, batch_size, dtype=torch.float32))
+    mixers[1].load_state_dict(mixers[0].state_dict())
+    x = torch.randn(batch_size, seq_len, 16)
+
+    with torch.no_grad():
+        ref = mixers[0].slow_forward(x)
+        for mixer, cache in zip(mixers, caches):
+            outputs = [mixer.slow_forward(x[:, :prompt_len], cache_params=cache)]
+            cache.seqlen_offset += prompt_len
+            for t in range(prompt_len, seq_len):
+                outputs.append(mixer.slow_forward(x[:, t:t+1], cache_params=cache))
+                cache.seqlen_offset += 1
+            assert torch.allclose(ref, torch.cat(outputs, 1), atol=1e-5)
+    assert torch.allclose(caches[0].ssm_states[0], caches[1].ssm_states[0], atol=1e-5)
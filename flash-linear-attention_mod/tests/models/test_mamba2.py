@@ -0,0 +1,69 @@
+import pytest
+import torch
+
+from fla.models.mamba2.configuration_mamba2 import Mamba2Config
+from fla.models.mamba2.modeling_mamba2 import (Mamba2Cache, Mamba2Mixer,
+                                               ssd_chunk_scan)
+
+
+def naive_recurrent_ssd(x, A, B, C, initial_states, positive_and_negative):
+    transitions = torch.exp(A)
+    if positive_and_negative:
+        transitions = 2 * transitions - 1
+    h = initial_states
+    ys = []
+    for t in range(x.shape[1]):
+        h = transitions[:, t, :, None, None] * h + x[:, t, :, :, None] * B[:, t, :, None, :]
+        ys.append((h * C[:, t, :, None, :]).sum(-1))
+    return torch.stack(ys, 1), h
+
+
+@pytest.mark.parametrize("positive_and_negative", [False, True])
+@pytest.mark.parametrize("seq_len", [1, 50, 64])
+def test_ssd_chunk_scan(positive_and_negative, seq_len):
+    torch.manual_seed(42)
+    batch_size, num_heads, head_dim, state_size, chunk_size = 2, 3, 8, 4, 16
+    x = torch.randn(batch_size, seq_len, num_heads, head_dim, dtype=torch.float64)
+    # large steps give transitions close to -1 with positive_and_negative
+    A = -torch.rand(batch_size, seq_len, num_heads, dtype=torch.float64) * 4
+    B = torch.randn(batch_size, seq_len, num_heads, state_size, dtype=torch.float64)
+    C = torch.randn(batch_size, seq_len, num_heads, state_size, dtype=torch.float64)
+    h0 = torch.randn(batch_size, num_heads, head_dim, state_size, dtype=torch.float64)
+    inputs = [t.requires_grad_() for t in (x, A, B, C, h0)]
+
+    ref, ref_ht = naive_recurrent_ssd(*inputs, positive_and_negative)
+    y, ht = ssd_chunk_scan(x, A, B, C, chunk_size, h0, positive_and_negative)
+    assert torch.allclose(ref, y)
+    assert torch.allclose(ref_ht, ht)
+
+    do, dht = torch.randn_like(ref), torch.randn_like(ref_ht)
+    ref_grads = torch.autograd.grad((ref * do).sum() + (ref_ht * dht).sum(), inputs)
+    grads = torch.autograd.grad((y * do).sum() + (ht * dht).sum(), inputs)
+    for name, ref_grad, grad in zip(["dx", "dA", "dB", "dC", "dh0"], ref_grads, grads):
+        assert torch.allclose(ref_grad, grad), name
+
+
+@pytest.mark.parametrize("positive_and_negative", [False, True])
+@pytest.mark.parametrize("prompt_len", [2, 5])
+def test_static_decode(positive_and_negative, prompt_len):
+    torch.manual_seed(42)
+    batch_size, seq_len = 2, 12
+    mixers, caches = [], []
+    for static_decode in (False, True):
+        config = Mamba2Config(num_heads=4, head_dim=8, hidden_size=16, state_size=8, num_hidden_layers=1, n_groups=2,
+                              chunk_size=4, positive_and_negative=positive_and_negative, static_decode=static_decode)
+        mixers.append(Mamba2Mixer(config, layer_idx=0))
+        caches.append(Mamba2Cache(config, batch_size, dtype=torch.float32))
+    mixers[1].load_state_dict(mixers[0].state_dict())
+    x = torch.randn(batch_size, seq_len, 16)
+
+    with torch.no_grad():
+        ref = mixers[0].torch_forward(x)
+        for mixer, cache in zip(mixers, caches):
+            outputs = [mixer.torch_forward(x[:, :prompt_len], cache_params=cache)]
+            cache.seqlen_offset += prompt_len
+            for t in range(prompt_len, seq_len):
+                outputs.append(mixer.torch_forward(x[:, t:t+1], cache_params=cache))
+                cache.seqlen_offset += 1
+            assert torch.allclose(ref, torch.cat(outputs, 1), atol=1e-5)
+    assert torch.allclose(caches[0].ssm_states[0], caches[1].ssm_states[0], atol=1e-5)
@@ -0,0 +1,26 @@
+import pytest
+import torch
+
+from fla.models.mamba_py.mamba_mod import MambaLM, MambaLMConfig
+
+
+@pytest.mark.parametrize("positive_and_negative", [False, True])
+@pytest.mark.parametrize("seq_length", [5, 37])
+def test_chunked_scan_matches_pscan(positive_and_negative, seq_length):
+    torch.manual_seed(42)
+    config = MambaLMConfig(d_model=32, n_layers=2, positive_and_negative=positive_and_negative)
+    model = MambaLM(config, vocab_size=50, embedding_dim=32)
+    chunked_config = MambaLMConfig(d_model=32, n_layers=2, positive_and_negative=positive_and_negative,
+                                   chunked_scan=True, scan_chunk_size=8)
+    chunked_model = MambaLM(chunked_config, vocab_size=50, embedding_dim=32)
+    chunked_model.load_state_dict(model.state_dict())
+
+    input_ids = torch.randint(0, 50, (2, seq_length))
+    logits = model(input_ids)
+    chunked_logits = chunked_model(input_ids)
+    assert torch.allclose(logits, chunked_logits, rtol=1e-4, atol=1e-5)
+
+    logits.sum().backward()
+    chunked_logits.sum().backward()
+    for (name, param), chunked_param in zip(model.named_parameters(), chunked_model.parameters()):
+        assert torch.allclose(param.grad, chunked_param.grad, rtol=1e-3, atol=1e-5), name
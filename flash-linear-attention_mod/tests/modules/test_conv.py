@@ -3,7 +3,7 @@
 import pytest
 import torch
 
-from fla.modules.convolution import ShortConvolution
+from fla.modules.convolution import ShortConvolution, fused_short_convolution
 
 
 @pytest.mark.parametrize("batch_size", [4])
@@ -46,3 +46,44 @@ def test_shortconv_cache(batch_size: int, seq_len: int, hidden_size: int, kernel
         assert torch.allclose(cache_naive, cache_causal), f"Step {i}\n{cache_naive}\n{cache_causal}"
         assert torch.allclose(y_naive, y[:, i]), f"Step {i}\n{y[:, i]}\n{naive_conv}:\n{y_naive}\n{causal_conv}:\n{y_causal}"
         assert torch.allclose(y_causal, y[:, i]), f"Step {i}\n{y[:, i]}\n{naive_conv}:\n{y_naive}\n{causal_conv}:\n{y_causal}"
+
+
+@pytest.mark.parametrize("batch_size", [2])
+@pytest.mark.parametrize("seq_len", [1, 3, 17])
+@pytest.mark.parametrize("hidden_size", [16])
+@pytest.mark.parametrize("kernel_size", [4])
+@pytest.mark.parametrize("bias", [False, True])
+def test_shortconv_ring_cache(batch_size: int, seq_len: int, hidden_size: int, kernel_size: int, bias: bool):
+    torch.manual_seed(42)
+    conv = ShortConvolution(hidden_size, kernel_size, bias=bias, activation='silu')
+    x = torch.randn(batch_size, 2 * seq_len + 5, hidden_size)
+    ref = conv(x)
+
+    # prefill in two parts, then decode token by token
+    cache, position = conv.init_state(batch_size)
+    ys = [conv(x[:, :seq_len], cache=cache, position=position),
+          conv(x[:, seq_len:2 * seq_len], cache=cache, position=position)]
+    for i in range(2 * seq_len, x.shape[1]):
+        ys.append(conv(x[:, i:i+1], cache=cache, position=position))
+    assert torch.allclose(ref, torch.cat(ys, 1), atol=1e-6)
+    assert position.eq(x.shape[1]).all()
+
+
+@pytest.mark.parametrize("batch_size", [2])
+@pytest.mark.parametrize("seq_len", [9])
+@pytest.mark.parametrize("kernel_size", [4])
+def test_fused_shortconv(batch_size: int, seq_len: int, kernel_size: int):
+    torch.manual_seed(42)
+    convs = (ShortConvolution(8, kernel_size, activation='silu'),
+             ShortConvolution(8, kernel_size, activation=None),
+             ShortConvolution(12, kernel_size, bias=True, activation='silu'))
+    xs = [torch.randn(batch_size, seq_len, conv.hidden_size) for conv in convs]
+    refs = [conv(x) for conv, x in zip(convs, xs)]
+
+    cache = xs[0].new_zeros(batch_size, 28, kernel_size)
+    position = cache.new_zeros(batch_size, dtype=torch.long)
+    ys = [fused_short_convolution(convs, [x[:, :5] for x in xs], cache=cache, position=position)]
+    for i in range(5, seq_len):
+        ys.append(fused_short_convolution(convs, [x[:, i:i+1] for x in xs], cache=cache, position=position))
+    for j, ref in enumerate(refs):
+        assert torch.allclose(ref, torch.cat([y[j] for y in ys], 1), atol=1e-6)
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+import torch
+import torch.nn.functional as F
+
+from fla.ops.gla import chunk_gla, fused_recurrent_gla
+from fla.ops.gla.naive import naive_recurrent_gla
+from fla.ops.hgrn import chunk_hgrn
+from fla.ops.hgrn.naive import naive_recurrent_hgrn
+from fla.ops.retention import chunk_retention
+from fla.ops.retention.naive import naive_retention
+from fla.ops.rwkv6 import chunk_rwkv6
+from fla.ops.rwkv6.recurrent_naive import naive_recurrent_rwkv6
+
+
+def assert_close(name, ref, tri, atol):
+    assert ref.allclose(tri, 0, atol), f"{name} diff: {torch.abs(ref - tri).max()}"
+
+
+@pytest.mark.parametrize("B", [2])
+@pytest.mark.parametrize("H", [2])
+@pytest.mark.parametrize("T", [1, 20, 150])
+@pytest.mark.parametrize("D", [16])
+@pytest.mark.parametrize("use_negative_gates", [False, True])
+def test_gla(B: int, H: int, T: int, D: int, use_negative_gates: bool):
+    torch.manual_seed(42)
+    q, k, v = (torch.randn(B, H, T, D) for _ in range(3))
+    g = F.logsigmoid(torch.randn(B, H, T, D))
+    h0 = torch.randn(B, H, D, D)
+    inputs = [x.requires_grad_() for x in (q, k, v, g, h0)]
+    do = torch.randn_like(v)
+
+    ref, ref_ht = naive_recurrent_gla(q, k, v, g, h0, use_negative_gates=use_negative_gates)
+    ref_grads = torch.autograd.grad((ref * do).sum(), inputs)
+
+    # fused_recurrent_gla is the entry point with negative gates, on CPU both use the chunked torch kernel
+    if use_negative_gates:
+        tri, tri_ht = fused_recurrent_gla(q, k, v, g, initial_state=h0, output_final_state=True,
+                                          use_negative_gates=True)
+    else:
+        tri, tri_ht = chunk_gla(q, k, v, g, initial_state=h0, output_final_state=True)
+    tri_grads = torch.autograd.grad((tri * do).sum(), inputs)
+
+    assert_close(" o", ref, tri, 1e-4)
+    assert_close("ht", ref_ht, tri_ht, 1e-4)
+    for name, ref_grad, tri_grad in zip(['dq', 'dk', 'dv', 'dg', 'dh0'], ref_grads, tri_grads):
+        assert_close(name, ref_grad, tri_grad, 1e-3)
+
+
+@pytest.mark.parametrize("B", [2])
+@pytest.mark.parametrize("H", [2])
+@pytest.mark.parametrize("T", [1, 20, 150])
+@pytest.mark.parametrize("D", [32])
+def test_hgrn(B: int, H: int, T: int, D: int):
+    torch.manual_seed(42)
+    x = torch.randn(B, H, T, D)
+    g = torch.randn(B, H, T, D)
+    x, g = (1 - g.sigmoid()) * x, F.logsigmoid(g)
+    h0 = torch.randn(B, H, D)
+    inputs = [i.requires_grad_() for i in (x, g, h0)]
+    do = torch.randn_like(x)
+
+    ref, ref_ht = naive_recurrent_hgrn(x, g, h0, output_final_state=True)
+    ref_grads = torch.autograd.grad((ref * do).sum(), inputs)
+    tri, tri_ht = chunk_hgrn(x, g, h0, output_final_state=True)
+    tri_grads = torch.autograd.grad((tri * do).sum(), inputs)
+
+    assert_close(" o", ref, tri, 1e-4)
+    assert_close("ht", ref_ht, tri_ht, 1e-4)
+    for name, ref_grad, tri_grad in zip(['dx', 'dg', 'dh0'], ref_grads, tri_grads):
+        assert_close(name, ref_grad, tri_grad, 1e-3)
+
+
+@pytest.mark.parametrize("B", [2])
+@pytest.mark.parametrize("H", [2])
+@pytest.mark.parametrize("T", [1, 20, 150])
+@pytest.mark.parametrize("K", [16])
+@pytest.mark.parametrize("V", [24])
+def test_rwkv6(B: int, H: int, T: int, K: int, V: int):
+    torch.manual_seed(42)
+    q, k = torch.randn(B, H, T, K), torch.randn(B, H, T, K)
+    v = torch.randn(B, H, T, V)
+    w = -torch.randn(B, H, T, K).exp()
+    u = torch.randn(H, K)
+    h0 = torch.randn(B, H, K, V)
+    inputs = [x.requires_grad_() for x in (q, k, v, w, u, h0)]
+    do = torch.randn_like(v)
+
+    ref, ref_ht = naive_recurrent_rwkv6(q, k, v, w, u, initial_state=h0, output_final_state=True)
+    # with a single timestep the output does not depend on w, the reference does not use it
+    ref_grads = torch.autograd.grad((ref * do).sum(), inputs, allow_unused=True)
+    tri, tri_ht = chunk_rwkv6(q, k, v, w, u, initial_state=h0, output_final_state=True)
+    tri_grads = torch.autograd.grad((tri * do).sum(), inputs, allow_unused=True)
+
+    assert_close(" o", ref, tri, 1e-4)
+    assert_close("ht", ref_ht, tri_ht, 1e-4)
+    for name, ref_grad, tri_grad in zip(['dq', 'dk', 'dv', 'dw', 'du', 'dh0'], ref_grads, tri_grads):
+        if name == 'dw' and T == 1:
+            continue
+        assert_close(name, ref_grad, tri_grad, 1e-3)
+
+
+@pytest.mark.parametrize("B", [2])
+@pytest.mark.parametrize("H", [4])
+@pytest.mark.parametrize("T", [1, 20, 150])
+@pytest.mark.parametrize("D", [16])
+def test_retention(B: int, H: int, T: int, D: int):
+    torch.manual_seed(42)
+    q, k, v = (torch.randn(B, H, T, D).requires_grad_() for _ in range(3))
+    do = torch.randn_like(v)
+
+    ref = naive_retention(q, k, v)
+    ref_grads = torch.autograd.grad((ref * do).sum(), [q, k, v])
+    tri, _ = chunk_retention(q, k, v)
+    tri_grads = torch.autograd.grad((tri * do).sum(), [q, k, v])
+
+    assert_close(" o", ref, tri, 1e-4)
+    for name, ref_grad, tri_grad in zip(['dq', 'dk', 'dv'], ref_grads, tri_grads):
+        assert_close(name, ref_grad, tri_grad, 1e-3)
+
+    if T == 1:
+        return
+    # splitting the sequence and passing the state gives the same output
+    o1, ht = chunk_retention(q[:, :, :T // 2], k[:, :, :T // 2], v[:, :, :T // 2], output_final_state=True)
+    o2, _ = chunk_retention(q[:, :, T // 2:], k[:, :, T // 2:], v[:, :, T // 2:], initial_state=ht)
+    assert_close("split o", ref, torch.cat([o1, o2], 2), 1e-4)
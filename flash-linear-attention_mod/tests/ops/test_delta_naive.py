@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+import torch
+
+from fla.ops.delta_rule.naive_compatible import (delta_rule_chunkwise,
+                                                 delta_rule_recurrence)
+
+
+@pytest.mark.parametrize("B", [2])
+@pytest.mark.parametrize("H", [2])
+@pytest.mark.parametrize("T", [1, 37, 64])
+@pytest.mark.parametrize("D", [16])
+@pytest.mark.parametrize("chunk_size", [8, 32])
+@pytest.mark.parametrize("beta_mult", [1., 2.])
+def test_chunkwise_recurrence_equivalence(B: int, H: int, T: int, D: int, chunk_size: int, beta_mult: float):
+    torch.manual_seed(17)
+    q = torch.randn(B, H, T, D, dtype=torch.float64)
+    k = torch.nn.functional.normalize(torch.randn(B, H, T, D, dtype=torch.float64), p=2, dim=-1)
+    v = torch.randn(B, H, T, D, dtype=torch.float64)
+    beta = beta_mult * torch.rand(B, H, T, dtype=torch.float64)
+    h0 = torch.randn(B, H, D, D, dtype=torch.float64)
+    inputs = [x.requires_grad_(True) for x in (q, k, v, beta, h0)]
+    do = torch.randn_like(v)
+    dht = torch.randn_like(h0)
+
+    o, ht = delta_rule_recurrence(q, k, v, beta, h0, output_final_state=True)
+    grads = torch.autograd.grad((o * do).sum() + (ht * dht).sum(), inputs)
+
+    o2, ht2 = delta_rule_chunkwise(q, k, v, beta, chunk_size, h0, output_final_state=True)
+    grads2 = torch.autograd.grad((o2 * do).sum() + (ht2 * dht).sum(), inputs)
+
+    assert o.allclose(o2, rtol=0, atol=1e-8), f"Diff: {torch.abs(o - o2).max()}"
+    assert ht.allclose(ht2, rtol=0, atol=1e-8), f"Diff: {torch.abs(ht - ht2).max()}"
+    for name, grad, grad2 in zip(['q', 'k', 'v', 'beta', 'h0'], grads, grads2):
+        assert grad.allclose(grad2, rtol=0, atol=1e-8), f"{name} diff: {torch.abs(grad - grad2).max()}"
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+import torch
+
+from fla.ops.delta_rule.naive_gla import gla_mod_chunk, gla_mod_recurrent
+
+
+@pytest.mark.parametrize("B", [2])
+@pytest.mark.parametrize("H", [2])
+@pytest.mark.parametrize("T", [100, 1024])
+@pytest.mark.parametrize("D", [16])
+@pytest.mark.parametrize("chunk_size", [32, 64])
+@pytest.mark.parametrize("beta_mult", [1., 2.])
+def test_chunk_recurrent_equivalence(B: int, H: int, T: int, D: int, chunk_size: int, beta_mult: float):
+    torch.manual_seed(17)
+    q = torch.randn(B, H, T, D)
+    k = torch.nn.functional.normalize(torch.randn(B, H, T, D), p=2, dim=-1)
+    v = torch.randn(B, H, T, D)
+    # with beta_mult = 2 about half of the decays 1 - beta are negative
+    beta = beta_mult * torch.rand(B, H, T)
+    h0 = torch.randn(B, H, D, D)
+    inputs = [x.requires_grad_(True) for x in (q, k, v, beta, h0)]
+    do = torch.randn_like(v)
+    dht = torch.randn_like(h0)
+
+    o, ht = gla_mod_recurrent(q, k, v, beta, h0, output_final_state=True)
+    grads = torch.autograd.grad((o * do).sum() + (ht * dht).sum(), inputs)
+
+    o2, ht2 = gla_mod_chunk(q, k, v, beta, chunk_size, h0, output_final_state=True)
+    grads2 = torch.autograd.grad((o2 * do).sum() + (ht2 * dht).sum(), inputs)
+
+    assert o.allclose(o2, rtol=0, atol=1e-4), f"Diff: {torch.abs(o - o2).max()}"
+    assert ht.allclose(ht2, rtol=0, atol=1e-4), f"Diff: {torch.abs(ht - ht2).max()}"
+    for name, grad, grad2 in zip(['q', 'k', 'v', 'beta', 'h0'], grads, grads2):
+        assert grad.allclose(grad2, rtol=1e-3, atol=1e-3), f"{name} diff: {torch.abs(grad - grad2).max()}"
+
+
+def test_zero_decay():
+    # beta = 1 resets the state, a decay of exactly 0 must not produce nan
+    torch.manual_seed(17)
+    q, k, v = torch.randn(3, 1, 2, 20, 8).unbind(0)
+    beta = torch.rand(1, 2, 20)
+    beta[..., 7] = 1.
+    o, ht = gla_mod_recurrent(q, k, v, beta, output_final_state=True)
+    o2, ht2 = gla_mod_chunk(q, k, v, beta, 8, output_final_state=True)
+    assert o.allclose(o2, rtol=0, atol=1e-5)
+    assert ht.allclose(ht2, rtol=0, atol=1e-5)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import pytest
+import torch
+
+from fla.layers.delta_net_no_triton import DeltaNetNoTriton
+from fla.ops.registry import resolve_op
+
+
+@pytest.mark.parametrize("mode", ["auto", "chunk", "fused_chunk", "naive_chunk"])
+def test_cpu_fallback(mode: str):
+    resolved, _ = resolve_op("delta_rule", mode, torch.device("cpu"), torch.float32,
+                             head_dim=64, chunk_size=64, decoding=False)
+    assert resolved == "naive_chunk"
+
+
+def test_auto_decoding():
+    resolved, _ = resolve_op("delta_rule", "auto", torch.device("cpu"), torch.float32,
+                             head_dim=64, chunk_size=64, decoding=True)
+    assert resolved == "naive"
+    resolved, _ = resolve_op("gla_mod", "gla_mod_chunk", torch.device("cpu"), torch.float32,
+                             head_dim=64, chunk_size=64, decoding=True)
+    assert resolved == "gla_mod_chunk"
+
+
+@pytest.mark.parametrize("dtype", [torch.float32, torch.float16, torch.bfloat16])
+@pytest.mark.parametrize("mode", ["chunk", "fused_chunk"])
+def test_cuda_chunk(mode: str, dtype: torch.dtype):
+    # the chunked Triton kernels take all floating point dtypes, float32 must not fall back to fused_recurrent
+    resolved, _ = resolve_op("delta_rule", mode, torch.device("cuda"), dtype,
+                             head_dim=64, chunk_size=64, decoding=False)
+    assert resolved == mode
+
+
+def test_unknown_mode():
+    with pytest.raises(ValueError):
+        resolve_op("delta_rule", "gla_mod_chunk", torch.device("cpu"), torch.float32,
+                   head_dim=64, chunk_size=64, decoding=False)
+
+
+@pytest.mark.parametrize("mode", ["auto", "chunk"])
+def test_layer(mode: str):
+    torch.manual_seed(42)
+    naive = DeltaNetNoTriton(hidden_size=64, num_heads=2, mode='naive', chunk_size=16)
+    layer = DeltaNetNoTriton(hidden_size=64, num_heads=2, mode=mode, chunk_size=16)
+    layer.load_state_dict(naive.state_dict())
+    x = torch.randn(2, 40, 64)
+    assert torch.allclose(naive(x)[0], layer(x)[0], atol=1e-5)
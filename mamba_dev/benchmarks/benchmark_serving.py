@@ -0,0 +1,112 @@
+# Copyright (c) 2024, Tri Dao, Albert Gu.
+
+# Local load generator for the continuous-batching scheduler of mamba_ssm.utils.serving: requests with random prompt
+# and generation lengths arrive as a Poisson process and are served by a small randomly initialized model on CPU.
+# $ python benchmarks/benchmark_serving.py --model mamba --num-slots 8 --rate 20
+
+import argparse
+import random
+import time
+
+import torch
+
+from mamba_ssm.utils.serving import ContinuousBatchingScheduler, GenerationRequest
+
+
+parser = argparse.ArgumentParser(description="Serving benchmarking")
+parser.add_argument("--model", type=str, default="mamba", choices=["mamba", "delta_net", "xlstm"])
+parser.add_argument("--d-model", type=int, default=256)
+parser.add_argument("--n-layer", type=int, default=4)
+parser.add_argument("--vocab-size", type=int, default=1024)
+parser.add_argument("--num-slots", type=int, default=8)
+parser.add_argument("--num-requests", type=int, default=64)
+parser.add_argument("--rate", type=float, default=20.0, help="Mean number of requests arriving per second")
+parser.add_argument("--promptlen", type=int, nargs=2, default=[8, 128], help="Range of the prompt lengths")
+parser.add_argument("--genlen", type=int, nargs=2, default=[8, 64], help="Range of the generation lengths")
+parser.add_argument("--prefill-chunk-size", type=int, default=32)
+parser.add_argument("--max-prefill-tokens", type=int, default=64)
+parser.add_argument("--device", type=str, default="cpu")
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+device = torch.device(args.device)
+torch.manual_seed(args.seed)
+random.seed(args.seed)
+
+if args.model == "mamba":
+    from mamba_ssm.models.config_mamba import MambaConfig
+    from mamba_ssm.models.mixer_seq_simple import MambaLMHeadModel
+    from mamba_ssm.utils.serving import MambaSlots
+
+    config = MambaConfig(d_model=args.d_model, n_layer=args.n_layer, vocab_size=args.vocab_size, rms_norm=False,
+                         fused_add_norm=False, pad_vocab_size_multiple=16)
+    model, slots_cls = MambaLMHeadModel(config, device=device), MambaSlots
+elif args.model == "delta_net":
+    from fla.models import DeltaNetConfig, DeltaNetNoTritonForCausalLM
+    from mamba_ssm.utils.serving import FLASlots
+
+    # DeltaNetForCausalLM takes the same slots on GPU, its layers need the Triton kernels
+    config = DeltaNetConfig(hidden_size=args.d_model, num_hidden_layers=args.n_layer, num_heads=4,
+                            vocab_size=args.vocab_size)
+    model, slots_cls = DeltaNetNoTritonForCausalLM(config).to(device), FLASlots
+else:
+    from xlstm.blocks.mlstm.block import mLSTMBlockConfig
+    from xlstm.blocks.mlstm.layer import mLSTMLayerConfig
+    from xlstm.blocks.slstm.block import sLSTMBlockConfig
+    from xlstm.blocks.slstm.layer import sLSTMLayerConfig
+    from xlstm.xlstm_lm_model import xLSTMLMModel, xLSTMLMModelConfig
+    from mamba_ssm.utils.serving import XLSTMSlots
+
+    config = xLSTMLMModelConfig(
+        mlstm_block=mLSTMBlockConfig(mlstm=mLSTMLayerConfig(num_heads=4)),
+        slstm_block=sLSTMBlockConfig(slstm=sLSTMLayerConfig(num_heads=4, backend="vanilla", dtype="float32")),
+        context_length=args.promptlen[1] + args.genlen[1],
+        num_blocks=args.n_layer,
+        embedding_dim=args.d_model,
+        slstm_at=[1],
+        vocab_size=args.vocab_size,
+    )
+    model, slots_cls = xLSTMLMModel(config), XLSTMSlots
+    model.reset_parameters()
+    model = model.to(device)
+model.eval()
+
+print(f"{args.model}: {sum(p.numel() for p in model.parameters()) / 1e6:.1f}M parameters, {args.num_slots} slots, "
+      f"{args.num_requests} requests at {args.rate} requests/s")
+scheduler = ContinuousBatchingScheduler(slots_cls(model, args.num_slots), prefill_chunk_size=args.prefill_chunk_size,
+                                        max_prefill_tokens=args.max_prefill_tokens)
+arrivals, t = [], 0.0
+for _ in range(args.num_requests):
+    t += random.expovariate(args.rate)
+    input_ids = torch.randint(0, args.vocab_size, (random.randint(*args.promptlen),))
+    arrivals.append((t, GenerationRequest(input_ids, max_new_tokens=random.randint(*args.genlen))))
+
+start = time.perf_counter()
+finished, pending = [], list(reversed(arrivals))
+while pending or scheduler.has_unfinished_requests():
+    now = time.perf_counter() - start
+    while pending and pending[-1][0] <= now:
+        arrival, request = pending.pop()
+        request.arrival_time = start + arrival
+        scheduler.add_request(request)
+    if scheduler.has_unfinished_requests():
+        finished += scheduler.step()
+    else:
+        time.sleep(pending[-1][0] - now)
+elapsed = time.perf_counter() - start
+
+
+def percentiles(values):
+    values = torch.tensor(values, dtype=torch.float64) * 1000
+    return f"p50 {values.quantile(0.5).item():8.1f}ms  p99 {values.quantile(0.99).item():8.1f}ms"
+
+
+num_tokens = sum(len(request.output_ids) for request in finished)
+print(f"Throughput: {num_tokens / elapsed:.1f} generated tokens/s, {len(finished) / elapsed:.2f} requests/s "
+      f"({num_tokens} tokens in {elapsed:.2f}s)")
+print(f"Latency:            {percentiles([r.finish_time - r.arrival_time for r in finished])}")
+print(f"Time to 1st token:  {percentiles([r.first_token_time - r.arrival_time for r in finished])}")
+inter_token = [
+    (r.finish_time - r.first_token_time) / (len(r.output_ids) - 1) for r in finished if len(r.output_ids) > 1
+]
+print(f"Inter-token:        {percentiles(inter_token)}")
@@ -30,6 +30,7 @@ from mamba_ssm.distributed.distributed_utils import all_reduce, reduce_scatter
 
 from mamba_ssm.ops.triton.ssd_combined import mamba_chunk_scan_combined
 from mamba_ssm.ops.triton.ssd_combined import mamba_split_conv1d_scan_combined
+from mamba_ssm.modules.ssd_minimal import ssd_minimal_discrete
 
 from huggingface_hub import PyTorchModelHubMixin
 
@@ -53,6 +54,7 @@ class Mamba2(nn.Module, PyTorchModelHubMixin):
         dt_max=0.1,
         dt_init_floor=1e-4,
         dt_limit=(0.0, float("inf")),
+        positive_and_negative_associative_scan=False,  # If True, the eigenvalues are 2 exp(dt A) - 1 in (-1, 1]
         bias=False,
         conv_bias=True,
         # Fused kernel and sharding options
@@ -87,6 +89,7 @@ class Mamba2(nn.Module, PyTorchModelHubMixin):
         self.rmsnorm = rmsnorm
         self.norm_before_gate = norm_before_gate
         self.dt_limit = dt_limit
+        self.positive_and_negative_associative_scan = positive_and_negative_associative_scan
         self.activation = "silu"
         self.chunk_size = chunk_size
         self.use_mem_eff_path = use_mem_eff_path
@@ -181,7 +184,8 @@ class Mamba2(nn.Module, PyTorchModelHubMixin):
         # If the model is loaded in fp16, without the .float() here, A might be -inf
         A = -torch.exp(self.A_log.float())  # (nheads) or (d_inner, d_state)
         dt_limit_kwargs = {} if self.dt_limit == (0.0, float("inf")) else dict(dt_limit=self.dt_limit)
-        if self.use_mem_eff_path and inference_params is None:
+        # The fused kernels only implement the exp(dt A) eigenvalues
+        if self.use_mem_eff_path and inference_params is None and not self.positive_and_negative_associative_scan:
             out = mamba_split_conv1d_scan_combined(
                 zxbcdt,
                 rearrange(self.conv1d.weight, "d 1 w -> d w"),
@@ -230,7 +234,7 @@ class Mamba2(nn.Module, PyTorchModelHubMixin):
             if causal_conv1d_fn is None or self.activation not in ["silu", "swish"]:
                 assert seq_idx is None, "varlen conv1d requires the causal_conv1d package"
                 xBC = self.act(
-                    self.conv1d(xBC.transpose(1, 2)).transpose(1, 2)[:, -(self.dconv - 1):]
+                    self.conv1d(xBC.transpose(1, 2)).transpose(1, 2)[:, :seqlen]
                 )  # (B, L, self.d_ssm + 2 * ngroups * d_state)
             else:
                 xBC = causal_conv1d_fn(
@@ -241,30 +245,33 @@ class Mamba2(nn.Module, PyTorchModelHubMixin):
                     seq_idx=seq_idx,
                 ).transpose(1, 2)
             x, B, C = torch.split(xBC, [self.d_ssm, self.ngroups * self.d_state, self.ngroups * self.d_state], dim=-1)
-            y = mamba_chunk_scan_combined(
-                rearrange(x, "b l (h p) -> b l h p", p=self.headdim),
-                dt,
-                A,
-                rearrange(B, "b l (g n) -> b l g n", g=self.ngroups),
-                rearrange(C, "b l (g n) -> b l g n", g=self.ngroups),
-                chunk_size=self.chunk_size,
-                D=rearrange(self.D, "(h p) -> h p", p=self.headdim) if self.D_has_hdim else self.D,
-                z=rearrange(z, "b l (h p) -> b l h p", p=self.headdim) if not self.rmsnorm else None,
-                dt_bias=self.dt_bias,
-                dt_softplus=True,
-                seq_idx=seq_idx,
-                cu_seqlens=cu_seqlens,
-                **dt_limit_kwargs,
-                return_final_states=ssm_state is not None,
-                return_varlen_states=cu_seqlens is not None and inference_params is not None,
-            )
-            if ssm_state is not None:
-                y, last_state, *rest = y
-                if cu_seqlens is None:
-                    ssm_state.copy_(last_state)
-                else:
-                    varlen_states = rest[0]
-                    ssm_state.copy_(varlen_states)
+            if self.positive_and_negative_associative_scan:
+                y = self._chunk_scan_torch(x, dt, A, B, C, z, ssm_state, seq_idx=seq_idx, cu_seqlens=cu_seqlens)
+            else:
+                y = mamba_chunk_scan_combined(
+                    rearrange(x, "b l (h p) -> b l h p", p=self.headdim),
+                    dt,
+                    A,
+                    rearrange(B, "b l (g n) -> b l g n", g=self.ngroups),
+                    rearrange(C, "b l (g n) -> b l g n", g=self.ngroups),
+                    chunk_size=self.chunk_size,
+                    D=rearrange(self.D, "(h p) -> h p", p=self.headdim) if self.D_has_hdim else self.D,
+                    z=rearrange(z, "b l (h p) -> b l h p", p=self.headdim) if not self.rmsnorm else None,
+                    dt_bias=self.dt_bias,
+                    dt_softplus=True,
+                    seq_idx=seq_idx,
+                    cu_seqlens=cu_seqlens,
+                    **dt_limit_kwargs,
+                    return_final_states=ssm_state is not None,
+                    return_varlen_states=cu_seqlens is not None and inference_params is not None,
+                )
+                if ssm_state is not None:
+                    y, last_state, *rest = y
+                    if cu_seqlens is None:
+                        ssm_state.copy_(last_state)
+                    else:
+                        varlen_states = rest[0]
+                        ssm_state.copy_(varlen_states)
             y = rearrange(y, "b l h p -> b l (h p)")
             if self.rmsnorm:
                 y = self.norm(y, z)
@@ -275,6 +282,31 @@ class Mamba2(nn.Module, PyTorchModelHubMixin):
             out = self.out_proj(y)
         return out
 
+    def _chunk_scan_torch(self, x, dt, A, B, C, z, ssm_state, seq_idx=None, cu_seqlens=None):
+        """Chunked scan in PyTorch with the eigenvalues 2 exp(dt A) - 1, which mamba_chunk_scan_combined does not
+        implement. Same inputs as in forward, returns y (batch, seqlen, nheads, headdim) and writes the final
+        state to ssm_state if it is not None.
+        """
+        assert seq_idx is None and cu_seqlens is None, "varlen sequences are not supported with negative eigenvalues"
+        dtype = x.dtype
+        dt = F.softplus(dt.float() + self.dt_bias.float())  # (batch, seqlen, nheads)
+        if self.dt_limit != (0.0, float("inf")):
+            dt = dt.clamp(min=self.dt_limit[0], max=self.dt_limit[1])
+        x = rearrange(x, "b l (h p) -> b l h p", p=self.headdim).float()
+        B = repeat(B.float(), "b l (g n) -> b l (g h) n", g=self.ngroups, h=self.nheads // self.ngroups)
+        C = repeat(C.float(), "b l (g n) -> b l (g h) n", g=self.ngroups, h=self.nheads // self.ngroups)
+        y, last_state = ssd_minimal_discrete(
+            x * dt.unsqueeze(-1), A * dt, B, C, self.chunk_size,
+            initial_states=None, positive_and_negative_associative_scan=True,
+        )
+        D = rearrange(self.D.float(), "(h p) -> h p", p=self.headdim) if self.D_has_hdim else self.D.float()[:, None]
+        y = y + x * D
+        if not self.rmsnorm:
+            y = y * F.silu(rearrange(z.float(), "b l (h p) -> b l h p", p=self.headdim))
+        if ssm_state is not None:
+            ssm_state.copy_(last_state)
+        return y.to(dtype)
+
     def step(self, hidden_states, conv_state, ssm_state):
         dtype = hidden_states.dtype
         assert hidden_states.shape[1] == 1, "Only support decoding with 1 token at a time for now"
@@ -307,16 +339,22 @@ class Mamba2(nn.Module, PyTorchModelHubMixin):
         A = -torch.exp(self.A_log.float())  # (nheads,)
 
         # SSM step
-        if selective_state_update is None:
-            assert self.ngroups == 1, "Only support ngroups=1 for this inference code path"
+        if selective_state_update is None or self.positive_and_negative_associative_scan:
             # Discretize A and B
             dt = F.softplus(dt + self.dt_bias.to(dtype=dt.dtype))  # (batch, nheads)
+            if self.dt_limit != (0.0, float("inf")):
+                dt = dt.clamp(min=self.dt_limit[0], max=self.dt_limit[1])
             dA = torch.exp(dt * A)  # (batch, nheads)
+            if self.positive_and_negative_associative_scan:
+                dA = 2 * dA - 1
             x = rearrange(x, "b (h p) -> b h p", p=self.headdim)
-            dBx = torch.einsum("bh,bn,bhp->bhpn", dt, B, x)
+            B = repeat(B, "b (g n) -> b (g h) n", g=self.ngroups, h=self.nheads // self.ngroups)
+            C = repeat(C, "b (g n) -> b (g h) n", g=self.ngroups, h=self.nheads // self.ngroups)
+            dBx = torch.einsum("bh,bhn,bhp->bhpn", dt, B, x)
             ssm_state.copy_(ssm_state * rearrange(dA, "b h -> b h 1 1") + dBx)
-            y = torch.einsum("bhpn,bn->bhp", ssm_state.to(dtype), C)
-            y = y + rearrange(self.D.to(dtype), "h -> h 1") * x
+            y = torch.einsum("bhpn,bhn->bhp", ssm_state.to(dtype), C)
+            D = rearrange(self.D, "(h p) -> h p", p=self.headdim) if self.D_has_hdim else rearrange(self.D, "h -> h 1")
+            y = y + D.to(dtype) * x
             y = rearrange(y, "b h p -> b (h p)")
             if not self.rmsnorm:
                 y = y * self.act(z)  # (B D)
@@ -8,7 +8,10 @@ import torch
 import torch.nn.functional as F
 from einops import rearrange, repeat
 
-from mamba_ssm.ops.triton.ssd_combined import mamba_chunk_scan_combined
+try:
+    from mamba_ssm.ops.triton.ssd_combined import mamba_chunk_scan_combined
+except ImportError:
+    mamba_chunk_scan_combined = None
 
 
 def segsum_unstable(x):
@@ -31,50 +34,79 @@ def segsum(x):
     x_segsum = x_segsum.masked_fill(~mask, -torch.inf)
     return x_segsum
 
-def ssd_minimal_discrete(X, A, B, C, block_len, initial_states=None):
+def ssd_minimal_discrete(X, A, B, C, block_len, initial_states=None, positive_and_negative_associative_scan=False):
     """
     Arguments:
         X: (batch, length, n_heads, d_head)
         A: (batch, length, n_heads)
         B: (batch, length, n_heads, d_state)
         C: (batch, length, n_heads, d_state)
+        initial_states: (batch, n_heads, d_head, d_state)
+        positive_and_negative_associative_scan: if True, the transitions are 2 exp(A) - 1 in (-1, 1]
+            instead of exp(A). Their products are tracked as log magnitudes and a parity channel
+            counting the negative transitions.
     Return:
         Y: (batch, length, n_heads, d_head)
+        final_state: (batch, n_heads, d_head, d_state)
+
+    ssd_chunk_scan in fla/models/mamba2/modeling_mamba2.py of flash-linear-attention_mod is the same
+    algorithm, keep the two in sync.
     """
     assert X.dtype == A.dtype == B.dtype == C.dtype
-    assert X.shape[1] % block_len == 0
+    seqlen = X.shape[1]
+    # Padded steps have A = 0 (a transition of 1 in both modes) and X = 0, they leave the state unchanged
+    pad = -seqlen % block_len
+    X, A, B, C = [F.pad(x, (0, 0) * (x.dim() - 2) + (0, pad)) for x in (X, A, B, C)]
 
     # Rearrange into blocks/chunks
     X, A, B, C = [rearrange(x, "b (c l) ... -> b c l ...", l=block_len) for x in (X, A, B, C)]
 
     A = rearrange(A, "b c l h -> b h c l")
+    sign = None
+    if positive_and_negative_associative_scan:
+        transitions = 2 * torch.exp(A) - 1
+        parity = (transitions < 0).cumsum(dim=-1)  # negative transitions since the chunk start
+        sign = 1 - 2 * (parity % 2).to(A.dtype)
+        # A zero transition gets a finite log magnitude, exp of it (and its gradient) is 0
+        A = transitions.abs().clamp_min(torch.finfo(A.dtype).tiny).log()
     A_cumsum = torch.cumsum(A, dim=-1)
 
     # 1. Compute the output for each intra-chunk (diagonal blocks)
     L = torch.exp(segsum(A))
+    if sign is not None:
+        L = L * sign[..., :, None] * sign[..., None, :]
     Y_diag  = torch.einsum("bclhn,bcshn,bhcls,bcshp->bclhp", C, B, L, X)
 
     # 2. Compute the state for each intra-chunk
     # (right term of low-rank factorization of off-diagonal blocks; B terms)
     decay_states = torch.exp((A_cumsum[:, :, :, -1:] - A_cumsum))
+    if sign is not None:
+        decay_states = decay_states * sign[:, :, :, -1:] * sign
     states = torch.einsum("bclhn,bhcl,bclhp->bchpn", B, decay_states, X)
 
     # 3. Compute the inter-chunk SSM recurrence; produces correct SSM states at chunk boundaries
     # (middle term of factorization of off-diag blocks; A terms)
     if initial_states is None:
         initial_states = torch.zeros_like(states[:, :1])
+    else:
+        initial_states = rearrange(initial_states, "b h p n -> b 1 h p n").to(states.dtype)
     states = torch.cat([initial_states, states], dim=1)
     decay_chunk = torch.exp(segsum(F.pad(A_cumsum[:, :, :, -1], (1, 0))))
+    if sign is not None:
+        chunk_sign = F.pad(sign[:, :, :, -1], (1, 0), value=1.0).cumprod(dim=-1)
+        decay_chunk = decay_chunk * chunk_sign[..., :, None] * chunk_sign[..., None, :]
     new_states = torch.einsum("bhzc,bchpn->bzhpn", decay_chunk, states)
     states, final_state = new_states[:, :-1], new_states[:, -1]
 
     # 4. Compute state -> output conversion per chunk
     # (left term of low-rank factorization of off-diagonal blocks; C terms)
     state_decay_out = torch.exp(A_cumsum)
+    if sign is not None:
+        state_decay_out = state_decay_out * sign
     Y_off = torch.einsum('bclhn,bchpn,bhcl->bclhp', C, states, state_decay_out)
 
     # Add output of intra-chunk and inter-chunk terms (diagonal and off-diagonal blocks)
-    Y = rearrange(Y_diag+Y_off, "b c l h p -> b (c l) h p")
+    Y = rearrange(Y_diag+Y_off, "b c l h p -> b (c l) h p")[:, :seqlen]
     return Y, final_state
 
 
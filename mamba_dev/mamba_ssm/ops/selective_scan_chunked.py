@@ -0,0 +1,173 @@
+# Copyright (c) 2023, Tri Dao, Albert Gu.
+
+import torch
+import torch.nn.functional as F
+
+from einops import rearrange, repeat
+
+
+def associative_scan(a, b, x0):
+    """Solves x_t = a_t * x_{t-1} + b_t along dim 2, with x_{-1} = x0.
+    Hillis-Steele scan over the pairs (a_t, b_t): log2(chunk) steps of vectorized multiply-adds and no
+    divisions, so it is exact for decays of either sign, including 0.
+    a, b: (batch, dim, chunk, dstate)
+    x0: (batch, dim, dstate)
+    """
+    offset = 1
+    while offset < a.shape[2]:
+        b = torch.cat([b[:, :, :offset], torch.addcmul(b[:, :, offset:], a[:, :, offset:], b[:, :, :-offset])], dim=2)
+        a = torch.cat([a[:, :, :offset], a[:, :, offset:] * a[:, :, :-offset]], dim=2)
+        offset *= 2
+    return torch.addcmul(b, a, x0.unsqueeze(2))
+
+
+def _expand_BC(BC, dim, start, end):
+    """(dim dstate) -> (1 dim 1 dstate), (batch groups dstate L) -> (batch dim end-start dstate)"""
+    if BC.dim() == 2:
+        return BC[None, :, None]
+    return repeat(BC[..., start:end], "b g n l -> b (g h) l n", h=dim // BC.shape[1])
+
+
+def _reduce_dBC(dBC, BC):
+    """Inverse of _expand_BC for the gradients of one chunk."""
+    if BC.dim() == 2:
+        return dBC.sum(dim=(0, 2))
+    return rearrange(dBC, "b (g h) l n -> b g n l h", g=BC.shape[1]).sum(-1)
+
+
+def _discretize(u, delta, A, B, start, end, positive_and_negative_associative_scan):
+    """Decays, their derivative wrt delta * A and inputs of the timesteps start:end, all (batch dim chunk dstate)."""
+    delta, u = delta[:, :, start:end], u[:, :, start:end]
+    deltaA_exp = torch.exp(delta.unsqueeze(-1) * A[:, None])
+    if positive_and_negative_associative_scan:
+        # the eigenvalues 2 exp(delta A) - 1 are in (-1, 1]
+        deltaA, ddeltaA = 2 * deltaA_exp - 1, 2 * deltaA_exp
+    else:
+        deltaA, ddeltaA = deltaA_exp, deltaA_exp
+    Bc = _expand_BC(B, u.shape[1], start, end)
+    deltaB_u = (delta * u).unsqueeze(-1) * Bc
+    return deltaA, ddeltaA, deltaB_u, Bc
+
+
+class SelectiveScanChunkedFn(torch.autograd.Function):
+    """Selective scan in PyTorch, computed chunk by chunk so that the (batch, dim, L, dstate) tensors of
+    selective_scan_ref are only materialized for one chunk at a time. Like the CUDA kernels, the forward pass
+    saves the state at each chunk border and the backward pass recomputes the states within each chunk.
+    """
+
+    @staticmethod
+    def forward(ctx, u, delta, A, B, C, D=None, z=None, delta_bias=None, delta_softplus=False,
+                return_last_state=False, positive_and_negative_associative_scan=None, chunk_size=64):
+        assert not A.is_complex(), "SelectiveScanChunkedFn only supports real A"
+        dtype_in = u.dtype
+        batch, dim, seqlen = u.shape
+        delta_f = delta.float()
+        if delta_bias is not None:
+            delta_f = delta_f + delta_bias[..., None].float()
+        if delta_softplus:
+            delta_f = F.softplus(delta_f)
+        u_f, A_f = u.float(), A.float()
+        B_f = B.float() if B.dim() != 3 else rearrange(B.float(), "b n l -> b 1 n l")
+        C_f = C.float() if C.dim() != 3 else rearrange(C.float(), "b n l -> b 1 n l")
+
+        x = A_f.new_zeros(batch, dim, A.shape[1])
+        states, ys = [], []
+        for start in range(0, seqlen, chunk_size):
+            end = min(start + chunk_size, seqlen)
+            states.append(x)
+            deltaA, _, deltaB_u, _ = _discretize(u_f, delta_f, A_f, B_f, start, end,
+                                                 positive_and_negative_associative_scan)
+            xs = associative_scan(deltaA, deltaB_u, x)
+            ys.append((xs * _expand_BC(C_f, dim, start, end)).sum(-1))
+            x = xs[:, :, -1]
+        out = torch.cat(ys, dim=2)
+        if D is not None:
+            out = out + u_f * D[:, None].float()
+        out_z = out * F.silu(z.float()) if z is not None else out
+
+        ctx.delta_softplus = delta_softplus
+        ctx.positive_and_negative_associative_scan = positive_and_negative_associative_scan
+        ctx.chunk_size = chunk_size
+        ctx.squeeze_B, ctx.squeeze_C = B.dim() == 3, C.dim() == 3
+        ctx.save_for_backward(u, delta, A, B, C, D, z, delta_bias, torch.stack(states, dim=2),
+                              out if z is not None else None)
+        out_z = out_z.to(dtype_in)
+        return out_z if not return_last_state else (out_z, x)
+
+    @staticmethod
+    def backward(ctx, dout, *args):
+        u, delta, A, B, C, D, z, delta_bias, states, out = ctx.saved_tensors
+        batch, dim, seqlen = u.shape
+        chunk_size = ctx.chunk_size
+        delta_f = delta.float()
+        if delta_bias is not None:
+            delta_f = delta_f + delta_bias[..., None].float()
+        delta_pre = delta_f
+        if ctx.delta_softplus:
+            delta_f = F.softplus(delta_f)
+        u_f, A_f = u.float(), A.float()
+        B_f = B.float() if not ctx.squeeze_B else rearrange(B.float(), "b n l -> b 1 n l")
+        C_f = C.float() if not ctx.squeeze_C else rearrange(C.float(), "b n l -> b 1 n l")
+        dout = dout.float()
+
+        dz = None
+        if z is not None:
+            z_sigmoid = torch.sigmoid(z.float())
+            dz = (dout * out * z_sigmoid * (1 + z.float() * (1 - z_sigmoid))).to(z.dtype)
+            dout = dout * z.float() * z_sigmoid
+        du = dout * D[:, None].float() if D is not None else torch.zeros_like(u_f)
+        dD = (dout * u_f).sum(dim=(0, 2)).to(D.dtype) if D is not None else None
+
+        ddelta = torch.empty_like(delta_f)
+        dA = torch.zeros_like(A_f)
+        dB, dC = torch.zeros_like(B_f), torch.zeros_like(C_f)
+        dx_carry = A_f.new_zeros(batch, dim, A.shape[1])
+        for c, start in reversed(list(enumerate(range(0, seqlen, chunk_size)))):
+            end = min(start + chunk_size, seqlen)
+            x0 = states[:, :, c]
+            deltaA, ddeltaA, deltaB_u, Bc = _discretize(u_f, delta_f, A_f, B_f, start, end,
+                                                        ctx.positive_and_negative_associative_scan)
+            xs = associative_scan(deltaA, deltaB_u, x0)
+            Cc = _expand_BC(C_f, dim, start, end)
+            dy = dout[:, :, start:end].unsqueeze(-1)
+            # dx_t = C_t dy_t + a_{t+1} dx_{t+1}, the same recurrence backwards in time
+            deltaA_next = torch.cat([deltaA[:, :, 1:], torch.ones_like(deltaA[:, :, :1])], dim=2)
+            dxs = associative_scan(deltaA_next.flip(2), (Cc * dy).flip(2), dx_carry).flip(2)
+            dx_carry = deltaA[:, :, 0] * dxs[:, :, 0]
+
+            ddeltaA_dx = dxs * torch.cat([x0.unsqueeze(2), xs[:, :, :-1]], dim=2) * ddeltaA
+            dxs_B = (dxs * Bc).sum(-1)
+            delta_c, u_c = delta_f[:, :, start:end], u_f[:, :, start:end]
+            ddelta[:, :, start:end] = (ddeltaA_dx * A_f[:, None]).sum(-1) + dxs_B * u_c
+            du[:, :, start:end] += dxs_B * delta_c
+            dA += (ddeltaA_dx * delta_c.unsqueeze(-1)).sum(dim=(0, 2))
+            dB_c = _reduce_dBC(dxs * (delta_c * u_c).unsqueeze(-1), B_f)
+            dC_c = _reduce_dBC(xs * dy, C_f)
+            if B_f.dim() == 2:
+                dB += dB_c
+            else:
+                dB[..., start:end] = dB_c
+            if C_f.dim() == 2:
+                dC += dC_c
+            else:
+                dC[..., start:end] = dC_c
+
+        if ctx.delta_softplus:
+            ddelta = ddelta * torch.sigmoid(delta_pre)
+        ddelta_bias = ddelta.sum(dim=(0, 2)).to(delta_bias.dtype) if delta_bias is not None else None
+        dB = dB.squeeze(1) if ctx.squeeze_B else dB
+        dC = dC.squeeze(1) if ctx.squeeze_C else dC
+        return (du.to(u.dtype), ddelta.to(delta.dtype), dA.to(A.dtype), dB.to(B.dtype), dC.to(C.dtype),
+                dD, dz, ddelta_bias, None, None, None, None)
+
+
+def selective_scan_chunked_fn(u, delta, A, B, C, D=None, z=None, delta_bias=None, delta_softplus=False,
+                              return_last_state=False, positive_and_negative_associative_scan=None,
+                              chunk_size=64):
+    """Same arguments and outputs as selective_scan_fn, for real A on any device.
+    if return_last_state is True, returns (out, last_state)
+    last_state has shape (batch, dim, dstate). Note that the gradient of the last state is
+    not considered in the backward pass.
+    """
+    return SelectiveScanChunkedFn.apply(u, delta, A, B, C, D, z, delta_bias, delta_softplus, return_last_state,
+                                        positive_and_negative_associative_scan, chunk_size)
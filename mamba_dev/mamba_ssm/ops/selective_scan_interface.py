@@ -13,8 +13,21 @@ except ImportError:
     causal_conv1d_fn = None
     causal_conv1d_cuda = None
 
-import selective_scan_cuda_positive
-import selective_scan_cuda_positive_and_negative
+try:
+    import selective_scan_cuda_positive
+    import selective_scan_cuda_positive_and_negative
+except ImportError:
+    selective_scan_cuda_positive = None
+    selective_scan_cuda_positive_and_negative = None
+
+from mamba_ssm.ops.selective_scan_chunked import selective_scan_chunked_fn
+
+
+def has_selective_scan_cuda(x, positive_and_negative_associative_scan):
+    """Whether the CUDA kernels of the given scan variant can run on the tensor x."""
+    if positive_and_negative_associative_scan:
+        return x.is_cuda and selective_scan_cuda_positive_and_negative is not None
+    return x.is_cuda and selective_scan_cuda_positive is not None
 
 
 class SelectiveScanFn(torch.autograd.Function):
@@ -95,13 +108,21 @@ def selective_scan_fn(u, delta, A, B, C, D=None, z=None, delta_bias=None,
     """if return_last_state is True, returns (out, last_state)
     last_state has shape (batch, dim, dstate). Note that the gradient of the last state is
     not considered in the backward pass.
+    Without the CUDA kernels (e.g. on CPU), runs selective_scan_chunked_fn, or selective_scan_ref for complex A.
     """
+    assert positive_and_negative_associative_scan is not None, 'positive_and_negative_associative_scan must be specified'
+    if not has_selective_scan_cuda(u, positive_and_negative_associative_scan):
+        if A.is_complex():
+            return selective_scan_ref(u, delta, A, B, C, D, z, delta_bias, delta_softplus, return_last_state,
+                                      positive_and_negative_associative_scan)
+        return selective_scan_chunked_fn(u, delta, A, B, C, D, z, delta_bias, delta_softplus, return_last_state,
+                                         positive_and_negative_associative_scan)
     return SelectiveScanFn.apply(u, delta, A, B, C, D, z, delta_bias, delta_softplus, return_last_state,
                                  positive_and_negative_associative_scan)
 
 
 def selective_scan_ref(u, delta, A, B, C, D=None, z=None, delta_bias=None, delta_softplus=False,
-                      return_last_state=False):
+                      return_last_state=False, positive_and_negative_associative_scan=True):
     """
     u: r(B D L)
     delta: r(B D L)
@@ -111,6 +132,8 @@ def selective_scan_ref(u, delta, A, B, C, D=None, z=None, delta_bias=None, delta
     D: r(D)
     z: r(B D L)
     delta_bias: r(D), fp32
+    positive_and_negative_associative_scan: if True, the eigenvalues are 2 exp(delta A) - 1 instead of
+        exp(delta A) for real A, as in the CUDA kernels
 
     out: r(B D L)
     last_state (optional): r(B D dstate) or c(B D dstate)
@@ -135,7 +158,9 @@ def selective_scan_ref(u, delta, A, B, C, D=None, z=None, delta_bias=None, delta
         C = C.float()
     x = A.new_zeros((batch, dim, dstate))
     ys = []
-    deltaA = 2 * torch.exp(torch.einsum('bdl,dn->bdln', delta, A)) - 1
+    deltaA = torch.exp(torch.einsum('bdl,dn->bdln', delta, A))
+    if positive_and_negative_associative_scan and not A.is_complex():
+        deltaA = 2 * deltaA - 1
     if not is_variable_B:
         deltaB_u = torch.einsum('bdl,dn,bdl->bdln', delta, B, u)
     else:
@@ -339,6 +364,11 @@ def mamba_inner_fn(
     A, B=None, C=None, D=None, delta_bias=None, B_proj_bias=None,
     C_proj_bias=None, delta_softplus=True, positive_and_negative_associative_scan=None
 ):
+    if causal_conv1d_cuda is None or not has_selective_scan_cuda(xz, positive_and_negative_associative_scan):
+        # The same computation with autograd, its selective scan runs without the CUDA kernels
+        return mamba_inner_ref(xz, conv1d_weight, conv1d_bias, x_proj_weight, delta_proj_weight,
+                               out_proj_weight, out_proj_bias, A, B, C, D, delta_bias, B_proj_bias,
+                               C_proj_bias, delta_softplus, positive_and_negative_associative_scan)
     return MambaInnerFn.apply(xz, conv1d_weight, conv1d_bias, x_proj_weight, delta_proj_weight,
                               out_proj_weight, out_proj_bias,
                               A, B, C, D, delta_bias, B_proj_bias, C_proj_bias, delta_softplus, 1,
@@ -349,14 +379,18 @@ def mamba_inner_ref(
     xz, conv1d_weight, conv1d_bias, x_proj_weight, delta_proj_weight,
     out_proj_weight, out_proj_bias,
     A, B=None, C=None, D=None, delta_bias=None, B_proj_bias=None,
-    C_proj_bias=None, delta_softplus=True
+    C_proj_bias=None, delta_softplus=True, positive_and_negative_associative_scan=None
 ):
-    assert causal_conv1d_fn is not None, "causal_conv1d_fn is not available. Please install causal-conv1d."
     L = xz.shape[-1]
     delta_rank = delta_proj_weight.shape[1]
     d_state = A.shape[-1] * (1 if not A.is_complex() else 2)
     x, z = xz.chunk(2, dim=1)
-    x = causal_conv1d_fn(x, rearrange(conv1d_weight, "d 1 w -> d w"), conv1d_bias, activation="silu")
+    if causal_conv1d_fn is not None and x.is_cuda:
+        x = causal_conv1d_fn(x, rearrange(conv1d_weight, "d 1 w -> d w"), conv1d_bias, activation="silu")
+    else:
+        x = F.silu(F.conv1d(x, conv1d_weight.to(x.dtype),
+                            conv1d_bias.to(x.dtype) if conv1d_bias is not None else None,
+                            padding=conv1d_weight.shape[-1] - 1, groups=x.shape[1])[..., :L])
     # We're being very careful here about the layout, to avoid extra transposes.
     # We want delta to have d as the slowest moving dimension
     # and L as the fastest moving dimension, since those are what the ssm_scan kernel expects.
@@ -379,5 +413,6 @@ def mamba_inner_ref(
             C = rearrange(C, "(b l) dstate -> b dstate l", l=L).contiguous()
         else:
             C = rearrange(C, "(b l) (dstate two) -> b dstate (l two)", l=L, two=2).contiguous()
-    y = selective_scan_fn(x, delta, A, B, C, D, z=z, delta_bias=delta_bias, delta_softplus=True)
+    y = selective_scan_fn(x, delta, A, B, C, D, z=z, delta_bias=delta_bias, delta_softplus=delta_softplus,
+                          positive_and_negative_associative_scan=positive_and_negative_associative_scan)
     return F.linear(rearrange(y, "b d l -> b l d"), out_proj_weight, out_proj_bias)
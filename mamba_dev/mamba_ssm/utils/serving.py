@@ -0,0 +1,300 @@
+# Copyright (c) 2024, Tri Dao, Albert Gu.
+"""Continuous batching for recurrent language models.
+
+`decode` runs a batch of sequences of the same length to the same max_length. Recurrent models carry a state of fixed
+size per sequence instead of a KV cache, so a server can keep a fixed pool of state slots and admit, prefill, decode
+and evict sequences at token granularity, each slot at its own offset.
+"""
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import torch
+
+from mamba_ssm.utils.generation import InferenceParams, sample
+
+try:
+    from fla.models.utils import Cache as FLACache
+except ImportError:
+    FLACache = None
+
+
+def _flatten_state(state):
+    """Tensors of a nested state (dicts, lists and tuples of tensors), dicts in the order of their sorted keys."""
+    if isinstance(state, torch.Tensor):
+        return [state]
+    if isinstance(state, dict):
+        return [t for key in sorted(state) for t in _flatten_state(state[key])]
+    return [t for value in state for t in _flatten_state(value)]
+
+
+def _unflatten_state(template, tensors):
+    """Inverse of _flatten_state: the structure of `template` filled with the iterator `tensors`."""
+    if isinstance(template, torch.Tensor):
+        return next(tensors)
+    if isinstance(template, dict):
+        return {key: _unflatten_state(template[key], tensors) for key in sorted(template)}
+    return type(template)(_unflatten_state(value, tensors) for value in template)
+
+
+class StateSlots:
+    """A pool of num_slots recurrent states of a language model.
+
+    Subclasses allocate the pool (`_init_state`, which also gives the batch dimension of each state tensor) and run
+    the model from a state holding a subset of the slots (`_prefill` for a chunk of one sequence, `_decode` for one
+    token of several sequences). The states of the slots are gathered before and scattered back after each call.
+    """
+
+    def __init__(self, model, num_slots):
+        self.model = model
+        self.num_slots = num_slots
+        self.device = next(model.parameters()).device
+        with torch.no_grad():
+            self.state, self.batch_dims = self._init_state()
+        self.tensors = _flatten_state(self.state)
+        if isinstance(self.batch_dims, int):
+            self.batch_dims = [self.batch_dims] * len(self.tensors)
+
+    def _init_state(self):
+        raise NotImplementedError
+
+    def _prefill(self, input_ids, state, start):
+        raise NotImplementedError
+
+    def _decode(self, input_ids, state):
+        raise NotImplementedError
+
+    def reset(self, slot):
+        """Resets the state of `slot` to the state before the first token."""
+        for t, dim in zip(self.tensors, self.batch_dims):
+            t.select(dim, slot).zero_()
+
+    def gather(self, slots):
+        tensors = (t.index_select(dim, slots) for t, dim in zip(self.tensors, self.batch_dims))
+        return _unflatten_state(self.state, tensors)
+
+    def scatter(self, slots, state):
+        for t, dim, new in zip(self.tensors, self.batch_dims, _flatten_state(state)):
+            t.index_copy_(dim, slots, new.to(t.dtype))
+
+    def prefill(self, input_ids, slot, start):
+        """
+        input_ids: (seqlen,) the tokens start:start + seqlen of the sequence in `slot`.
+        Returns: (vocab_size,) the logits after the last one.
+        """
+        slots = torch.tensor([slot], device=self.device)
+        logits, state = self._prefill(input_ids.unsqueeze(0), self.gather(slots), start)
+        self.scatter(slots, state)
+        return logits[0]
+
+    def decode(self, input_ids, slots):
+        """
+        input_ids: (batch,) the next token of the sequences in `slots` (batch,).
+        Returns: (batch, vocab_size) the logits after them.
+        """
+        logits, state = self._decode(input_ids.unsqueeze(1), self.gather(slots))
+        self.scatter(slots, state)
+        return logits
+
+
+class MambaSlots(StateSlots):
+    """Slots of a MambaLMHeadModel of Mamba or Mamba2 layers, with the states of allocate_inference_cache.
+    The layers only use InferenceParams.seqlen_offset to tell decoding (> 0) from prefill, the offsets of the slots are
+    kept by the scheduler.
+    """
+
+    def _init_state(self):
+        return self.model.allocate_inference_cache(self.num_slots, max_seqlen=1), 0
+
+    def _logits(self, input_ids, state, seqlen_offset):
+        inference_params = InferenceParams(
+            max_seqlen=seqlen_offset + input_ids.shape[1],
+            max_batch_size=input_ids.shape[0],
+            seqlen_offset=seqlen_offset,
+            key_value_memory_dict=state,
+        )
+        return self.model(input_ids, inference_params=inference_params, num_last_tokens=1).logits[:, -1]
+
+    def _prefill(self, input_ids, state, start):
+        if start == 0:
+            return self._logits(input_ids, state, 0), state
+        # The parallel forward pass of the layers starts from a zero state, so the chunks after the first one
+        # are fed one token at a time
+        for t in range(input_ids.shape[1]):
+            logits = self._logits(input_ids[:, t:t + 1], state, start + t)
+        return logits, state
+
+    def _decode(self, input_ids, state):
+        return self._logits(input_ids, state, 1), state
+
+
+class FLASlots(StateSlots):
+    """Slots of a flash-linear-attention causal LM whose layers keep their states in fla.models.utils.Cache and
+    create them with attn.init_state, e.g. DeltaNetForCausalLM.
+    A ShortConvolution with a shift-register cache overwrites it from the inputs of a multi-token call without reading
+    it, so unless all the layers with short convolutions keep a ring buffer cache and its position (an integer tensor
+    of their state, e.g. DeltaNetNoTriton), the chunks after the first one are fed one token at a time.
+    """
+
+    def _init_state(self):
+        assert FLACache is not None, "FLASlots requires the fla package"
+        state = [layer.attn.init_state(self.num_slots) for layer in self.model.model.layers]
+        self.chunked_prefill = all(
+            not getattr(layer.attn, "use_short_conv", False) or any(not t.is_floating_point() for t in layer_state)
+            for layer, layer_state in zip(self.model.model.layers, state)
+        )
+        return state, 0
+
+    def _forward(self, input_ids, state):
+        cache = FLACache.from_legacy_cache(state)
+        logits = self.model(input_ids=input_ids, past_key_values=cache, use_cache=True).logits[:, -1]
+        return logits, cache.states
+
+    def _prefill(self, input_ids, state, start):
+        if start == 0 or self.chunked_prefill:
+            return self._forward(input_ids, state)
+        for t in range(input_ids.shape[1]):
+            logits, state = self._forward(input_ids[:, t:t + 1], state)
+        return logits, state
+
+    def _decode(self, input_ids, state):
+        return self._forward(input_ids, state)
+
+
+class XLSTMSlots(StateSlots):
+    """Slots of an xLSTMLMModel, prefilled with its stateful forward and decoded with step."""
+
+    def _init_state(self):
+        # The structure of the states and the batch dimension of each tensor, from the states of 1 and 2 sequences
+        idx = torch.zeros(2, 1, dtype=torch.long, device=self.device)
+        _, state = self.model.step(idx[:1])
+        tensors, tensors_2 = _flatten_state(state), _flatten_state(self.model.step(idx)[1])
+        batch_dims = [
+            next(dim for dim, (n, n_2) in enumerate(zip(t.shape, t_2.shape)) if n != n_2)
+            for t, t_2 in zip(tensors, tensors_2)
+        ]
+        pool = []
+        for t, dim in zip(tensors, batch_dims):
+            shape = list(t.shape)
+            shape[dim] = self.num_slots
+            pool.append(t.new_zeros(shape))
+        return _unflatten_state(state, iter(pool)), batch_dims
+
+    def _prefill(self, input_ids, state, start):
+        logits, state = self.model(input_ids, state=state, return_last_state=True)
+        return logits[:, -1], state
+
+    def _decode(self, input_ids, state):
+        logits, state = self.model.step(input_ids, state=state)
+        return logits[:, -1], state
+
+
+@dataclass
+class GenerationRequest:
+    """A prompt to complete. The outputs and the timings (time.perf_counter) are filled in by the scheduler."""
+
+    input_ids: torch.Tensor  # (prompt_len,)
+    max_new_tokens: int
+    eos_token_id: Optional[int] = None
+    arrival_time: Optional[float] = None
+    output_ids: List[int] = field(default_factory=list)
+    slot: Optional[int] = None
+    num_prefilled: int = 0
+    first_token_time: Optional[float] = None
+    finish_time: Optional[float] = None
+
+    @property
+    def prefilled(self):
+        return self.num_prefilled == self.input_ids.shape[0]
+
+
+class ContinuousBatchingScheduler:
+    """Serves GenerationRequests with the fixed pool of state slots of `slots` (a StateSlots).
+
+    Each step:
+        1. admits waiting requests into free slots, resetting their states,
+        2. decodes one token for all the running requests whose prompt is prefilled, in one batch,
+        3. prefills at most max_prefill_tokens prompt tokens, in chunks of at most prefill_chunk_size tokens
+           (None for no limit), and samples the first token of the prompts completed,
+        4. evicts the requests that generated max_new_tokens or eos_token_id, freeing their slots for the next step.
+    seqlen_offsets holds the number of tokens fed to the model for each slot.
+    """
+
+    def __init__(self, slots, prefill_chunk_size=None, max_prefill_tokens=None, top_k=1, top_p=0.0, min_p=0.0,
+                 temperature=1.0):
+        self.slots = slots
+        self.prefill_chunk_size = prefill_chunk_size
+        self.max_prefill_tokens = max_prefill_tokens
+        self.sampling_kwargs = dict(top_k=top_k, top_p=top_p, min_p=min_p, temperature=temperature)
+        self.waiting = deque()
+        self.running = [None] * slots.num_slots
+        self.seqlen_offsets = torch.zeros(slots.num_slots, dtype=torch.long)
+
+    def add_request(self, request):
+        assert request.input_ids.shape[0] > 0 and request.max_new_tokens > 0
+        if request.arrival_time is None:
+            request.arrival_time = time.perf_counter()
+        self.waiting.append(request)
+
+    def has_unfinished_requests(self):
+        return bool(self.waiting) or any(request is not None for request in self.running)
+
+    def _sample(self, requests, logits, finished):
+        tokens = sample(logits, **self.sampling_kwargs).tolist()
+        now = time.perf_counter()
+        for request, token in zip(requests, tokens):
+            request.output_ids.append(token)
+            if request.first_token_time is None:
+                request.first_token_time = now
+            if len(request.output_ids) >= request.max_new_tokens or token == request.eos_token_id:
+                request.finish_time = now
+                finished.append(request)
+
+    @torch.no_grad()
+    def step(self):
+        """Runs one scheduling step, returns the requests finished during it."""
+        for slot, request in enumerate(self.running):
+            if request is None and self.waiting:
+                request = self.waiting.popleft()
+                request.slot = slot
+                self.running[slot] = request
+                self.slots.reset(slot)
+                self.seqlen_offsets[slot] = 0
+
+        finished = []
+        decoding = [request for request in self.running if request is not None and request.prefilled]
+        if decoding:
+            slots = torch.tensor([request.slot for request in decoding], device=self.slots.device)
+            input_ids = torch.tensor([request.output_ids[-1] for request in decoding], device=self.slots.device)
+            logits = self.slots.decode(input_ids, slots)
+            self.seqlen_offsets[slots.cpu()] += 1
+            self._sample(decoding, logits, finished)
+
+        budget = self.max_prefill_tokens if self.max_prefill_tokens is not None else float("inf")
+        prefilling = [request for request in self.running if request is not None and not request.prefilled]
+        for request in sorted(prefilling, key=lambda request: request.arrival_time):
+            if budget <= 0:
+                break
+            start = request.num_prefilled
+            chunk_len = min(request.input_ids.shape[0] - start, budget)
+            if self.prefill_chunk_size is not None:
+                chunk_len = min(chunk_len, self.prefill_chunk_size)
+            chunk = request.input_ids[start:start + chunk_len].to(self.slots.device)
+            logits = self.slots.prefill(chunk, request.slot, start)
+            request.num_prefilled += chunk_len
+            self.seqlen_offsets[request.slot] += chunk_len
+            budget -= chunk_len
+            if request.prefilled:
+                self._sample([request], logits.unsqueeze(0), finished)
+
+        for request in finished:
+            self.running[request.slot] = None
+        return finished
+
+    def run(self):
+        """Steps until all the requests added are finished, returns them in the order they finished."""
+        finished = []
+        while self.has_unfinished_requests():
+            finished += self.step()
+        return finished
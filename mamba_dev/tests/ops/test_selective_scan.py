@@ -1,11 +1,14 @@
 # Copyright (C) 2023, Tri Dao.
 
 import numpy as np
+import pytest
 import torch
 
 import mamba_ssm
 
+from mamba_ssm.modules.mamba_simple import Mamba
 from mamba_ssm.ops.selective_scan_interface import selective_scan_fn, selective_scan_ref
+from mamba_ssm.utils.generation import InferenceParams
 
 
 def test_selective_scan(is_variable_B=True, is_variable_C=True, varBC_groups=1, has_D=True, has_z=True,
@@ -76,7 +79,7 @@ def test_selective_scan(is_variable_B=True, is_variable_C=True, varBC_groups=1,
     out_ref, *rest = selective_scan_ref(
         u_ref, delta_ref, A_ref, B_ref, C_ref, D_ref, z=z_ref,
         delta_bias=delta_bias_ref, delta_softplus=delta_softplus,
-        return_last_state=return_last_state
+        return_last_state=return_last_state, positive_and_negative_associative_scan=False
     )
     if return_last_state:
         state_ref = rest[0]
@@ -122,6 +125,61 @@ def test_selective_scan(is_variable_B=True, is_variable_C=True, varBC_groups=1,
     '''
 
 
+@pytest.mark.parametrize("positive_and_negative_associative_scan", [False, True])
+@pytest.mark.parametrize("varBC_groups", [1, 2])
+@pytest.mark.parametrize("is_variable_B", [False, True])
+@pytest.mark.parametrize("seqlen", [1, 100])
+def test_selective_scan_cpu(positive_and_negative_associative_scan, varBC_groups, is_variable_B, seqlen):
+    torch.random.manual_seed(42)
+    batch_size, dim, dstate = 2, 4, 8
+    A = -0.5 * torch.exp(torch.rand(dim, dstate))
+    if not is_variable_B:
+        B = torch.randn(dim, dstate)
+    elif varBC_groups == 1:
+        B = torch.randn(batch_size, dstate, seqlen)
+    else:
+        B = torch.randn(batch_size, varBC_groups, dstate, seqlen)
+    C = torch.randn(batch_size, varBC_groups, dstate, seqlen)
+    D = torch.randn(dim)
+    z = torch.randn(batch_size, dim, seqlen)
+    delta_bias = 0.5 * torch.rand(dim)
+    u = torch.randn(batch_size, dim, seqlen)
+    # large steps give eigenvalues close to -1 with positive_and_negative_associative_scan
+    delta = 0.5 * torch.rand(batch_size, dim, seqlen) + 2.0
+    inputs = [t.requires_grad_() for t in (u, delta, A, B, C, D, z, delta_bias)]
+
+    out, state = selective_scan_fn(*inputs, delta_softplus=True, return_last_state=True,
+                                   positive_and_negative_associative_scan=positive_and_negative_associative_scan)
+    out_ref, state_ref = selective_scan_ref(*inputs, delta_softplus=True, return_last_state=True,
+                                            positive_and_negative_associative_scan=positive_and_negative_associative_scan)
+    assert torch.allclose(out, out_ref, rtol=1e-4, atol=1e-5)
+    assert torch.allclose(state, state_ref, rtol=1e-4, atol=1e-5)
+
+    g = torch.randn_like(out)
+    grads = torch.autograd.grad(out, inputs, g)
+    grads_ref = torch.autograd.grad(out_ref, inputs, g)
+    for name, grad, grad_ref in zip(["du", "ddelta", "dA", "dB", "dC", "dD", "dz", "ddelta_bias"], grads, grads_ref):
+        assert torch.allclose(grad, grad_ref, rtol=1e-3, atol=1e-4), \
+            f"{name} max diff: {(grad - grad_ref).abs().max().item()}"
+
+
+@pytest.mark.parametrize("positive_and_negative_associative_scan", [False, True])
+def test_mamba_step_cpu(positive_and_negative_associative_scan):
+    torch.random.manual_seed(42)
+    batch_size, seqlen, d_model = 2, 12, 16
+    model = Mamba(d_model, positive_and_negative_associative_scan, layer_idx=0)
+    x = torch.randn(batch_size, seqlen, d_model)
+    with torch.no_grad():
+        out = model(x)
+        inference_params = InferenceParams(max_seqlen=seqlen, max_batch_size=batch_size)
+        outs = [model(x[:, :5], inference_params=inference_params)]
+        inference_params.seqlen_offset += 5
+        for i in range(5, seqlen):
+            outs.append(model(x[:, i:i + 1], inference_params=inference_params))
+            inference_params.seqlen_offset += 1
+    assert torch.allclose(out, torch.cat(outs, dim=1), rtol=1e-4, atol=1e-5)
+
+
 '''
 @pytest.mark.parametrize('wtype', [torch.float32])
 # @pytest.mark.parametrize('wtype', [torch.complex64])
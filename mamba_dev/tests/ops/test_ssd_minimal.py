@@ -0,0 +1,70 @@
+import pytest
+import torch
+
+from mamba_ssm.modules import mamba2
+from mamba_ssm.modules.mamba2 import Mamba2
+from mamba_ssm.modules.ssd_minimal import ssd_minimal_discrete
+from mamba_ssm.utils.generation import InferenceParams
+
+
+def ssd_recurrent_ref(X, A, B, C, initial_states, positive_and_negative_associative_scan):
+    transitions = torch.exp(A)
+    if positive_and_negative_associative_scan:
+        transitions = 2 * transitions - 1
+    h = initial_states
+    ys = []
+    for t in range(X.shape[1]):
+        h = transitions[:, t, :, None, None] * h + X[:, t, :, :, None] * B[:, t, :, None, :]
+        ys.append(torch.einsum("bhpn,bhn->bhp", h, C[:, t]))
+    return torch.stack(ys, dim=1), h
+
+
+@pytest.mark.parametrize("positive_and_negative_associative_scan", [False, True])
+@pytest.mark.parametrize("has_initial_states", [False, True])
+@pytest.mark.parametrize("seqlen", [1, 13, 16])
+def test_ssd_minimal_discrete(positive_and_negative_associative_scan, has_initial_states, seqlen):
+    torch.random.manual_seed(42)
+    batch, nheads, headdim, dstate, block_len = 2, 3, 4, 5, 4
+    X = torch.randn(batch, seqlen, nheads, headdim, dtype=torch.float64)
+    # Large steps give transitions close to -1 with positive_and_negative_associative_scan
+    A = -torch.rand(batch, seqlen, nheads, dtype=torch.float64) * 4
+    B = torch.randn(batch, seqlen, nheads, dstate, dtype=torch.float64)
+    C = torch.randn(batch, seqlen, nheads, dstate, dtype=torch.float64)
+    h0 = torch.randn(batch, nheads, headdim, dstate, dtype=torch.float64) if has_initial_states else None
+
+    y_ref, final_state_ref = ssd_recurrent_ref(
+        X, A, B, C, h0 if h0 is not None else torch.zeros(batch, nheads, headdim, dstate, dtype=torch.float64),
+        positive_and_negative_associative_scan,
+    )
+    y, final_state = ssd_minimal_discrete(
+        X, A, B, C, block_len, initial_states=h0,
+        positive_and_negative_associative_scan=positive_and_negative_associative_scan,
+    )
+    assert y.shape == y_ref.shape
+    assert torch.allclose(y, y_ref)
+    assert torch.allclose(final_state, final_state_ref)
+
+
+@pytest.mark.parametrize("D_has_hdim", [False, True])
+@pytest.mark.parametrize("prompt_len", [1, 6])
+def test_mamba2_negative_eigenvalues_step(monkeypatch, D_has_hdim, prompt_len):
+    # The PyTorch paths of the conv, the chunked scan and the decoding step
+    monkeypatch.setattr(mamba2, "causal_conv1d_fn", None)
+    monkeypatch.setattr(mamba2, "causal_conv1d_update", None)
+    torch.random.manual_seed(42)
+    batch, seqlen, d_model = 2, 11, 16
+    model = Mamba2(d_model, d_state=8, headdim=8, ngroups=2, D_has_hdim=D_has_hdim, rmsnorm=False, dt_min=0.05,
+                   dt_max=0.5, positive_and_negative_associative_scan=True, chunk_size=4, layer_idx=0)
+    with torch.no_grad():
+        model.D.normal_()
+    u = torch.randn(batch, seqlen, d_model)
+
+    with torch.no_grad():
+        out_ref = model(u)
+        inference_params = InferenceParams(max_seqlen=seqlen, max_batch_size=batch)
+        outs = [model(u[:, :prompt_len], inference_params=inference_params)]
+        inference_params.seqlen_offset += prompt_len
+        for t in range(prompt_len, seqlen):
+            outs.append(model(u[:, t:t + 1], inference_params=inference_params))
+            inference_params.seqlen_offset += 1
+    assert torch.allclose(torch.cat(outs, dim=1), out_ref, rtol=1e-4, atol=1e-5)
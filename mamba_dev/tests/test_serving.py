@@ -0,0 +1,99 @@
+import torch
+
+from mamba_ssm.models.mixer_seq_simple import MambaLMHeadModel
+from mamba_ssm.models.config_mamba import MambaConfig
+from mamba_ssm.utils.serving import ContinuousBatchingScheduler, FLASlots, GenerationRequest, MambaSlots, XLSTMSlots
+
+import pytest
+
+# The slots of the other model families are tested when their packages (flash-linear-attention's fla and xlstm)
+# are installed next to mamba_ssm
+try:
+    import fla.models as fla_models
+except ImportError:
+    fla_models = None
+
+try:
+    from xlstm.blocks.mlstm.block import mLSTMBlockConfig
+    from xlstm.blocks.mlstm.layer import mLSTMLayerConfig
+    from xlstm.blocks.slstm.block import sLSTMBlockConfig
+    from xlstm.blocks.slstm.layer import sLSTMLayerConfig
+    from xlstm.xlstm_lm_model import xLSTMLMModel, xLSTMLMModelConfig
+except ImportError:
+    xLSTMLMModel = None
+
+
+def check_continuous_batching(model, slots, vocab_size, prefill_chunk_size):
+    requests = [
+        GenerationRequest(torch.randint(0, vocab_size, (prompt_len,)), max_new_tokens=max_new_tokens)
+        for prompt_len, max_new_tokens in [(5, 7), (1, 3), (9, 4), (4, 10), (7, 1), (2, 6)]
+    ]
+
+    # Fewer slots than requests, and requests arriving while others are decoding
+    scheduler = ContinuousBatchingScheduler(slots, prefill_chunk_size=prefill_chunk_size, max_prefill_tokens=6)
+    for request in requests[:2]:
+        scheduler.add_request(request)
+    finished = scheduler.step() + scheduler.step()
+    for request in requests[2:]:
+        scheduler.add_request(request)
+    finished += scheduler.run()
+    assert sorted(map(id, finished)) == sorted(map(id, requests))
+
+    with torch.no_grad():
+        for request in requests:
+            input_ids = request.input_ids[None]
+            for _ in range(request.max_new_tokens):
+                logits = model(input_ids)
+                # xLSTMLMModel returns the logits, the Hugging Face style models an output with .logits
+                logits = logits if isinstance(logits, torch.Tensor) else logits.logits
+                next_token = logits[:, -1].argmax(-1, keepdim=True)
+                input_ids = torch.cat([input_ids, next_token], dim=1)
+            assert request.output_ids == input_ids[0, request.input_ids.shape[0]:].tolist()
+            assert request.arrival_time <= request.first_token_time <= request.finish_time
+
+
+@pytest.mark.parametrize("prefill_chunk_size", [None, 3])
+def test_continuous_batching(prefill_chunk_size):
+    device = "cpu"
+    vocab_size = 64
+    config = MambaConfig(d_model=32, n_layer=2, vocab_size=vocab_size, rms_norm=False, fused_add_norm=False,
+                         pad_vocab_size_multiple=16)
+    torch.manual_seed(2357)
+    model = MambaLMHeadModel(config, device=device).eval()
+    check_continuous_batching(model, MambaSlots(model, num_slots=3), vocab_size, prefill_chunk_size)
+
+
+@pytest.mark.skipif(fla_models is None, reason="requires the fla package of flash-linear-attention")
+@pytest.mark.parametrize("chunked_prefill", [False, True])
+@pytest.mark.parametrize("prefill_chunk_size", [None, 3])
+def test_continuous_batching_fla(chunked_prefill, prefill_chunk_size):
+    vocab_size = 64
+    config = fla_models.DeltaNetConfig(hidden_size=32, num_hidden_layers=2, num_heads=2, vocab_size=vocab_size)
+    torch.manual_seed(2357)
+    model = fla_models.DeltaNetNoTritonForCausalLM(config).eval()
+    slots = FLASlots(model, num_slots=3)
+    # the ring buffer caches of DeltaNetNoTriton take multi-token chunks, False checks the token by token fallback
+    assert slots.chunked_prefill
+    slots.chunked_prefill = chunked_prefill
+    check_continuous_batching(model, slots, vocab_size, prefill_chunk_size)
+
+
+@pytest.mark.skipif(xLSTMLMModel is None, reason="requires the xlstm package")
+@pytest.mark.parametrize("prefill_chunk_size", [None, 3])
+def test_continuous_batching_xlstm(prefill_chunk_size):
+    vocab_size = 64
+    config = xLSTMLMModelConfig(
+        mlstm_block=mLSTMBlockConfig(mlstm=mLSTMLayerConfig(num_heads=2, chunk_size=4)),
+        slstm_block=sLSTMBlockConfig(slstm=sLSTMLayerConfig(num_heads=2, backend="vanilla", dtype="float32")),
+        context_length=16,
+        num_blocks=2,
+        embedding_dim=16,
+        slstm_at=[1],
+        vocab_size=vocab_size,
+    )
+    torch.manual_seed(2357)
+    model = xLSTMLMModel(config)
+    model.reset_parameters()
+    # float64, so that the greedy tokens of the batched and the single sequence runs agree
+    model = model.to(torch.float64).eval()
+    check_continuous_batching(model, XLSTMSlots(model, num_slots=3), vocab_size, prefill_chunk_size)
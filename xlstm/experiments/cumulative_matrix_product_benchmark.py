@@ -0,0 +1,69 @@
+import itertools
+import time
+from argparse import ArgumentParser
+
+import torch
+
+from simple_recurrent.cumulative_matrix_product import (cumulative_matrix_product,
+                                                        naive_cumulative_matrix_multiplication, orthogonalize)
+
+MODES = ['sequential', 'blocked', 'hillis_steele', 'blelloch']
+
+
+def generate_matrices(batch_size, num_matrices, dim, kind):
+    if kind == 'orthogonal':
+        return orthogonalize(torch.randn(batch_size, num_matrices, dim, dim))
+    # contractive: spectral norm slightly below one
+    U = torch.randn(batch_size, num_matrices, dim, dim)
+    return 0.99 * U / torch.linalg.matrix_norm(U, ord=2, keepdim=True)
+
+
+def time_mode(U, num_runs, **kwargs):
+    times = []
+    for _ in range(num_runs + 1):
+        start_time = time.perf_counter()
+        result = cumulative_matrix_product(U, **kwargs)
+        times.append(time.perf_counter() - start_time)
+    # the first run is a warmup
+    return min(times[1:]), result
+
+
+def run_benchmarks(sequence_lengths, dims, batch_size, block_size, kinds, num_runs):
+    results = []
+    for kind, num_matrices, dim in itertools.product(kinds, sequence_lengths, dims):
+        torch.manual_seed(0)
+        U = generate_matrices(batch_size, num_matrices, dim, kind)
+        reference = naive_cumulative_matrix_multiplication(U)
+        variants = [(mode, dict(mode=mode, block_size=block_size)) for mode in MODES]
+        variants.append(('blocked+fp64', dict(mode='blocked', block_size=block_size, accumulate_dtype=torch.float64)))
+        if kind == 'orthogonal':
+            variants.append(('blocked+renorm', dict(mode='blocked', block_size=block_size,
+                                                    renormalize=orthogonalize, renormalize_every=block_size)))
+        sequential_time = None
+        for name, kwargs in variants:
+            run_time, result = time_mode(U, num_runs, **kwargs)
+            sequential_time = sequential_time or run_time
+            drift = (result.to(torch.float64) - reference).abs().max().item()
+            results.append((kind, num_matrices, dim, name, run_time, sequential_time / run_time, drift))
+    return results
+
+
+def print_results(results):
+    print(f"{'matrices':<12} {'L':>6} {'d':>4} {'mode':<16} {'time [ms]':>10} {'speedup':>8} {'max drift':>10}")
+    for kind, num_matrices, dim, name, run_time, speedup, drift in results:
+        print(f"{kind:<12} {num_matrices:>6} {dim:>4} {name:<16} {1e3 * run_time:>10.2f} {speedup:>7.1f}x"
+              f" {drift:>10.2e}")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--sequence_lengths', nargs='+', type=int, default=[256, 1024, 4096])
+    parser.add_argument('--dims', nargs='+', type=int, default=[4, 16])
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--block_size', type=int, default=16)
+    parser.add_argument('--kinds', nargs='+', default=['orthogonal', 'contractive'])
+    parser.add_argument('--num_runs', type=int, default=3)
+    args = parser.parse_args()
+
+    print_results(run_benchmarks(args.sequence_lengths, args.dims, args.batch_size, args.block_size, args.kinds,
+                                 args.num_runs))
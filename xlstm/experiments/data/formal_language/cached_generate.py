@@ -0,0 +1,121 @@
+# Copyright (c) NXAI GmbH and its affiliates 2024
+# Andreas Auer
+import hashlib
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from ..utils import CacheMixin
+from .online_generate import OnlineTaskGenerate, _AccessWrapper
+
+TOKENS_FILE = "tokens.bin"
+MASK_FILE = "mask.bin"
+CACHE_DTYPE = np.int32
+
+# dataset options that are applied on top of the generated split and do not change its content
+_NON_GENERATE_KEYS = (
+    "data_dir",
+    "cache_train",
+    "length_bucketing",
+    "bucket_size",
+    "pad_to_multiple",
+    "seed",
+    "subpar",
+    "shift",
+    "enable_mask",
+    "additional_prefix_tokens",
+    "additional_suffix_tokens",
+    "additional_premask_tokens",
+)
+
+
+@dataclass
+class SplitCacheConfig:
+    """Manifest of a cached split, stored as `config.json` next to the token and mask arrays."""
+
+    data_dir: str
+    seed: int
+    shape: list
+    dtype: str
+    generate_kwargs: dict
+
+
+def split_cache_key(seed: int, generate_kwargs: dict) -> str:
+    key_dict = {k: v for k, v in generate_kwargs.items() if k not in _NON_GENERATE_KEYS}
+    key_dict["seed"] = int(seed)
+    return hashlib.md5(json.dumps(key_dict, sort_keys=True).encode()).hexdigest()
+
+
+class CachedTaskGenerateMaskedSeparate:
+    """
+    Formal language split that is generated once into contiguous int32 token / mask files and re-opened
+    zero-copy through `np.memmap` afterwards. The cache directory of a split is keyed by the hash of its seed
+    and generation arguments, so runs with a different model or training setup share the same files.
+    Same interface as `OnlineTaskGenerateMaskedSeparate`.
+    """
+
+    def __init__(
+        self,
+        seed: int,
+        generate_kwargs: dict,
+        data_dir: str,
+        check_existing: bool = False,
+        chunk_size: int = 4096,
+    ):
+        self._generate_kwargs = {k: v for k, v in generate_kwargs.items() if k not in _NON_GENERATE_KEYS}
+        self._count = self._generate_kwargs["count"]
+        self._shape = [self._count, self._generate_kwargs["context_length"]]
+        self.directory = Path(data_dir) / split_cache_key(seed, self._generate_kwargs)
+        self.config = SplitCacheConfig(
+            data_dir=str(data_dir),
+            seed=int(seed),
+            shape=self._shape,
+            dtype=np.dtype(CACHE_DTYPE).name,
+            generate_kwargs=self._generate_kwargs,
+        )
+        if not CacheMixin.check_exist(self.config, self.directory, check_existing):
+            self._write(seed, chunk_size)
+
+        self._tokens = np.memmap(self.directory / TOKENS_FILE, dtype=CACHE_DTYPE, mode="r", shape=tuple(self._shape))
+        self._mask = np.memmap(self.directory / MASK_FILE, dtype=CACHE_DTYPE, mode="r", shape=tuple(self._shape))
+        self._dataset_wrapper = _AccessWrapper(
+            lambda index: np.array(self._tokens[index]), self.__len__, lambda indices: self._tokens[np.asarray(indices)]
+        )
+        self._dataset_mask_wrapper = _AccessWrapper(
+            lambda index: np.array(self._mask[index]), self.__len__, lambda indices: self._mask[np.asarray(indices)]
+        )
+
+    def _write(self, seed: int, chunk_size: int):
+        # write into a process-private directory first, so concurrent workers never see a partial split
+        tmp_directory = self.directory.with_name(f"{self.directory.name}.tmp{os.getpid()}")
+        tmp_directory.mkdir(parents=True, exist_ok=True)
+        online_task_generate = OnlineTaskGenerate(seed, {**self._generate_kwargs, "seed": seed})
+        tokens = np.memmap(tmp_directory / TOKENS_FILE, dtype=CACHE_DTYPE, mode="w+", shape=tuple(self._shape))
+        mask = np.memmap(tmp_directory / MASK_FILE, dtype=CACHE_DTYPE, mode="w+", shape=tuple(self._shape))
+        for start in range(0, self._count, chunk_size):
+            indices = np.arange(start, min(start + chunk_size, self._count))
+            tokens[indices], mask[indices] = online_task_generate.get_batch(indices)
+        tokens.flush()
+        mask.flush()
+        del tokens, mask
+        CacheMixin.post_generate(self.config, tmp_directory)
+        try:
+            os.replace(tmp_directory, self.directory)
+        except OSError:
+            # another process finished the same split first
+            shutil.rmtree(tmp_directory, ignore_errors=True)
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def dataset(self):
+        return self._dataset_wrapper
+
+    @property
+    def dataset_mask(self):
+        return self._dataset_mask_wrapper
@@ -4,13 +4,17 @@ import inspect
 import itertools
 import random
 from dataclasses import asdict, dataclass, field, make_dataclass
-from typing import Mapping, List
+from typing import Mapping, List, Optional
 
+import numpy as np
 import torch
 import torchmetrics
+from torch.utils.data import default_collate
 
+from .cached_generate import CachedTaskGenerateMaskedSeparate
 from .generate import ALL_ARGS
 from .online_generate import OnlineTaskGenerateMaskedSeparate
+from ..length_bucketing import LengthBucketBatchSampler, trim_batch
 from ..utils import DataGen
 from ...metrics import SequenceAccuracy
 
@@ -51,6 +55,11 @@ class FormLangDatasetConfig(FormLangDatasetConfigBase):
     additional_premask_tokens: int = (
         0  # e.g. adding [PREMASK]... before every mask to enable "causal working memory"
     )
+    data_dir: Optional[str] = None  # if set, fixed-size splits are cached there as memory-mapped arrays
+    cache_train: bool = False  # also cache the (usually very large) train split
+    length_bucketing: bool = False  # batch sequences of similar length and cut batches to their longest sequence
+    bucket_size: int = 16  # number of batches that are sorted by length together
+    pad_to_multiple: int = 8  # trimmed batch lengths are rounded up to a multiple of this
 
 
 class FormLangDataset(torch.utils.data.Dataset):
@@ -67,6 +76,9 @@ class FormLangDataset(torch.utils.data.Dataset):
         additional_prefix_tokens: int = 0,
         additional_suffix_tokens: int = 0,
         additional_premask_tokens: int = 0,
+        length_bucketing: bool = False,
+        bucket_size: int = 16,
+        pad_to_multiple: int = 8,
     ):
         self._context_length = context_length
         self._dataset = dataset
@@ -79,39 +91,14 @@ class FormLangDataset(torch.utils.data.Dataset):
         self.additional_prefix_tokens = additional_prefix_tokens
         self.additional_suffix_tokens = additional_suffix_tokens
         self.additional_premask_tokens = additional_premask_tokens
+        self.length_bucketing = length_bucketing
+        self.bucket_size = bucket_size
+        self.pad_to_multiple = pad_to_multiple
 
     def __getitem__(self, idx):
-        prefix_token_offset = (
-            self.vocab_size
-            - self.additional_prefix_tokens
-            - self.additional_suffix_tokens
-            - self.additional_premask_tokens
-        )
-        suffix_token_offset = (
-            self.vocab_size
-            - self.additional_suffix_tokens
-            - self.additional_premask_tokens
-        )
-        prefix_tokens = torch.arange(
-            prefix_token_offset, prefix_token_offset + self.additional_prefix_tokens
-        )
-        suffix_tokens = torch.arange(
-            suffix_token_offset, suffix_token_offset + self.additional_suffix_tokens
-        )
         seq = torch.from_numpy(self._dataset[idx])
-        seq = torch.concat((prefix_tokens, seq, suffix_tokens))
         mask = torch.from_numpy(self._dataset_mask[idx])
-        mask = torch.concat(
-            (
-                torch.zeros([self.additional_prefix_tokens]).to(
-                    device=mask.device, dtype=mask.dtype
-                ),
-                mask,
-                torch.zeros([self.additional_suffix_tokens]).to(
-                    device=mask.device, dtype=mask.dtype
-                ),
-            )
-        )
+        seq, mask = self._add_prefix_and_suffix(seq, mask)
         mask = mask.contiguous()
         if self.additional_premask_tokens:
             new_seq = []
@@ -133,6 +120,100 @@ class FormLangDataset(torch.utils.data.Dataset):
             seq = torch.tensor(new_seq)
             mask = torch.tensor(new_mask)
 
+        return self._mask_and_shift(seq, mask)
+
+    def __getitems__(self, indices):
+        """
+        Batched fetch used by the DataLoader: generates, masks and shifts all indices as single (B, L) tensors.
+        The result is already collated, so loaders have to use `FormLangDataset.collate_fn`.
+        With length bucketing, the batch is cut after its last target.
+        """
+        batch = self._get_batch(indices)
+        if self.length_bucketing:
+            batch = trim_batch(*batch, pad_to_multiple=self.pad_to_multiple, ignore_index=self.target_pad_idx)
+        return batch
+
+    def _get_batch(self, indices):
+        if self.additional_premask_tokens:
+            # premask tokens change the per-sample length, keep the per-sample path
+            return tuple(default_collate([self[idx] for idx in indices]))
+        if hasattr(self._dataset, "get_batch"):
+            seq = torch.from_numpy(self._dataset.get_batch(indices))
+            mask = torch.from_numpy(self._dataset_mask.get_batch(indices))
+        else:
+            seq = torch.from_numpy(np.stack([self._dataset[idx] for idx in indices]))
+            mask = torch.from_numpy(np.stack([self._dataset_mask[idx] for idx in indices]))
+        seq, mask = self._add_prefix_and_suffix(seq, mask)
+        return self._mask_and_shift(seq, mask)
+
+    def _add_prefix_and_suffix(self, seq, mask):
+        """
+        Adds the prefix and suffix tokens around the sequences of `seq` [..., L] and zeros around the mask,
+        for a single sample or a batch. The special tokens are the last ones of the vocabulary, in the order
+        prefix, suffix, premask.
+        """
+        if not (self.additional_prefix_tokens or self.additional_suffix_tokens):
+            return seq, mask
+        prefix_token_offset = (
+            self.vocab_size
+            - self.additional_prefix_tokens
+            - self.additional_suffix_tokens
+            - self.additional_premask_tokens
+        )
+        suffix_token_offset = prefix_token_offset + self.additional_prefix_tokens
+        batch_shape = seq.shape[:-1]
+        prefix_tokens = torch.arange(
+            prefix_token_offset, prefix_token_offset + self.additional_prefix_tokens
+        ).expand(*batch_shape, -1)
+        suffix_tokens = torch.arange(
+            suffix_token_offset, suffix_token_offset + self.additional_suffix_tokens
+        ).expand(*batch_shape, -1)
+        seq = torch.concat((prefix_tokens, seq, suffix_tokens), dim=-1)
+        mask = torch.concat(
+            (
+                mask.new_zeros([*batch_shape, self.additional_prefix_tokens]),
+                mask,
+                mask.new_zeros([*batch_shape, self.additional_suffix_tokens]),
+            ),
+            dim=-1,
+        )
+        return seq, mask
+
+    def sequence_lengths(self, indices) -> np.ndarray:
+        """Number of tokens up to and including the last target of every sample."""
+        mask = np.asarray(self._dataset_mask.get_batch(indices)) != 0
+        # samples without a target count as full length
+        lengths = mask.shape[1] - np.argmax(mask[:, ::-1], axis=1)
+        lengths += self.additional_prefix_tokens + self.additional_premask_tokens * mask.sum(axis=1)
+        return lengths
+
+    def loader_kwargs(self, batch_size: int, seed: int = 0) -> dict:
+        """Batching arguments for a `DataLoader` over this dataset."""
+        if not self.length_bucketing:
+            return dict(batch_size=batch_size, collate_fn=self.collate_fn)
+        batch_sampler = LengthBucketBatchSampler(
+            self.sequence_lengths, len(self), batch_size, bucket_size=self.bucket_size, seed=seed
+        )
+        return dict(batch_sampler=batch_sampler, collate_fn=self.collate_fn)
+
+    @property
+    def padded_length(self) -> int:
+        """Length of the untrimmed model inputs."""
+        return (
+            self.context_length
+            + self.additional_prefix_tokens
+            + self.additional_suffix_tokens
+            - abs(self.shift)
+        )
+
+    @staticmethod
+    def collate_fn(batch):
+        # batches from __getitems__ are already collated
+        if isinstance(batch, tuple):
+            return batch
+        return default_collate(batch)
+
+    def _mask_and_shift(self, seq, mask):
         if self.enable_mask:
             # mask
             seqIn = torch.where(mask == 1, self.pad_idx, seq).to(dtype=torch.long)
@@ -143,12 +224,13 @@ class FormLangDataset(torch.utils.data.Dataset):
             seqIn = seq.to(dtype=torch.long)
             seqOut = seq.to(dtype=torch.long)
         if self.shift > 0:
-            res = seqIn[: -self.shift], seqOut[self.shift :]
+            res = seqIn[..., : -self.shift], seqOut[..., self.shift :]
         elif self.shift < 0:
-            res = seqIn[-self.shift :], seqOut[: self.shift]
+            res = seqIn[..., -self.shift :], seqOut[..., : self.shift]
         else:
             res = seqIn, seqOut
-        return res
+        # slicing a batch along the sequence dimension leaves non-contiguous views
+        return tuple(t.contiguous() for t in res)
 
     def __len__(self):
         return len(self._dataset)
@@ -207,9 +289,19 @@ class FormLangDatasetGenerator(DataGen):
                         kwargs[param] = subconfig[param]
 
                 kwargs["count"] = kwargs["count"][subset]
-                online_generator = OnlineTaskGenerateMaskedSeparate(
-                    self.seeds[subset_part], kwargs
-                )
+                if self.config.data_dir is not None and (
+                    subset != "train" or self.config.cache_train
+                ):
+                    online_generator = CachedTaskGenerateMaskedSeparate(
+                        self.seeds[subset_part],
+                        kwargs,
+                        data_dir=self.config.data_dir,
+                        check_existing=self.check_existing,
+                    )
+                else:
+                    online_generator = OnlineTaskGenerateMaskedSeparate(
+                        self.seeds[subset_part], kwargs
+                    )
                 self.datasets[subset_part] = FormLangDataset(
                     online_generator.dataset,
                     online_generator.dataset_mask,
@@ -222,6 +314,9 @@ class FormLangDatasetGenerator(DataGen):
                     additional_prefix_tokens=self.config.additional_prefix_tokens,
                     additional_premask_tokens=self.config.additional_premask_tokens,
                     additional_suffix_tokens=self.config.additional_suffix_tokens,
+                    length_bucketing=self.config.length_bucketing,
+                    bucket_size=self.config.bucket_size,
+                    pad_to_multiple=self.config.pad_to_multiple,
                 )
 
     def _resolve_subset_subparts(self, subset) -> List[str]:
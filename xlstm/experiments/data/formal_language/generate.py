@@ -26,6 +26,14 @@ TOKEN_SYNTH = [
     "modular_arithmetic_with_brackets",
 ]
 
+# tasks that accept one seed per batch row and build the whole batch with array operations
+VECTORIZED_SYNTH = [
+    "parity",
+    "cycle_navigation",
+    "even_pairs",
+    "modular_arithmetic",
+]
+
 GEN_FUNCS_RES_DTYPE = {synth_lang_type: np.int32 for synth_lang_type in TOKEN_SYNTH}
 GEN_ARGS = {key: inspect.signature(func).parameters for key, func in GEN_FUNCS.items()}
 
@@ -22,18 +22,41 @@ class OnlineTaskGenerate(Dataset):
         assert batch.shape[0] == 1  # Currently one element per generation
         return batch[0], batch_mask[0]
 
+    def get_batch(self, indices):
+        """
+        Generates the samples for all indices at once. The result is identical to stacking `self[index]`.
+        """
+        seeds = self.base_seed + np.asarray(indices)
+        synth_lang_type = self._generate_kwargs["synth_lang_type"]
+        if synth_lang_type not in generate.VECTORIZED_SYNTH:
+            samples = [self[index] for index in indices]
+            return np.stack([sample[0] for sample in samples]), np.stack([sample[1] for sample in samples])
+        generate_kwargs = {**self._generate_kwargs, "batch_size": len(seeds)}
+        return generate.GEN_FUNCS[synth_lang_type](seed=seeds, **generate_kwargs)
+
+    def __getitems__(self, indices):
+        # batched fetch used by the DataLoader, rows are views into the batch arrays
+        batch, batch_mask = self.get_batch(indices)
+        return list(zip(batch, batch_mask))
+
     def __len__(self) -> int:
         return self._count
 
 
 class _AccessWrapper:
-    def __init__(self, access_func, count_func):
+    def __init__(self, access_func, count_func, batch_access_func=None):
         self._access_func = access_func
         self._count_func = count_func
+        self._batch_access_func = batch_access_func
 
     def __getitem__(self, index):
         return self._access_func(index)
 
+    def get_batch(self, indices):
+        if self._batch_access_func is None:
+            return np.stack([self._access_func(index) for index in indices])
+        return self._batch_access_func(indices)
+
     def __len__(self) -> int:
         return self._count_func()
 
@@ -46,10 +69,18 @@ class OnlineTaskGenerateMaskedSeparate(Dataset):
 
     def __init__(self, seed, generate_kwargs):
         self._online_task_generate = OnlineTaskGenerate(seed, generate_kwargs)
-        self._dataset_wrapper = _AccessWrapper(self._retrieve_batch_data, self._online_task_generate.__len__)
-        self._dataset_mask_wrapper = _AccessWrapper(self._retrieve_batch_mask, self._online_task_generate.__len__)
+        self._dataset_wrapper = _AccessWrapper(
+            self._retrieve_batch_data, self._online_task_generate.__len__, self._retrieve_batches_data
+        )
+        self._dataset_mask_wrapper = _AccessWrapper(
+            self._retrieve_batch_mask, self._online_task_generate.__len__, self._retrieve_batches_mask
+        )
         self._current_idx = None
         self._current_values = None
+        self._current_indices = None
+        self._current_batch_values = None
+        self._generated_positions = {}
+        self._generated_values = None
 
     def _retrieve(self, index):
         if self._current_idx != index:
@@ -64,6 +95,30 @@ class OnlineTaskGenerateMaskedSeparate(Dataset):
         self._retrieve(index)
         return self._current_values[1]
 
+    def _retrieve_batches(self, indices):
+        indices = tuple(indices)
+        if self._current_indices == indices:
+            return
+        # subsets of the last generated batch (e.g. the batches of a length bucketing window, whose lengths were
+        # requested first) are gathered from it instead of being generated again
+        positions = [self._generated_positions.get(index) for index in indices]
+        if None in positions:
+            self._generated_values = self._online_task_generate.get_batch(indices)
+            self._generated_positions = {index: position for position, index in enumerate(indices)}
+            self._current_batch_values = self._generated_values
+        else:
+            rows = np.asarray(positions)
+            self._current_batch_values = tuple(values[rows] for values in self._generated_values)
+        self._current_indices = indices
+
+    def _retrieve_batches_data(self, indices):
+        self._retrieve_batches(indices)
+        return self._current_batch_values[0]
+
+    def _retrieve_batches_mask(self, indices):
+        self._retrieve_batches(indices)
+        return self._current_batch_values[1]
+
     @property
     def dataset(self):
         return self._dataset_wrapper
@@ -1,9 +1,11 @@
 # Copyright (c) NXAI GmbH and its affiliates 2024
 # Korbinian Pöppel, Andreas Auer
-from typing import Optional
+from typing import Optional, Sequence, Union
 
 import numpy as np
 
+from .rng import get_rng
+
 
 def cycle_navigation(
     *,
@@ -14,10 +16,10 @@ def cycle_navigation(
     max_sequence_length: Optional[int] = None,
     context_length: int = 20,
     pad_idx: int = 0,
-    seed: int = 42,
+    seed: Union[int, Sequence[int]] = 42,
     **kwargs,
 ):
-    rng = np.random.default_rng(seed)
+    rng = get_rng(seed, batch_size)
 
     max_step_size = min(vocab_size // 2, max_step_size)
 
@@ -31,19 +33,18 @@ def cycle_navigation(
     cycle_size = vocab_size - 2 - 2*max_step_size
     # print("CYCLE SIZE: ", cycle_size)
 
+    batch_idx = np.arange(batch_size)
+    res[np.arange(context_length)[None, :] >= sizes[:, None] - 1] = 0
+
+    # padded positions are zero and map to a step of zero
+    steps = np.where(res <= max_step_size + 1, res - 1, max_step_size + 1 - res)
+    steps[res == 0] = 0
+    # print("STEP", steps)
+    step_sum = np.sum(steps, axis=1)
+    # print("SUM", step_sum)
+    res[batch_idx, sizes - 1] = step_sum % (cycle_size) + 2*max_step_size + 2
     prediction_mask = np.zeros_like(res)
-    for batch_idx in range(batch_size):
-        res[batch_idx, sizes[batch_idx]-1:] = 0
-
-        steps = np.where(
-            res[batch_idx, :sizes[batch_idx]-1] <= max_step_size + 1,
-            res[batch_idx, :sizes[batch_idx]-1] - 1,
-            max_step_size + 1 - res[batch_idx, :sizes[batch_idx]-1])
-        # print("STEP", steps)
-        step_sum = np.sum(steps)
-        # print("SUM", step_sum)
-        res[batch_idx, sizes[batch_idx]-1] = step_sum % (cycle_size) + 2*max_step_size + 2
-        prediction_mask[batch_idx, sizes[batch_idx]-1]  = 1
+    prediction_mask[batch_idx, sizes - 1] = 1
     
     return res, prediction_mask
 
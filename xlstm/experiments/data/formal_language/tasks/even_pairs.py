@@ -1,9 +1,11 @@
 # Copyright (c) NXAI GmbH and its affiliates 2024
 # Korbinian Pöppel, Andreas Auer
-from typing import Optional
+from typing import Optional, Sequence, Union
 
 import numpy as np
 
+from .rng import get_rng
+
 
 def even_pairs(
     batch_size: int = 1,
@@ -12,12 +14,12 @@ def even_pairs(
     max_sequence_length: Optional[int] = None,
     context_length: int = 20,
     pad_idx: int = 0,
-    seed: int = 42,
+    seed: Union[int, Sequence[int]] = 42,
     **kwargs
 ):
     max_sequence_length = context_length if max_sequence_length is None else max_sequence_length
     min_sequence_length = max_sequence_length if min_sequence_length is None else min_sequence_length
-    rng = np.random.default_rng(seed)
+    rng = get_rng(seed, batch_size)
     res = np.zeros([batch_size, context_length], dtype=np.int32)
     res[:, :-1] = rng.integers(vocab_size-1, size=[batch_size, context_length - 1]) + 1
     sizes = rng.integers(min_sequence_length, max_sequence_length + 1, size=[batch_size])
@@ -26,10 +28,9 @@ def even_pairs(
     diffs = res[:, 1:-1] - res[:, :-2]
     cumdiffs = np.cumsum(diffs, axis=1)
 
-    for batch_idx in range(batch_size):
-        res[batch_idx, sizes[batch_idx] : ] = 0
-        prediction_mask[batch_idx, sizes[batch_idx] - 1] = 1
-        
-        res[batch_idx, sizes[batch_idx] - 1] = np.abs(cumdiffs[batch_idx, sizes[batch_idx] - 3]) + 1
+    batch_idx = np.arange(batch_size)
+    prediction_mask[batch_idx, sizes - 1] = 1
+    res[batch_idx, sizes - 1] = np.abs(cumdiffs[batch_idx, sizes - 3]) + 1
+    res[np.arange(context_length)[None, :] >= sizes[:, None]] = 0
 
-    return res, prediction_mask
\ No newline at end of file
+    return res, prediction_mask
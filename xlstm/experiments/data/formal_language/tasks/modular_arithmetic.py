@@ -1,9 +1,11 @@
 # Copyright (c) NXAI GmbH and its affiliates 2024
 # Korbinian Pöppel, Andreas Auer
-from typing import Optional
+from typing import Optional, Sequence, Union
 
 import numpy as np
 
+from .rng import get_rng
+
 
 def modular_arithmetic(
     *,
@@ -12,10 +14,10 @@ def modular_arithmetic(
     min_sequence_length: Optional[int] = None,
     max_sequence_length: Optional[int] = None,
     context_length: int = 20,
-    seed: int = 42,
+    seed: Union[int, Sequence[int]] = 42,
     **kwargs,
 ):
-    rng = np.random.default_rng(seed)
+    rng = get_rng(seed, batch_size)
 
     max_sequence_length = context_length if max_sequence_length is None else max_sequence_length
     min_sequence_length = max_sequence_length if min_sequence_length is None else min_sequence_length
@@ -27,35 +29,32 @@ def modular_arithmetic(
     # print("MSEQ", min_seq, (max_sequence_length + 2)//2)
     sizes = 2*rng.integers(min_seq, (max_sequence_length + 1)//2+1, size=[batch_size])-1
 
-    prediction_mask = np.zeros_like(res)
     max_num = vocab_size - 5
     # print("MAX_NUM", max_num)
-    for batch_idx in range(batch_size):
-        # print("SIZE", sizes[batch_idx])
-        res[batch_idx, sizes[batch_idx]-2] = 4
-        res[batch_idx, sizes[batch_idx]:] = 0
-        total_val = 0
-        tmp_val = 1
-        prev_val = res[batch_idx, 0] - 5
-        prev_op_sign = 1
-        for n, num in enumerate(res[batch_idx, 1:sizes[batch_idx]-2]):
-            # at an operator
-            if n % 2 == 0:
-                assert num > 0 and num <= 4
-                # '*'
-                if num != 3:
-                    total_val += prev_op_sign * prev_val
-                    # print("NEW TOTAL", total_val, prev_op_sign, prev_val)
-                    prev_val = 1
-                    prev_op_sign = -1 if num == 2 else 1
-            else:
-                prev_val *= (num - 5)
-        total_val += prev_op_sign * prev_val
-        res[batch_idx, sizes[batch_idx]-1] = total_val % (max_num) + 5
-        # print("TOTAL", total_val)
-        
-        prediction_mask[batch_idx, sizes[batch_idx]-1]  = 1
-    
+    batch_idx = np.arange(batch_size)
+    res[batch_idx, sizes - 2] = 4
+    res[np.arange(context_length)[None, :] >= sizes[:, None]] = 0
+
+    # fold the expression in precedence order: numbers sit at even positions, operators in between,
+    # every '+' / '-' starts a new (signed) product term, '*' extends the current one
+    nums = res[:, 0::2] - 5
+    ops = res[:, 1::2]
+    num_valid = np.arange(nums.shape[1])[None, :] < (sizes[:, None] - 1) // 2
+    term_start = np.ones_like(num_valid)
+    term_start[:, 1:] = ops[:, : nums.shape[1] - 1] != 3
+    term_sign = np.ones_like(nums)
+    term_sign[:, 1:] = np.where(ops[:, : nums.shape[1] - 1] == 2, -1, 1)
+
+    # segmented products / sums over the flattened valid numbers (int64 wrap-around as in the scalar fold)
+    term_offsets = np.flatnonzero(term_start[num_valid])
+    terms = np.multiply.reduceat(nums[num_valid], term_offsets) * term_sign[num_valid][term_offsets]
+    sample_offsets = np.concatenate([[0], np.cumsum(np.sum(term_start & num_valid, axis=1))[:-1]])
+    total_val = np.add.reduceat(terms, sample_offsets)
+    res[batch_idx, sizes - 1] = total_val % (max_num) + 5
+
+    prediction_mask = np.zeros_like(res)
+    prediction_mask[batch_idx, sizes - 1] = 1
+
     return res, prediction_mask
 
 
@@ -1,9 +1,11 @@
 # Copyright (c) NXAI GmbH and its affiliates 2024
 # Korbinian Pöppel, Andreas Auer
-from typing import Optional
+from typing import Optional, Sequence, Union
 
 import numpy as np
 
+from .rng import get_rng
+
 
 # same as a half-add operation (but expanded to larger numbers eventually)
 def parity(
@@ -14,11 +16,11 @@ def parity(
     max_sequence_length: Optional[int] = None,
     context_length: int = 20,
     pad_idx: int = 0,
-    seed: int = 42,
+    seed: Union[int, Sequence[int]] = 42,
     **kwargs
 ):
     vocab = np.arange(0, vocab_size - 1)
-    rng = np.random.default_rng(seed)
+    rng = get_rng(seed, batch_size)
 
     max_sequence_length = context_length if max_sequence_length is None else max_sequence_length
     min_sequence_length = max_sequence_length if min_sequence_length is None else min_sequence_length
@@ -26,12 +28,12 @@ def parity(
     res = np.zeros([batch_size, context_length], dtype=np.int32)
     res[:, :-1] = rng.integers(1, vocab_size, size=[batch_size, context_length - 1])
     sizes = rng.integers(min_sequence_length, max_sequence_length + 1, size=[batch_size])
+    batch_idx = np.arange(batch_size)
+    # zero everything from the parity position on, the parity is then a masked sum over the valid prefix
+    res[np.arange(context_length)[None, :] >= sizes[:, None] - 1] = 0
+    res[batch_idx, sizes - 1] = (np.sum(res, axis=1) - sizes + 1) % (vocab_size - 1) + 1
     prediction_mask = np.zeros_like(res)
-    for batch_idx in range(batch_size):
-        res[batch_idx, sizes[batch_idx] - 1 :] = np.zeros_like(res[batch_idx, sizes[batch_idx] - 1 :])
-        par = (np.sum(res[batch_idx, : sizes[batch_idx] - 1]) - sizes[batch_idx] + 1) % (vocab_size - 1) + 1
-        res[batch_idx, sizes[batch_idx] - 1] = par
-        prediction_mask[batch_idx, sizes[batch_idx] - 1 : sizes[batch_idx]] = 1
+    prediction_mask[batch_idx, sizes - 1] = 1
 
     return res, prediction_mask
 
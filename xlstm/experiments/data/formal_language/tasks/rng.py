@@ -0,0 +1,34 @@
+# Copyright (c) NXAI GmbH and its affiliates 2024
+# Andreas Auer
+from typing import Sequence, Union
+
+import numpy as np
+
+
+class PerSampleGenerator:
+    """
+    Drop-in for the subset of `np.random.Generator` used by the formal language tasks, where every batch row
+    is drawn from its own generator. A batch drawn with seeds [s_0, ..., s_n] is therefore identical to stacking
+    n single-sample batches drawn with `seed=s_i`.
+    """
+
+    def __init__(self, seeds: Sequence[int]):
+        self._rngs = [np.random.default_rng(seed) for seed in seeds]
+
+    def __len__(self) -> int:
+        return len(self._rngs)
+
+    def integers(self, *args, size, **kwargs):
+        size = tuple(np.atleast_1d(size))
+        assert size[0] == len(self._rngs), "Leading dimension has to match the number of seeds"
+        return np.concatenate([rng.integers(*args, size=(1, *size[1:]), **kwargs) for rng in self._rngs])
+
+
+def get_rng(seed: Union[int, Sequence[int]], batch_size: int):
+    """
+    Returns a generator for a single seed, or a PerSampleGenerator if one seed per batch row is given.
+    """
+    if np.ndim(seed) == 0:
+        return np.random.default_rng(seed)
+    assert len(seed) == batch_size, f"Got {len(seed)} seeds for a batch of size {batch_size}"
+    return PerSampleGenerator(seed)
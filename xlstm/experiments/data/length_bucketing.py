@@ -0,0 +1,104 @@
+# Copyright (c) NXAI GmbH and its affiliates 2024
+import math
+from typing import Callable, Iterator, List, Sequence
+
+import numpy as np
+import torch
+from torch.utils.data import Sampler
+
+
+def trimmed_length(labels: torch.Tensor, pad_to_multiple: int = 1, ignore_index: int = -1) -> int:
+    """
+    Length to which a (batch_size, sequence_length) batch can be cut without changing the loss: for a causal
+    model the positions after the last target of the batch never influence a target. The length is rounded up
+    to a multiple of `pad_to_multiple` to keep the number of distinct shapes (and kernel variants) small.
+    """
+    valid_positions = torch.nonzero((labels != ignore_index).any(dim=0))
+    length = int(valid_positions[-1]) + 1 if len(valid_positions) else 1
+    return min(math.ceil(length / pad_to_multiple) * pad_to_multiple, labels.shape[-1])
+
+
+def trim_batch(inputs: torch.Tensor, labels: torch.Tensor, pad_to_multiple: int = 1, ignore_index: int = -1):
+    length = trimmed_length(labels, pad_to_multiple=pad_to_multiple, ignore_index=ignore_index)
+    return inputs[..., :length].contiguous(), labels[..., :length].contiguous()
+
+
+class LengthBucketBatchSampler(Sampler[List[int]]):
+    """
+    Batch sampler that groups indices of similar length. The indices are processed in consecutive windows of
+    `bucket_size` batches; every window is sorted by length, split into batches and yielded in random order.
+    Lengths are only requested per window through `length_func(indices)`, so online datasets are never
+    generated up front.
+    """
+
+    def __init__(
+        self,
+        length_func: Callable[[Sequence[int]], np.ndarray],
+        num_samples: int,
+        batch_size: int,
+        bucket_size: int = 16,
+        shuffle: bool = False,
+        drop_last: bool = False,
+        seed: int = 0,
+    ):
+        self.length_func = length_func
+        self.num_samples = num_samples
+        self.batch_size = batch_size
+        self.bucket_size = bucket_size
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def __iter__(self) -> Iterator[List[int]]:
+        rng = np.random.default_rng((self.seed, self.epoch))
+        self.epoch += 1
+        indices = rng.permutation(self.num_samples) if self.shuffle else np.arange(self.num_samples)
+        window_size = self.batch_size * self.bucket_size
+        for start in range(0, self.num_samples, window_size):
+            window = indices[start:start + window_size]
+            # stable sort, so that equal lengths keep the (random or sequential) order of the window
+            window = window[np.argsort(self.length_func(window), kind="stable")]
+            batches = [window[i:i + self.batch_size] for i in range(0, len(window), self.batch_size)]
+            if self.drop_last and len(batches[-1]) < self.batch_size:
+                batches = batches[:-1]
+            for batch_idx in rng.permutation(len(batches)):
+                yield batches[batch_idx].tolist()
+
+    def __len__(self) -> int:
+        window_size = self.batch_size * self.bucket_size
+        num_full_windows, remainder = divmod(self.num_samples, window_size)
+        round_func = math.floor if self.drop_last else math.ceil
+        return num_full_windows * self.bucket_size + round_func(remainder / self.batch_size)
+
+
+class TokenEfficiency:
+    """
+    Token efficiency of (trimmed) batches. A sequence contributes the tokens up to its last target, the
+    computed tokens are those of the batches fed to the model, and the padded tokens those the batches would
+    have had with every sequence padded to `full_length`.
+    """
+
+    def __init__(self, full_length: int, ignore_index: int = -1):
+        self.full_length = full_length
+        self.ignore_index = ignore_index
+        self.reset()
+
+    def reset(self):
+        self.real_tokens = 0
+        self.computed_tokens = 0
+        self.padded_tokens = 0
+
+    def update(self, labels: torch.Tensor):
+        valid = labels != self.ignore_index
+        lengths = valid.shape[-1] - valid.flip(-1).to(torch.int8).argmax(dim=-1)
+        self.real_tokens += int(torch.where(valid.any(dim=-1), lengths, 0).sum())
+        self.computed_tokens += labels.numel()
+        self.padded_tokens += labels.shape[0] * self.full_length
+
+    def compute(self) -> dict[str, float]:
+        return {
+            "token_efficiency": self.real_tokens / max(self.computed_tokens, 1),
+            "padded_token_efficiency": self.real_tokens / max(self.padded_tokens, 1),
+            "computed_token_fraction": self.computed_tokens / max(self.padded_tokens, 1),
+        }
@@ -12,6 +12,7 @@ from torch.utils.data import DataLoader
 
 import wandb
 from experiments.data.formal_language.formal_language_dataset import FormLangDatasetGenerator
+from experiments.data.length_bucketing import TokenEfficiency
 from simple_recurrent.lm_model import SimpleRecurrentNet
 from xlstm.xlstm_lm_model import xLSTMLMModel, xLSTMLMModelConfig
 
@@ -88,9 +89,11 @@ def evaluate_model(model, test_loader, device, vocab_size):
     total_predictions = 0
     sequence_lengths = []
     sequence_accuracies = []
+    token_efficiency = TokenEfficiency(test_loader.dataset.padded_length)
 
     with torch.no_grad():
         for inputs, labels in test_loader:
+            token_efficiency.update(labels)
             inputs = inputs.to(device)
             labels = labels.to(device)
 
@@ -119,6 +122,7 @@ def evaluate_model(model, test_loader, device, vocab_size):
             total_predictions += mask.sum().item()
 
     avg_loss = total_loss / len(test_loader)
+    print(f"Token efficiency: {token_efficiency.compute()}")
     accuracy = correct_predictions / total_predictions if total_predictions > 0 else 0
 
     return avg_loss, accuracy, sequence_lengths, sequence_accuracies
@@ -207,7 +211,7 @@ def main(directory_path):
     test_dataset = dataset.test_split['test']
     print(f"Length of test dataset: {len(test_dataset)}")
 
-    test_loader = DataLoader(test_dataset, batch_size=cfg.training.batch_size)
+    test_loader = DataLoader(test_dataset, **test_dataset.loader_kwargs(cfg.training.batch_size))
 
     # Initialize model
     if cfg.model.name == "simple_recurrent":
@@ -0,0 +1,58 @@
+import itertools
+import time
+from argparse import ArgumentParser
+
+import torch
+
+from xlstm.components.linear_headwise import (
+    LinearHeadwiseExpand,
+    LinearHeadwiseExpandConfig,
+    linear_headwise_expand_fused,
+)
+
+
+def run_mode(mode, in_features, blocksize, num_tokens, repeats):
+    torch.manual_seed(0)
+    projs = [
+        LinearHeadwiseExpand(LinearHeadwiseExpandConfig(in_features=in_features, num_heads=in_features // blocksize,
+                                                        bias=False))
+        for _ in range(3)
+    ]
+    x_qk, x_v = torch.randn(num_tokens, in_features), torch.randn(num_tokens, in_features)
+    if mode == "separate":
+        def fn():
+            return projs[0](x_qk), projs[1](x_qk), projs[2](x_v)
+    else:
+        def fn():
+            return linear_headwise_expand_fused([x_qk, x_qk, x_v], projs, mode=mode)
+    with torch.no_grad():
+        fn()  # warmup
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        elapsed = (time.perf_counter() - start_time) / repeats
+    return elapsed
+
+
+def print_results(results):
+    print(f"{'mode':<9} {'in':>6} {'blocksize':>9} {'tokens':>7} {'time [us]':>10}")
+    for mode, in_features, blocksize, num_tokens, elapsed in results:
+        print(f"{mode:<9} {in_features:>6} {blocksize:>9} {num_tokens:>7} {1e6 * elapsed:>10.1f}")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--modes', nargs='+', default=["separate", "grouped", "dense"])
+    # the mLSTM inner embedding dim of the experiment configs is 256
+    parser.add_argument('--in_features', nargs='+', type=int, default=[256, 1024])
+    parser.add_argument('--blocksizes', nargs='+', type=int, default=[2, 4, 8, 16, 32])
+    parser.add_argument('--num_tokens', nargs='+', type=int, default=[1, 4096])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    results = []
+    for in_features, blocksize, num_tokens, mode in itertools.product(args.in_features, args.blocksizes,
+                                                                      args.num_tokens, args.modes):
+        elapsed = run_mode(mode, in_features, blocksize, num_tokens, args.repeats)
+        results.append((mode, in_features, blocksize, num_tokens, elapsed))
+    print_results(results)
@@ -1,8 +1,10 @@
 # Copyright (c) NXAI GmbH and its affiliates 2024
 # Korbinian Poeppel, Maximilian Beck
+import math
 import os
 from argparse import ArgumentParser
 from datetime import datetime
+from functools import partial
 from typing import Type
 
 import torch
@@ -17,8 +19,10 @@ import wandb
 from experiments.data.formal_language.formal_language_dataset import (
     FormLangDatasetGenerator,
 )
+from experiments.data.length_bucketing import TokenEfficiency
 from experiments.data.utils import DataGen
 from experiments.lr_scheduler import LinearWarmupCosineAnnealing
+from experiments.training_monitor import HealthCheck, SyncCounter, Throughput
 from mamba.mamba import MambaLM, MambaConfig
 from simple_recurrent.lm_model import SimpleRecurrentNet
 from xlstm.xlstm_lm_model import xLSTMLMModel, xLSTMLMModelConfig
@@ -58,12 +62,63 @@ def save_wandb_run_id(save_dir):
 
 
 def check_nan_inf(tensor, name):
+    if not tensor.is_floating_point():
+        # token ids and labels cannot be non-finite, skip the device synchronization
+        return False
     if torch.isnan(tensor).any() or torch.isinf(tensor).any():
         print(f"Warning: NaN or Inf detected in {name}")
         return True
     return False
 
 
+def parse_grad_clip_norm(grad_clip_norm):
+    # configs write `grad_clip_norm: None`, which YAML reads as a string
+    if grad_clip_norm is None or str(grad_clip_norm).lower() in ("none", "null") or float(grad_clip_norm) <= 0:
+        return None
+    return float(grad_clip_norm)
+
+
+def optimizer_impl_kwargs(optimizer_impl):
+    # 'foreach': multi-tensor kernels, 'fused': single fused kernel per parameter group
+    if optimizer_impl == "default":
+        return {}
+    if optimizer_impl == "foreach":
+        return {"foreach": True}
+    if optimizer_impl == "fused":
+        return {"fused": True}
+    raise ValueError(f"Unknown optimizer implementation {optimizer_impl}, choose default, foreach or fused")
+
+
+def truncated_bptt_backward(model, inputs, labels, window, vocab_size, autocast, check_finite=False):
+    """
+    Streams the sequences through the model in windows of `window` timesteps and backpropagates each window
+    separately. The recurrent state is carried between windows but detached, so activations are only kept for
+    one window. Returns the detached logits and summed loss, or None if check_finite and a window loss is
+    non-finite. The whole batch is dropped then: the gradients of the earlier windows are rolled back to the
+    gradients accumulated before the call.
+    """
+    if check_finite:
+        grads_at_entry = [(param, None if param.grad is None else param.grad.clone()) for param in model.parameters()]
+    state = None
+    outputs, loss_sum = [], 0.0
+    for start in range(0, inputs.shape[1], window):
+        with autocast():
+            window_outputs, state = model(inputs[:, start:start + window], state=state, return_last_state=True)
+            loss = nn.functional.cross_entropy(
+                window_outputs.reshape(-1, vocab_size), labels[:, start:start + window].reshape(-1),
+                ignore_index=-1, reduction="sum"
+            )
+        if check_finite and (torch.isnan(loss) or torch.isinf(loss)):
+            for param, grad in grads_at_entry:
+                param.grad = grad
+            return None
+        loss.backward()
+        state = model.detach_state(state)
+        outputs.append(window_outputs.detach())
+        loss_sum += loss.detach()
+    return torch.cat(outputs, dim=1), loss_sum
+
+
 def get_available_dtype(device):
     if device == 'cuda':
         # check that device supports bfloat16
@@ -102,10 +157,18 @@ def main(cfg: DictConfig, seed: int, lr: float, batch_size: int):
 
     dataset = load_dataset(cfg.dataset.name, cfg.dataset.kwargs)
 
-    train_loader = DataLoader(dataset.train_split, batch_size=cfg.training.batch_size)
+    pin_memory = str(cfg.training.device).startswith("cuda")
+    train_loader = DataLoader(
+        dataset.train_split,
+        pin_memory=pin_memory,
+        **dataset.train_split.loader_kwargs(cfg.training.get("micro_batch_size", None) or cfg.training.batch_size,
+                                            seed=seed),
+    )
     val_loaders = {
-        key: DataLoader(val_ds, batch_size=cfg.training.batch_size) for key, val_ds in dataset.validation_split.items()
+        key: DataLoader(val_ds, pin_memory=pin_memory, **val_ds.loader_kwargs(cfg.training.batch_size))
+        for key, val_ds in dataset.validation_split.items()
     }
+    train_token_efficiency = TokenEfficiency(dataset.train_split.padded_length)
     train_metrics = dataset.train_metrics.to(device=cfg.training.device)
     val_metrics = dataset.validation_metrics.to(device=cfg.training.device)
     if cfg.model.name == "simple_recurrent":
@@ -152,6 +215,7 @@ def main(cfg: DictConfig, seed: int, lr: float, batch_size: int):
             {"weight_decay": 0.0, "params": optim_groups[1]},
         ),
         lr=cfg.training.lr,
+        **optimizer_impl_kwargs(cfg.training.get("optimizer_impl", "default")),
     )
     lr_scheduler = LinearWarmupCosineAnnealing(
         optimizer,
@@ -161,69 +225,140 @@ def main(cfg: DictConfig, seed: int, lr: float, batch_size: int):
         cfg.training.lr_decay_factor * cfg.training.lr,
     )
 
+    # 'eager': check inputs, loss and every parameter each step (skips non-finite batches),
+    # 'fused' / 'deferred': on-device flags, read back every step / every health_check_every steps
+    health_check = HealthCheck(
+        model.parameters(),
+        mode=cfg.training.get("health_check", "eager"),
+        check_every=cfg.training.get("health_check_every", cfg.training.val_every_step),
+    )
+    sync_counter = SyncCounter(cfg.training.device)
+    throughput = Throughput(sync_counter)
+
+    # gradient accumulation: micro-batches are accumulated until tokens_per_step input tokens (if set) or
+    # batch_size samples are reached, the loss is normalized by the number of targets of the whole step
+    micro_batch_size = cfg.training.get("micro_batch_size", None) or cfg.training.batch_size
+    accumulation_steps = math.ceil(cfg.training.batch_size / micro_batch_size)
+    tokens_per_step = cfg.training.get("tokens_per_step", None)
+    grad_clip_norm = parse_grad_clip_norm(cfg.training.get("grad_clip_norm", None))
+    # truncated backpropagation through time: windows of tbptt_window timesteps, the state is carried but detached
+    tbptt_window = cfg.training.get("tbptt_window", None)
+    if tbptt_window is not None and not hasattr(model, "detach_state"):
+        raise ValueError(f"Model {cfg.model.name} does not support truncated backpropagation through time")
+    autocast = partial(
+        torch.autocast,
+        device_type=cfg.training.device,
+        dtype=available_dtype,
+        enabled=cfg.training.enable_mixed_precision,
+    )
+
     # Training loop
     step = 0
     epoch = 1
     running_loss = 0.0
+    grad_norm = None
+    micro_step, step_tokens, step_targets, step_loss = 0, 0, 0, 0.0
+    optimizer.zero_grad(set_to_none=True)
+    sync_counter.start()
 
     while step < cfg.training.num_steps:
         monitoring = tqdm(train_loader, total=0, initial=0)
         for inputs, labels in monitoring:
             monitoring.set_description_str(f"Steps {step + 1}/{cfg.training.num_steps} (Epoch: {epoch})")
-            inputs = inputs.to(device=cfg.training.device)
-            labels = labels.to(device=cfg.training.device)
+            train_token_efficiency.update(labels)
+            # counted on the host batch, so no device synchronization is needed
+            num_targets = int((labels != -1).sum())
+            num_tokens = inputs.numel()
+            inputs = inputs.to(device=cfg.training.device, non_blocking=True)
+            labels = labels.to(device=cfg.training.device, non_blocking=True)
 
             model.train()
-            optimizer.zero_grad()
-            with torch.autocast(
-                    device_type=cfg.training.device,
-                    dtype=available_dtype,
-                    enabled=cfg.training.enable_mixed_precision,
-            ):
-                # Inside the training loop
-                if check_nan_inf(inputs, "inputs") or check_nan_inf(labels, "labels"):
-                    print(f"Warning: NaN or Inf in input data at step {step}. Skipping this batch.")
-                    continue
-
-                outputs = model(inputs.to(device=cfg.training.device))
-                loss = nn.functional.cross_entropy(outputs.view(-1, cfg.model.vocab_size), labels.view(-1), ignore_index=-1)
-                if torch.isnan(loss) or torch.isinf(loss):
-                    print(f"Warning: NaN or Inf loss: {loss} encountered at step {step}. Skipping this batch.")
+            # Inside the training loop
+            if health_check.mode == "eager" and (check_nan_inf(inputs, "inputs") or check_nan_inf(labels, "labels")):
+                print(f"Warning: NaN or Inf in input data at step {step}. Skipping this batch.")
+                continue
+            if tbptt_window is not None:
+                result = truncated_bptt_backward(model, inputs, labels, tbptt_window, cfg.model.vocab_size, autocast,
+                                                 check_finite=health_check.mode == "eager")
+                if result is None:
+                    print(f"Warning: NaN or Inf loss encountered at step {step}. Dropping this batch.")
                     continue
+                outputs, loss = result
+            else:
+                with autocast():
+                    outputs = model(inputs)
+                    loss = nn.functional.cross_entropy(
+                        outputs.view(-1, cfg.model.vocab_size), labels.view(-1), ignore_index=-1, reduction="sum"
+                    )
+                    if health_check.mode == "eager" and (torch.isnan(loss) or torch.isinf(loss)):
+                        print(f"Warning: NaN or Inf loss: {loss} encountered at step {step}. Skipping this batch.")
+                        continue
                 loss.backward()
-                optimizer.step()
-                # After optimizer.step()
+            train_metrics.update(outputs.detach(), labels)
+            throughput.update(num_tokens)
+            micro_step += 1
+            step_tokens += num_tokens
+            step_targets += num_targets
+            step_loss += loss.detach()
+            if tokens_per_step is not None:
+                if step_tokens < tokens_per_step:
+                    continue
+            elif micro_step < accumulation_steps:
+                continue
+
+            # sum over all micro-batches -> mean over all targets of the step, one fused multiply
+            grads = [param.grad for param in model.parameters() if param.grad is not None]
+            if grads:
+                torch._foreach_mul_(grads, 1.0 / max(step_targets, 1))
+            if grad_clip_norm is not None:
+                # one fused global norm, the clipping coefficient stays on device
+                grad_norm = torch.nn.utils.clip_grad_norm_(model.parameters(), grad_clip_norm, foreach=True)
+            optimizer.step()
+            optimizer.zero_grad(set_to_none=True)
+            # After optimizer.step()
+            if health_check.mode == "eager":
                 for name, param in model.named_parameters():
                     if check_nan_inf(param.data, f"parameter {name}"):
                         print(f"Warning: NaN or Inf in model parameters after update at step {step}")
                         break
-                lr_scheduler.step()
-                running_loss = loss
+            else:
+                health_check.update(step_loss, step)
+            lr_scheduler.step()
+            running_loss = step_loss / max(step_targets, 1)
+            micro_step, step_tokens, step_targets, step_loss = 0, 0, 0, 0.0
             step += 1
-            train_metrics.update(outputs, labels)
+            health_check.check(step)
             if step % cfg.training.val_every_step == 0:
+                throughput_metrics = throughput.compute(step)
                 print(
                     f"\nStep [{step + 1}/{cfg.training.num_steps}] (Epoch: {epoch}), Loss: {running_loss:.4f},"
-                    f" Metrics: {train_metrics.compute()}"
+                    f" Metrics: {train_metrics.compute()}, Tokens: {train_token_efficiency.compute()},"
+                    f" Throughput: {throughput_metrics}"
                 )
                 # Log training metrics to wandb
                 wandb.log({
                     "step": step,
                     "epoch": epoch,
                     "train_loss": running_loss,
-                    **{f"train_{k}": v for k, v in train_metrics.compute().items()}
+                    **{f"train_{k}": v for k, v in train_metrics.compute().items()},
+                    **{f"train_{k}": v for k, v in train_token_efficiency.compute().items()},
+                    **{f"train_{k}": v for k, v in throughput_metrics.items()},
+                    **({"train_grad_norm": grad_norm} if grad_norm is not None else {}),
                 })
                 train_metrics.reset()
+                train_token_efficiency.reset()
 
                 # Validation loop
                 for vl_name, val_loader in val_loaders.items():
                     model.eval()
                     val_loss = 0.0
                     val_metrics.reset()
+                    val_token_efficiency = TokenEfficiency(val_loader.dataset.padded_length)
                     with torch.no_grad():
                         for val_inputs, val_labels in val_loader:
-                            val_inputs = val_inputs.to(device=cfg.training.device)
-                            val_labels = val_labels.to(device=cfg.training.device)
+                            val_token_efficiency.update(val_labels)
+                            val_inputs = val_inputs.to(device=cfg.training.device, non_blocking=True)
+                            val_labels = val_labels.to(device=cfg.training.device, non_blocking=True)
                             with torch.autocast(
                                     device_type=cfg.training.device,
                                     dtype=available_dtype,
@@ -235,17 +370,19 @@ def main(cfg: DictConfig, seed: int, lr: float, batch_size: int):
                                     val_labels.view(-1),
                                     ignore_index=-1,
                                 )
-                                val_loss += loss.item()
+                                # accumulated on device, read back once per validation split
+                                val_loss += loss.detach()
                                 val_metrics.update(val_outputs, val_labels)
-                        val_loss /= len(val_loader)
+                        val_loss = float(val_loss) / len(val_loader)
                         print(
                             f"Validation[{vl_name}] Loss: {val_loss:.4f},"
-                            f" Metrics: {val_metrics.compute()}"
+                            f" Metrics: {val_metrics.compute()}, Tokens: {val_token_efficiency.compute()}"
                         )
                         metric_dict = {
                             "step": step,
                             f"val_{vl_name}_loss": val_loss,
-                            **{f"val_{vl_name}_{k}": v for k, v in val_metrics.compute().items()}
+                            **{f"val_{vl_name}_{k}": v for k, v in val_metrics.compute().items()},
+                            **{f"val_{vl_name}_{k}": v for k, v in val_token_efficiency.compute().items()},
                         }
                         '''
                         if cfg.model.name == "simple_recurrent" and cfg.model.layer_type == "diagonal":
@@ -261,10 +398,14 @@ def main(cfg: DictConfig, seed: int, lr: float, batch_size: int):
                         '''
                         # Log validation metrics to wandb
                         wandb.log(metric_dict)
+                # validation does not count towards the training throughput
+                throughput.restart(step)
 
             if step >= cfg.training.num_steps:
                 break
         epoch += 1
+    health_check.check(step, force=True)
+    sync_counter.stop()
 
     # Save the model at the end of training
     model_save_path = os.path.join(save_dir, f"model_{cfg.model.name}_seed_{seed}.pth")
@@ -2,26 +2,36 @@
 from typing import Optional
 
 import torch
-import torchmetrics
 from torchmetrics import Metric
 
 
 class SequenceAccuracy(Metric):
+    """
+    Micro-averaged multiclass accuracy over all non-ignored targets (same result as `torchmetrics.Accuracy`).
+    The counts are accumulated with masked reductions instead of boolean indexing, so `update` never
+    synchronizes with the device.
+    """
+
     is_differentiable: Optional[bool] = False
     higher_is_better: Optional[bool] = True
+    full_state_update: bool = False
 
-    def __init__(self, **kwargs):
-        super().__init__()
-        self._acc = torchmetrics.Accuracy(**kwargs)
+    def __init__(self, task: str = "multiclass", num_classes: Optional[int] = None,
+                 ignore_index: Optional[int] = None, **kwargs):
+        super().__init__(**kwargs)
+        if task != "multiclass":
+            raise ValueError(f"SequenceAccuracy only supports multiclass tasks, got {task}")
+        self.num_classes = num_classes
+        self.ignore_index = ignore_index
+        self.add_state("correct", default=torch.tensor(0), dist_reduce_fx="sum")
+        self.add_state("total", default=torch.tensor(0), dist_reduce_fx="sum")
 
     def update(self, preds: torch.Tensor, target: torch.Tensor):
-        preds = preds.reshape((-1, preds.shape[-1]))
+        preds = preds.reshape((-1, preds.shape[-1])).argmax(dim=-1)
         target = target.flatten()
-        return self._acc.update(preds, target)
+        valid = target != self.ignore_index if self.ignore_index is not None else torch.ones_like(target, dtype=bool)
+        self.correct += ((preds == target) & valid).sum()
+        self.total += valid.sum()
 
     def compute(self):
-        return self._acc.compute()
-
-    def reset(self, *args, **kwargs):
-        super().reset(*args, **kwargs)
-        self._acc.reset()
+        return self.correct.float() / self.total.clamp(min=1)
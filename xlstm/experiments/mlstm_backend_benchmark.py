@@ -0,0 +1,45 @@
+import itertools
+import time
+from argparse import ArgumentParser
+
+import torch
+
+from xlstm.blocks.mlstm.backends import mlstm_backend_registry
+
+
+def run_backend(backend, sequence_length, batch_size, num_heads, head_dim, chunk_size):
+    torch.manual_seed(0)
+    q, k, v = (torch.randn(batch_size, num_heads, sequence_length, head_dim) for _ in range(3))
+    igate_preact = torch.randn(batch_size, num_heads, sequence_length, 1)
+    fgate_preact = torch.randn(batch_size, num_heads, sequence_length, 1) + 3.0
+    with torch.profiler.profile(activities=[torch.profiler.ProfilerActivity.CPU], profile_memory=True) as prof:
+        start_time = time.perf_counter()
+        with torch.no_grad():
+            mlstm_backend_registry[backend](q, k, v, igate_preact, fgate_preact, chunk_size=chunk_size)
+        elapsed = time.perf_counter() - start_time
+    largest_alloc = max((event.cpu_memory_usage for event in prof.key_averages()), default=0)
+    return elapsed, largest_alloc
+
+
+def print_results(results):
+    print(f"{'backend':<10} {'S':>7} {'time [ms]':>10} {'largest alloc [MB]':>19}")
+    for backend, S, elapsed, largest_alloc in results:
+        print(f"{backend:<10} {S:>7} {1e3 * elapsed:>10.1f} {largest_alloc / 2 ** 20:>19.1f}")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--backends', nargs='+', default=list(mlstm_backend_registry))
+    parser.add_argument('--sequence_lengths', nargs='+', type=int, default=[256, 1024, 4096])
+    parser.add_argument('--batch_size', type=int, default=1)
+    parser.add_argument('--num_heads', type=int, default=4)
+    parser.add_argument('--head_dim', type=int, default=64)
+    parser.add_argument('--chunk_size', type=int, default=64)
+    args = parser.parse_args()
+
+    results = []
+    for backend, S in itertools.product(args.backends, args.sequence_lengths):
+        elapsed, largest_alloc = run_backend(backend, S, args.batch_size, args.num_heads, args.head_dim,
+                                           args.chunk_size)
+        results.append((backend, S, elapsed, largest_alloc))
+    print_results(results)
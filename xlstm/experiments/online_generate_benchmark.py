@@ -0,0 +1,93 @@
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+from torch.utils.data import DataLoader, Dataset
+
+from experiments.data.formal_language.generate import VECTORIZED_SYNTH
+from experiments.data.formal_language.online_generate import OnlineTaskGenerate
+
+TASK_KWARGS = {
+    "parity": dict(vocab_size=3),
+    "cycle_navigation": dict(vocab_size=10),
+    "even_pairs": dict(vocab_size=3),
+    "modular_arithmetic": dict(vocab_size=10),
+}
+
+
+class _PerIndexDataset(Dataset):
+    """Hides `__getitems__` so that the DataLoader falls back to one `__getitem__` call per sample."""
+
+    def __init__(self, dataset):
+        self._dataset = dataset
+
+    def __getitem__(self, index):
+        return self._dataset[index]
+
+    def __len__(self):
+        return len(self._dataset)
+
+
+def make_dataset(synth_lang_type, count, context_length, min_sequence_length, max_sequence_length):
+    generate_kwargs = dict(
+        synth_lang_type=synth_lang_type,
+        batch_size=1,
+        context_length=context_length,
+        min_sequence_length=min_sequence_length,
+        max_sequence_length=max_sequence_length,
+        seed=1,
+        count=count,
+        **TASK_KWARGS[synth_lang_type],
+    )
+    return OnlineTaskGenerate(seed=1, generate_kwargs=generate_kwargs)
+
+
+def time_loader(dataset, batch_size, num_batches):
+    loader = DataLoader(dataset, batch_size=batch_size)
+    start_time = time.perf_counter()
+    for batch_idx, _ in enumerate(loader):
+        if batch_idx + 1 >= num_batches:
+            break
+    return time.perf_counter() - start_time
+
+
+def run_benchmarks(batch_size, num_batches, context_length, min_sequence_length, max_sequence_length):
+    results = {}
+    for synth_lang_type in VECTORIZED_SYNTH:
+        dataset = make_dataset(
+            synth_lang_type, batch_size * num_batches, context_length, min_sequence_length, max_sequence_length
+        )
+        # the batched path has to reproduce the per-index samples exactly
+        indices = np.arange(batch_size)
+        batch, batch_mask = dataset.get_batch(indices)
+        per_index = [dataset[index] for index in indices]
+        assert (batch == np.stack([sample[0] for sample in per_index])).all()
+        assert (batch_mask == np.stack([sample[1] for sample in per_index])).all()
+
+        per_index_time = time_loader(_PerIndexDataset(dataset), batch_size, num_batches)
+        batched_time = time_loader(dataset, batch_size, num_batches)
+        num_samples = batch_size * num_batches
+        results[synth_lang_type] = (num_samples / per_index_time, num_samples / batched_time)
+    return results
+
+
+def print_results(results):
+    print(f"{'task':<20} {'per-index [samples/s]':>22} {'batched [samples/s]':>22} {'speedup':>8}")
+    for synth_lang_type, (per_index, batched) in results.items():
+        print(f"{synth_lang_type:<20} {per_index:>22.0f} {batched:>22.0f} {batched / per_index:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--batch_size", default=256, type=int)
+    parser.add_argument("--num_batches", default=20, type=int)
+    parser.add_argument("--context_length", default=256, type=int)
+    parser.add_argument("--min_sequence_length", default=3, type=int)
+    parser.add_argument("--max_sequence_length", default=40, type=int)
+    args = parser.parse_args()
+
+    print_results(
+        run_benchmarks(
+            args.batch_size, args.num_batches, args.context_length, args.min_sequence_length, args.max_sequence_length
+        )
+    )
@@ -0,0 +1,62 @@
+import itertools
+import time
+from argparse import ArgumentParser
+from types import SimpleNamespace
+
+import torch
+
+from simple_recurrent.layers.delta_rule import DeltaRule
+from simple_recurrent.layers.diagonal import Diagonal
+from simple_recurrent.layers.full_matrix import FullMatrix
+
+LAYERS = {
+    'full_matrix': lambda d: FullMatrix(SimpleNamespace(embedding_dim=d)),
+    'diagonal': lambda d: Diagonal(SimpleNamespace(embedding_dim=d, activation_func='tanh')),
+    'delta_rule': lambda d: DeltaRule(SimpleNamespace(embedding_dim=d, step_size=2.0)),
+}
+
+
+def time_forward_backward(forward, x, num_runs):
+    times = []
+    for _ in range(num_runs + 1):
+        start_time = time.perf_counter()
+        forward(x).sum().backward()
+        times.append(time.perf_counter() - start_time)
+    # the first run is a warmup
+    return min(times[1:])
+
+
+def run_benchmarks(layer_types, sequence_lengths, embedding_dims, batch_sizes, num_runs):
+    results = []
+    for layer_type, L, d, batch_size in itertools.product(layer_types, sequence_lengths, embedding_dims,
+                                                          batch_sizes):
+        torch.manual_seed(0)
+        model = LAYERS[layer_type](d)
+        x = torch.randn(batch_size, L, d, requires_grad=True)
+        loop_time = time_forward_backward(model.forward_loop, x, num_runs)
+        scan_time = time_forward_backward(model.forward_scan, x, num_runs)
+        results.append((layer_type, L, d, batch_size, loop_time, scan_time))
+    return results
+
+
+def print_results(results):
+    print(f"{'layer':<12} {'L':>6} {'d':>5} {'batch':>6} {'loop [ms]':>10} {'scan [ms]':>10} {'speedup':>8}")
+    for layer_type, L, d, batch_size, loop_time, scan_time in results:
+        print(f"{layer_type:<12} {L:>6} {d:>5} {batch_size:>6} {1e3 * loop_time:>10.1f} {1e3 * scan_time:>10.1f}"
+              f" {loop_time / scan_time:>7.1f}x")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--layer_types', nargs='+', default=list(LAYERS))
+    parser.add_argument('--sequence_lengths', nargs='+', type=int, default=[64, 256, 1024])
+    parser.add_argument('--embedding_dims', nargs='+', type=int, default=[16, 64])
+    parser.add_argument('--batch_sizes', nargs='+', type=int, default=[1, 32])
+    parser.add_argument('--num_runs', type=int, default=3)
+    parser.add_argument('--num_threads', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.num_threads is not None:
+        torch.set_num_threads(args.num_threads)
+    print_results(run_benchmarks(args.layer_types, args.sequence_lengths, args.embedding_dims, args.batch_sizes,
+                                 args.num_runs))
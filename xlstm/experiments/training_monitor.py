@@ -0,0 +1,126 @@
+# Copyright (c) NXAI GmbH and its affiliates 2024
+import time
+import warnings
+from typing import Iterable
+
+import torch
+
+HEALTH_CHECK_MODES = ("eager", "fused", "deferred")
+
+
+class HealthCheck:
+    """
+    Non-finite detection for the training loop without per-parameter synchronization. Every step, the loss and
+    one fused `torch._foreach_norm` reduction over all parameters are turned into non-finite flags on device.
+    In 'fused' mode these flags are read back every step (a single synchronization), in 'deferred' mode they are
+    accumulated and only read back every `check_every` steps, so non-finite steps are reported but not skipped.
+    The 'eager' mode is handled by the training loop itself (per-tensor checks, non-finite batches are skipped).
+    """
+
+    def __init__(self, parameters: Iterable[torch.nn.Parameter], mode: str = "deferred", check_every: int = 100):
+        if mode not in HEALTH_CHECK_MODES:
+            raise ValueError(f"Unknown health check mode {mode}, choose one of {HEALTH_CHECK_MODES}")
+        self.parameters = list(parameters)
+        self.mode = mode
+        self.check_every = 1 if mode == "fused" else check_every
+        self._flags = None
+        self._first_step = None
+
+    def update(self, loss: torch.Tensor, step: int):
+        if self.mode == "eager":
+            return
+        norms = torch.stack([norm.float() for norm in torch._foreach_norm([p.detach() for p in self.parameters])])
+        flags = torch.stack((~torch.isfinite(loss.detach()), ~torch.isfinite(norms).all())).to(torch.int32)
+        if self._flags is None:
+            self._flags = flags
+            self._first_step = step
+        else:
+            self._flags += flags
+
+    def check(self, step: int, force: bool = False) -> bool:
+        """Reads the accumulated flags back if a check is due, returns True if anything was non-finite."""
+        if self._flags is None or not (force or step % self.check_every == 0):
+            return False
+        nonfinite_losses, nonfinite_parameters = self._flags.tolist()
+        if nonfinite_losses:
+            print(f"Warning: NaN or Inf loss in {nonfinite_losses} step(s) between step {self._first_step} and {step}")
+        if nonfinite_parameters:
+            print(
+                f"Warning: NaN or Inf in model parameters after {nonfinite_parameters} update(s) between step"
+                f" {self._first_step} and {step}"
+            )
+        self._flags = None
+        return bool(nonfinite_losses or nonfinite_parameters)
+
+
+class SyncCounter:
+    """
+    Counts device-to-host synchronizations through the CUDA sync debug mode, which warns on every synchronizing
+    operation. Stays at zero for devices without this mode.
+    """
+
+    SYNC_WARNING = "called a synchronizing CUDA operation"
+
+    def __init__(self, device: str):
+        self.enabled = str(device).startswith("cuda") and torch.cuda.is_available()
+        self.count = 0
+        self._showwarning = None
+        self._previous_debug_mode = None
+        self._warnings_context = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        if self.enabled:
+            self._warnings_context = warnings.catch_warnings()
+            self._warnings_context.__enter__()
+            warnings.filterwarnings("always", message=f".*{self.SYNC_WARNING}.*")
+            self._showwarning = warnings.showwarning
+            warnings.showwarning = self._count_warning
+            self._previous_debug_mode = torch.cuda.get_sync_debug_mode()
+            torch.cuda.set_sync_debug_mode("warn")
+
+    def stop(self):
+        if self.enabled:
+            torch.cuda.set_sync_debug_mode(self._previous_debug_mode)
+            # also restores warnings.showwarning
+            self._warnings_context.__exit__(None, None, None)
+
+    def _count_warning(self, message, category, filename, lineno, file=None, line=None):
+        if self.SYNC_WARNING in str(message):
+            self.count += 1
+        else:
+            self._showwarning(message, category, filename, lineno, file, line)
+
+
+class Throughput:
+    """Steps and tokens per second and synchronizations per step between two calls of `compute`."""
+
+    def __init__(self, sync_counter: SyncCounter):
+        self.sync_counter = sync_counter
+        self.restart(0)
+
+    def restart(self, step: int):
+        self._last_time = time.perf_counter()
+        self._last_step = step
+        self._last_sync_count = self.sync_counter.count
+        self._num_tokens = 0
+
+    def update(self, num_tokens: int):
+        self._num_tokens += num_tokens
+
+    def compute(self, step: int) -> dict[str, float]:
+        num_steps = max(step - self._last_step, 1)
+        elapsed = time.perf_counter() - self._last_time
+        result = {
+            "steps_per_second": num_steps / elapsed,
+            "tokens_per_second": self._num_tokens / elapsed,
+            "syncs_per_step": (self.sync_counter.count - self._last_sync_count) / num_steps,
+        }
+        self.restart(step)
+        return result
@@ -0,0 +1,25 @@
+import unittest
+
+import torch
+
+from mamba.mamba import MambaConfig, MambaLM, selective_scan_chunked
+
+
+# The scan itself is tested in flash-linear-attention_mod/tests/models/test_mamba_py.py, this checks that the
+# blocks of this MambaLM pass their inputs to it in the layout it expects
+@unittest.skipIf(selective_scan_chunked is None, "requires the fla package of flash-linear-attention_mod")
+class TestChunkedScan(unittest.TestCase):
+    def test_chunked_scan_matches_pscan(self):
+        torch.manual_seed(42)
+        config = dict(d_model=32, n_layers=2, use_cuda=False)
+        model = MambaLM(MambaConfig(**config), vocab_size=50, embedding_dim=32, positive_and_negative=True)
+        chunked_model = MambaLM(MambaConfig(**config, chunked_scan=True, scan_chunk_size=8), vocab_size=50,
+                                embedding_dim=32, positive_and_negative=True)
+        chunked_model.load_state_dict(model.state_dict())
+
+        input_ids = torch.randint(0, 50, (2, 37))
+        self.assertTrue(torch.allclose(model(input_ids), chunked_model(input_ids), rtol=1e-4, atol=1e-5))
+
+
+if __name__ == '__main__':
+    unittest.main()
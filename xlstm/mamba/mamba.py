@@ -8,6 +8,11 @@ import torch.nn.functional as F
 from mambapy.mamba import Mamba, MambaBlock, RMSNorm, ResidualBlock
 from mambapy.pscan import pscan
 
+try:
+    from fla.models.mamba_py.chunked_scan import selective_scan_chunked
+except ImportError:
+    selective_scan_chunked = None
+
 
 @dataclass
 class MambaConfig:
@@ -36,10 +41,14 @@ class MambaConfig:
     mup_base_width: float = 128  # width=d_model
 
     pscan: bool = True  #  use parallel scan mode or sequential mode when training
+    chunked_scan: bool = False  #  scan chunk by chunk in parallel scan mode, without the (B, L, ED, N) tensors
+    scan_chunk_size: int = 64
     use_cuda: bool = True  # use official CUDA implementation when training (not compatible with (b)float16)
 
     def __post_init__(self):
         self.d_inner = self.expand_factor * self.d_model  # E*D = ED in comments
+        assert not self.chunked_scan or selective_scan_chunked is not None, \
+            "chunked_scan requires the fla package of flash-linear-attention_mod"
 
         if self.dt_rank == 'auto':
             self.dt_rank = math.ceil(self.d_model / 16)
@@ -105,6 +114,10 @@ class NonnegativeMambaBlock(MambaBlock):
 
         #  y : (B, L, ED)
 
+        if self.config.chunked_scan:
+            y = selective_scan_chunked(x, delta, A, B, C, self.positive_and_negative, self.config.scan_chunk_size)
+            return y + D * x
+
         deltaA = torch.exp(delta.unsqueeze(-1) * A)  #  (B, L, ED, N)
         if self.positive_and_negative:
             deltaA = deltaA * 2 - 1
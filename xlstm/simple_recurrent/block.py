@@ -60,7 +60,10 @@ class SimpleRecurrentBlock(nn.Module):
         return x
 
     def step(self, x: torch.Tensor, **kwargs) -> tuple[torch.Tensor, dict[str, tuple[torch.Tensor, ...]]]:
-        raise NotImplementedError('Step method is not implemented yet')
+        x = self.pre_norm(x)
+        x, state = self.recurrent_layer.step(x, **kwargs)
+        x = self.post_norm(x)
+        return x, state
 
     def reset_parameters(self) -> None:
         # check that recurrent layer has method rese_parameters
@@ -3,12 +3,107 @@ import numpy as np
 import torch
 
 
-def batched_cumulative_matrix_multiplication(U):
+def batched_cumulative_matrix_multiplication(U, renormalize=None, renormalize_every: int = 1):
     batch_size, num_matrices, rows, cols = U.shape
     result = torch.zeros((batch_size, num_matrices, rows, cols), device=U.device, dtype=U.dtype)
     result[:, 0] = U[:, 0]
     for i in range(1, num_matrices):
         result[:, i] = torch.bmm(U[:, i], result[:, i - 1])
+        if renormalize is not None and i % renormalize_every == 0:
+            result[:, i] = renormalize(result[:, i])
+    return result
+
+
+def orthogonalize(P):
+    """
+    Renormalization hook for products of orthogonal matrices: projects the accumulated product back onto the
+    orthogonal group (QR with a sign fix), which removes the drift of long float32 products.
+    """
+    Q, R = torch.linalg.qr(P)
+    return Q * torch.sign(torch.diagonal(R, dim1=-2, dim2=-1)).unsqueeze(-2)
+
+
+def cumulative_matrix_product(U, mode: str = 'blocked', block_size: int = 16, accumulate_dtype=None,
+                              renormalize=None, renormalize_every: int = 1):
+    """
+    Computes all prefix products P_i = U_i U_{i-1} ... U_0 of U with shape (batch_size, num_matrices, rows, cols).
+
+    mode:
+        'sequential': one bmm per matrix, O(L) sequential depth
+        'blocked': sequential within blocks of `block_size` (batched over all blocks), then a scan over the
+            block totals and one batched multiplication to apply the carries, O(block_size + log(L / block_size))
+        'hillis_steele': log-depth tree scan, O(L log L) work
+        'blelloch': work-efficient tree scan (up-sweep over pairs, down-sweep for the odd positions), O(L) work
+            and O(log L) depth
+    accumulate_dtype: e.g. torch.float64 to accumulate in higher precision, the result is cast back to U.dtype
+    renormalize: optional hook applied to accumulated products every `renormalize_every` multiplications
+        (every tree level in the tree modes), e.g. `orthogonalize` for products of orthogonal matrices
+    """
+    dtype = U.dtype
+    if accumulate_dtype is not None:
+        U = U.to(accumulate_dtype)
+    if mode == 'sequential':
+        result = batched_cumulative_matrix_multiplication(U, renormalize, renormalize_every)
+    elif mode == 'blocked':
+        result = _blocked_cumulative_matrix_multiplication(U, block_size, renormalize, renormalize_every)
+    elif mode == 'hillis_steele':
+        result = _hillis_steele_cumulative_matrix_multiplication(U, renormalize)
+    elif mode == 'blelloch':
+        result = _blelloch_cumulative_matrix_multiplication(U, renormalize)
+    else:
+        raise ValueError(f"Unknown cumulative matrix product mode: {mode}")
+    return result.to(dtype)
+
+
+def _blocked_cumulative_matrix_multiplication(U, block_size, renormalize=None, renormalize_every=1):
+    batch_size, num_matrices, rows, cols = U.shape
+    block_size = min(block_size, num_matrices)
+    num_blocks = -(-num_matrices // block_size)
+    pad = num_blocks * block_size - num_matrices
+    if pad:
+        # identity padding does not change any product
+        eye = torch.eye(rows, cols, device=U.device, dtype=U.dtype)
+        U = torch.cat((U, eye.expand(batch_size, pad, rows, cols)), dim=1)
+    # sequential within blocks, all blocks of all batch elements at once
+    blocks = U.reshape(batch_size * num_blocks, block_size, rows, cols)
+    local = batched_cumulative_matrix_multiplication(blocks, renormalize, renormalize_every)
+    local = local.reshape(batch_size, num_blocks, block_size, rows, cols)
+    if num_blocks > 1:
+        # scan over the block totals gives the carry into every following block
+        totals = _hillis_steele_cumulative_matrix_multiplication(local[:, :-1, -1], renormalize)
+        carried = torch.matmul(local[:, 1:], totals.unsqueeze(2))
+        local = torch.cat((local[:, :1], carried), dim=1)
+    return local.reshape(batch_size, num_blocks * block_size, rows, cols)[:, :num_matrices]
+
+
+def _hillis_steele_cumulative_matrix_multiplication(U, renormalize=None):
+    num_matrices = U.shape[1]
+    offset = 1
+    while offset < num_matrices:
+        # every entry is multiplied with the entry `offset` positions earlier
+        U = torch.cat((U[:, :offset], torch.matmul(U[:, offset:], U[:, :-offset])), dim=1)
+        if renormalize is not None:
+            U = renormalize(U)
+        offset *= 2
+    return U
+
+
+def _blelloch_cumulative_matrix_multiplication(U, renormalize=None):
+    num_matrices = U.shape[1]
+    if num_matrices == 1:
+        return U
+    # up-sweep: combine adjacent pairs (U_{2i+1} U_{2i}) and solve the half-length problem
+    num_pairs = num_matrices // 2
+    pairs = torch.matmul(U[:, 1:2 * num_pairs:2], U[:, 0:2 * num_pairs:2])
+    if renormalize is not None:
+        pairs = renormalize(pairs)
+    pair_prefix = _blelloch_cumulative_matrix_multiplication(pairs, renormalize)
+    # down-sweep: odd positions are the pair prefixes, even positions extend the previous pair prefix
+    even = torch.cat((U[:, :1], torch.matmul(U[:, 2:num_matrices:2], pair_prefix[:, :(num_matrices - 1) // 2])),
+                     dim=1)
+    result = torch.stack((even[:, :num_pairs], pair_prefix), dim=2).flatten(1, 2)
+    if num_matrices % 2:
+        result = torch.cat((result, even[:, -1:]), dim=1)
     return result
 
 
@@ -69,6 +164,26 @@ def test_batched_cumulative_matrix_multiplication():
     print("All tests passed successfully!")
 
 
+def test_cumulative_matrix_product_modes():
+    torch.manual_seed(42)
+    for batch_size, num_matrices, dim in [(2, 1, 3), (2, 7, 3), (3, 64, 4), (1, 101, 5)]:
+        U = torch.randn((batch_size, num_matrices, dim, dim)) / np.sqrt(dim)
+        naive_result = naive_cumulative_matrix_multiplication(U)
+        for mode in ['sequential', 'blocked', 'hillis_steele', 'blelloch']:
+            result = cumulative_matrix_product(U, mode=mode, block_size=8, accumulate_dtype=torch.float64)
+            assert result.dtype == U.dtype
+            assert torch.allclose(result, naive_result.to(torch.float32), atol=1e-5), \
+                f"Mode {mode} does not match for shape: {U.shape}"
+
+    # renormalization keeps long products of orthogonal matrices orthogonal
+    Q = orthogonalize(torch.randn((2, 1000, 4, 4)))
+    for mode in ['sequential', 'blocked', 'hillis_steele', 'blelloch']:
+        result = cumulative_matrix_product(Q, mode=mode, renormalize=orthogonalize, renormalize_every=10)
+        assert torch.allclose(result[:, -1] @ result[:, -1].transpose(-1, -2), torch.eye(4), atol=1e-5)
+    print("All mode tests passed successfully!")
+
+
 if __name__ == '__main__':
     # Run the test
+    test_cumulative_matrix_product_modes()
     test_batched_cumulative_matrix_multiplication()
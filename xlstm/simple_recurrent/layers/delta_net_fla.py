@@ -155,22 +155,37 @@ class DeltaNet(nn.Module):
             output_attentions: Optional[bool] = False,
             **kwargs
     ) -> Tuple[torch.Tensor, Optional[torch.Tensor], Optional[Cache]]:
+        last_state = past_key_values[self.layer_idx] if use_cache else None
+        o, state = self._forward(hidden_states, attention_mask, last_state, use_cache)
+        if past_key_values is not None:
+            past_key_values.update(state, self.layer_idx)
+        return o, None, past_key_values
+
+    def _forward(
+            self,
+            hidden_states: torch.Tensor,
+            attention_mask: Optional[torch.Tensor],
+            last_state: Optional[Tuple[torch.Tensor]],
+            use_cache: bool
+    ) -> Tuple[torch.Tensor, Tuple[torch.Tensor]]:
+        """
+        Runs the layer from `last_state` (as created by `init_state`, or None for a zero state), returns the output
+        and the new state. The convolution states in `last_state` are updated in place, the recurrent state is not.
+        """
         # change to inference mode.
         mode = 'fused_recurrent' if hidden_states.shape[1] < 64 else self.mode
 
         if self.norm_first:
             hidden_states = self.norm(hidden_states)
 
-        last_state = past_key_values[self.layer_idx] if use_cache else None
-
         if attention_mask is not None:
             if attention_mask.shape[-1] != hidden_states.shape[-2]:
                 attention_mask = attention_mask[:, -1:]
 
         if self.use_short_conv:
-            conv_state_q = last_state[0] if use_cache else None
-            conv_state_k = last_state[1] if use_cache else None
-            conv_state_v = last_state[2] if use_cache else None
+            conv_state_q = last_state[0] if last_state is not None else None
+            conv_state_k = last_state[1] if last_state is not None else None
+            conv_state_v = last_state[2] if last_state is not None else None
             k = self.k_proj(hidden_states)
             v = self.v_proj(hidden_states)
             q = self.q_proj(hidden_states)
@@ -211,7 +226,7 @@ class DeltaNet(nn.Module):
                                                   'b l h -> b h l').sigmoid() + self.sigmoid_shift
         else:
             beta = q.new_ones(q.shape[0], q.shape[1], q.shape[2])
-        state = past_key_values[self.layer_idx][-1] if use_cache else None
+        state = last_state[-1] if last_state is not None else None
         if mode == 'fused_recurrent':
             o, recurrent_state = fused_recurrent_delta_rule(q, k, v, beta, state, output_final_state=use_cache)
         elif mode == 'fused_chunk':
@@ -224,12 +239,10 @@ class DeltaNet(nn.Module):
         else:
             raise NotImplementedError(f"Not supported mode `{mode}`.")
 
-        if past_key_values is not None:
-            if self.use_short_conv:
-                state = (conv_state_q, conv_state_k, conv_state_v, recurrent_state)
-            else:
-                state = (recurrent_state,)
-            past_key_values.update(state, self.layer_idx)
+        if self.use_short_conv:
+            state = (conv_state_q, conv_state_k, conv_state_v, recurrent_state)
+        else:
+            state = (recurrent_state,)
 
         o = rearrange(o, 'b h l d -> b l h d')
         if self.use_gate:
@@ -240,7 +253,21 @@ class DeltaNet(nn.Module):
         o = rearrange(o, 'b l h d -> b l (h d)')
         o = self.o_proj(o)
 
-        return o, None, past_key_values
+        return o, state
+
+    def step(self, hidden_states: torch.Tensor, recurrent_state: Tuple[torch.Tensor] = None
+             ) -> Tuple[torch.Tensor, dict[str, Tuple[torch.Tensor]]]:
+        """
+        Continues from `recurrent_state` (as created by `init_state`, zero if None) for one token or a chunk of
+        tokens. Returns the output and the new state, the tensors of `recurrent_state` are left unchanged so that
+        they can be kept in the graph, e.g. for truncated backpropagation through time.
+        """
+        if recurrent_state is None:
+            recurrent_state = self.init_state(hidden_states.shape[0])
+        # the short convolutions update their states in place
+        last_state = tuple(s.clone() for s in recurrent_state[:-1]) + (recurrent_state[-1],)
+        o, state = self._forward(hidden_states, None, last_state, use_cache=True)
+        return o, {"recurrent_state": state}
 
     def init_state(self, batch_size: int) -> Tuple[torch.Tensor]:
         param = next(self.parameters())
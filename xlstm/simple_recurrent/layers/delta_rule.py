@@ -3,6 +3,7 @@ import torch
 from torch import nn
 
 from simple_recurrent.layers.full_matrix import FullMatrix
+from simple_recurrent.structured_operators import DiagonalOperator, HouseholderProductOperator
 
 
 class DeltaRule(FullMatrix):
@@ -16,29 +17,15 @@ class DeltaRule(FullMatrix):
         self.B.weight.data = self.B.weight.data / np.sqrt(self.config.embedding_dim)
         self.step_size = self.config.step_size
 
-    def forward_loop(self, x: torch.Tensor) -> torch.Tensor:
-        batch_size, sequence_length, emb_dim = x.shape
-
+    def transitions(self, x: torch.Tensor) -> tuple[HouseholderProductOperator, DiagonalOperator]:
         # Predict diagonal elements
         A_u = self.A(x)  # Shape: (batch_size, sequence_length, emb_dim)
         B_diag = self.B(x)  # Shape: (batch_size, sequence_length, emb_dim)
 
         A_u = A_u / A_u.norm(dim=(-1), keepdim=True)
 
-        # Reshape A_u for batch matrix multiplication
-        A_u_reshaped = A_u.unsqueeze(-1)  # Shape: (batch_size, sequence_length, emb_dim, 1)
-
-        # Compute u @ u.T using batch matrix multiplication
-        u_uT = torch.matmul(A_u_reshaped,
-                            A_u_reshaped.transpose(-1, -2))  # Shape: (batch_size, sequence_length, emb_dim, emb_dim)
-        # Compute A = I + u @ u.T
-        beta = torch.sigmoid(self.beta(x)).unsqueeze(-1)
-        A = torch.eye(emb_dim, device=x.device).unsqueeze(0).unsqueeze(0) - self.step_size * beta * u_uT  # Shape: (batch_size, sequence_length, emb_dim, emb_dim)
-
-        # Create diagonal matrices B
-        B = torch.diag_embed(B_diag)  # Shape: (batch_size, sequence_length, emb_dim, emb_dim)
-
-        # Compute h for all timesteps after the first one
-        h = self.forward_recurrence(A, B, x)
-        return h
+        # A = I - step_size * beta * u @ u.T, kept as a single generalized Householder reflection
+        beta = torch.sigmoid(self.beta(x))  # Shape: (batch_size, sequence_length, 1)
+        A = HouseholderProductOperator(A_u.unsqueeze(-2), self.step_size * beta)
 
+        return A, DiagonalOperator(B_diag)
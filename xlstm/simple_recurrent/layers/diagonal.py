@@ -3,6 +3,7 @@ import torch
 from torch import nn
 
 from simple_recurrent.layers.full_matrix import FullMatrix
+from simple_recurrent.structured_operators import DiagonalOperator
 
 
 class Diagonal(FullMatrix):
@@ -25,10 +26,8 @@ class Diagonal(FullMatrix):
         self.A.weight.data = self.A.weight.data / np.sqrt(self.config.embedding_dim)
         self.B.weight.data = self.B.weight.data / np.sqrt(self.config.embedding_dim)
 
-    def forward_loop(self, x: torch.Tensor) -> torch.Tensor:
-        batch_size, sequence_length, emb_dim = x.shape
-
-        # Predict diagonal elements
+    def transitions(self, x: torch.Tensor) -> tuple[DiagonalOperator, DiagonalOperator]:
+        # Predict diagonal elements, they are kept as vectors instead of diagonal matrices
         A_diag = self.A(x)
         B_diag = self.B(x)
 
@@ -36,10 +35,4 @@ class Diagonal(FullMatrix):
         if hasattr(self, 'activation_func'):
             A_diag = self.activation_func(10 * A_diag)
 
-        # Create diagonal matrices
-        A = torch.diag_embed(A_diag)
-        B = torch.diag_embed(B_diag)
-
-        # Compute h for all timesteps after the first one
-        h = self.forward_recurrence(A, B, x)
-        return h
+        return DiagonalOperator(A_diag), DiagonalOperator(B_diag)
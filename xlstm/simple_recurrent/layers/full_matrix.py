@@ -4,7 +4,8 @@ import numpy as np
 import torch
 import torch.nn as nn
 
-from simple_recurrent.cumulative_matrix_product import batched_cumulative_matrix_multiplication
+from simple_recurrent.parallel_scan import affine_scan
+from simple_recurrent.structured_operators import DenseOperator, LinearOperator
 from xlstm.utils import UpProjConfigMixin
 
 
@@ -20,6 +21,9 @@ class FullMatrix(nn.Module):
     def __init__(self, config: FullMatrixConfig):
         super().__init__()
         self.config = config
+        # 'loop': sequential recurrence, 'scan': parallel prefix scan with O(log L) sequential depth
+        self.recurrence_mode = getattr(config, 'recurrence_mode', 'loop')
+        self.scan_chunk_size = getattr(config, 'scan_chunk_size', 64)
         self.A = nn.Linear(in_features=self.config.embedding_dim,
                            out_features=self.config.embedding_dim * self.config.embedding_dim)
         self.B = nn.Linear(in_features=self.config.embedding_dim,
@@ -27,76 +31,50 @@ class FullMatrix(nn.Module):
         self.reset_parameters()
 
     def forward(self, x: torch.Tensor) -> torch.Tensor:
+        if self.recurrence_mode == 'scan':
+            return self.forward_scan(x)
         h_loop = self.forward_loop(x)
         return h_loop
 
     def forward_efficient(self, x: torch.Tensor) -> torch.Tensor:
-        raise NotImplementedError('Efficient method is not implemented yet')
-        '''
-        Iteration 1:
-        Ax: tensor([-1.8369,  1.6886])
-        Bx: tensor([-0.1101, -0.9264])
-
-        Iteration 2:
-        Ax: tensor([-1.0966, -0.0215])
-        Bx: tensor([-0.1136, -0.4069])
-
-        Iteration 3:
-        Ax: tensor([ 1.7371, -0.5649])
-        Bx: tensor([-0.1339, -0.8847])
-
-        Iteration 4:
-        Ax: tensor([ 0.8469, -0.5070])
-        Bx: tensor([-0.0807, -0.2044])
-
-        Iteration 5:
-        Ax: tensor([-0.7016,  0.0737])
-        Bx: tensor([-0.0042, -0.0515])
-        '''
-        batch_size, sequence_length, emb_dim = x.shape
-
-        A = self.A(x).view(batch_size, sequence_length, emb_dim, emb_dim) / torch.sqrt(emb_dim)
-        B = self.B(x).view(batch_size, sequence_length, emb_dim, emb_dim) / torch.sqrt(emb_dim)
-
-        # Compute B * x for all time steps
-        Bx = torch.matmul(B, x.unsqueeze(-1)).squeeze(-1)
+        return self.forward_scan(x)
 
-        # Initialize h with the correct initial state
-        h = torch.zeros_like(x)
-
-        # Compute cumulative products of A, starting from the second time step
-        A_cumprod = batched_cumulative_matrix_multiplication(A)
+    def transitions(self, x: torch.Tensor) -> tuple[LinearOperator, LinearOperator]:
+        """Returns the per-step operators A and B of the recurrence h_t = A_t h_{t-1} + B_t x_t."""
+        batch_size, sequence_length, emb_dim = x.shape
 
-        # Compute the terms of the sum, starting from the second time step
-        terms = torch.matmul(A_cumprod, Bx[:, :-1].unsqueeze(-1)).squeeze(-1)
+        A = self.A(x).view(batch_size, sequence_length, emb_dim, emb_dim) / np.sqrt(emb_dim)
+        B = self.B(x).view(batch_size, sequence_length, emb_dim, emb_dim) / np.sqrt(emb_dim)
+        return DenseOperator(A), DenseOperator(B)
 
-        # Compute the final sum and add it to Bx
-        Ah = torch.cumsum(terms, dim=1)
-        h[:, 1:] = Ah + Bx[:, 1:]
+    def forward_scan(self, x: torch.Tensor) -> torch.Tensor:
+        A, B = self.transitions(x)
 
+        # Compute B * x for all time steps, h is then a parallel prefix scan over the maps h -> A h + Bx
+        h = affine_scan(A, B.matvec(x), chunk_size=self.scan_chunk_size)
         return h
 
     def forward_loop(self, x: torch.Tensor) -> torch.Tensor:
-        batch_size, sequence_length, emb_dim = x.shape
-
-        A = self.A(x).view(batch_size, sequence_length, emb_dim, emb_dim) / np.sqrt(emb_dim)
-        B = self.B(x).view(batch_size, sequence_length, emb_dim, emb_dim) / np.sqrt(emb_dim)
+        A, B = self.transitions(x)
 
         # Compute h for all timesteps after the first one
         h = self.forward_recurrence(A, B, x)
         return h
 
-    def forward_recurrence(self, A, B, x):
+    def forward_recurrence(self, A: LinearOperator, B: LinearOperator, x: torch.Tensor,
+                           h_init: torch.Tensor = None) -> torch.Tensor:
         batch_size, sequence_length, emb_dim = x.shape
 
+        # B x does not depend on the state and is computed for all timesteps at once
+        Bx = B.matvec(x)
+
         # Initialize h_list with the initial state
-        h_list = [torch.bmm(B[:, 0], x[:, 0].unsqueeze(-1)).squeeze(-1)]
+        h_list = [Bx[:, 0] if h_init is None else A[:, 0].matvec(h_init) + Bx[:, 0]]
 
         # Compute h for all timesteps after the first one
         for t in range(1, sequence_length):
             h_prev = h_list[-1]
-            h_curr = (torch.bmm(A[:, t], h_prev.unsqueeze(-1)).squeeze(-1) +
-                      torch.bmm(B[:, t], x[:, t].unsqueeze(-1)).squeeze(-1))
+            h_curr = A[:, t].matvec(h_prev) + Bx[:, t]
             h_list.append(h_curr)
 
         # Stack the list of h tensors to create the final output
@@ -130,9 +108,21 @@ class FullMatrix(nn.Module):
 
         return h
 
-    def step(self, x: torch.Tensor, mlstm_state: tuple[torch.Tensor, torch.Tensor, torch.Tensor] = None,
-             conv_state: tuple[torch.Tensor] = None) -> tuple[torch.Tensor, dict[str, tuple[torch.Tensor, ...]]]:
-        raise NotImplementedError('FullMatrix does not support step function')
+    def step(self, x: torch.Tensor, recurrent_state: torch.Tensor = None) -> tuple[torch.Tensor, dict[str, torch.Tensor]]:
+        """
+        Continues the recurrence from `recurrent_state` (the hidden state after the last processed token, zero
+        if None) for one token or a chunk of tokens x: (batch_size, num_tokens, emb_dim).
+        """
+        A, B = self.transitions(x)
+        if self.recurrence_mode == 'scan' and x.shape[1] > 1:
+            Bx = B.matvec(x)
+            if recurrent_state is not None:
+                # the carried state enters the scan as part of the first input: A_0 h_init + B_0 x_0
+                Bx = torch.cat((Bx[:, :1] + A[:, 0].matvec(recurrent_state).unsqueeze(1), Bx[:, 1:]), dim=1)
+            h = affine_scan(A, Bx, chunk_size=self.scan_chunk_size)
+        else:
+            h = self.forward_recurrence(A, B, x, h_init=recurrent_state)
+        return h, {"recurrent_state": h[:, -1]}
 
     def reset_parameters(self):
         pass
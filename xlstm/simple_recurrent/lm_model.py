@@ -7,7 +7,7 @@ import torch
 from torch import nn
 
 from xlstm.components.init import small_init_init_
-from xlstm.utils import WeightDecayOptimGroupMixin
+from xlstm.utils import WeightDecayOptimGroupMixin, map_state
 from xlstm.xlstm_block_stack import xLSTMBlockStackConfig
 from .block import SimpleRecurrentBlock
 
@@ -48,7 +48,14 @@ class SimpleRecurrentNet(WeightDecayOptimGroupMixin, nn.Module):
         if not self.config.tie_weights:
             small_init_init_(self.lm_head.weight, dim=self.config.embedding_dim)
 
-    def forward(self, idx: torch.Tensor) -> torch.Tensor:
+    def forward(
+            self, idx: torch.Tensor, state: dict[str, dict[str, tuple[torch.Tensor, ...]]] = None,
+            return_last_state: bool = False
+    ) -> torch.Tensor:
+        if state is not None or return_last_state:
+            # same interface as xLSTMLMModel.forward, chunks with a carried state go through step
+            logits, state = self.step(idx, state)
+            return (logits, state) if return_last_state else logits
         x = self.token_embedding(idx)
         x = self.emb_dropout(x)
         for block in self.block_stack:
@@ -59,10 +66,37 @@ class SimpleRecurrentNet(WeightDecayOptimGroupMixin, nn.Module):
     def step(
             self, idx: torch.Tensor, state: dict[str, dict[str, tuple[torch.Tensor, ...]]] = None, **kwargs
     ) -> tuple[torch.Tensor, dict[str, dict[str, tuple[torch.Tensor, ...]]]]:
+        """
+        Processes one token or a chunk of tokens idx: (batch_size, num_tokens) starting from `state` (a fresh
+        sequence if None) and returns the logits together with the state after the last token. Feeding a
+        sequence in chunks gives the same logits as `forward` on the whole sequence.
+        """
+        if state is None:
+            state = {}
         x = self.token_embedding(idx)
-        x, state = self.block_stack.step(x, state=state, **kwargs)
+        x = self.emb_dropout(x)
+        new_state = {}
+        for block_idx, block in enumerate(self.block_stack):
+            x, new_state[f"block_{block_idx}"] = block.step(x, **state.get(f"block_{block_idx}", {}), **kwargs)
         logits = self.lm_head(x)
-        return logits, state
+        return logits, new_state
+
+    @staticmethod
+    def detach_state(state: dict[str, dict[str, tuple[torch.Tensor, ...]]]) -> dict:
+        """Cuts the autograd graph at the state, e.g. between chunks of truncated backpropagation through time."""
+        return map_state(state, torch.Tensor.detach)
+
+    @staticmethod
+    def reorder_state(state: dict[str, dict[str, tuple[torch.Tensor, ...]]], batch_idx: torch.Tensor) -> dict:
+        """Selects / reorders the batch entries of the state, e.g. for beam search or finished sequences."""
+        return map_state(state, lambda tensor: tensor.index_select(0, batch_idx.to(tensor.device)))
+
+    @staticmethod
+    def reset_state(state: dict[str, dict[str, tuple[torch.Tensor, ...]]], batch_idx: torch.Tensor = None) -> dict:
+        """Resets the state of the batch entries `batch_idx` (all if None) to the start of a new sequence."""
+        if batch_idx is None:
+            return None
+        return map_state(state, lambda tensor: tensor.index_fill(0, batch_idx.to(tensor.device), 0))
 
     def _create_weight_decay_optim_groups(self, **kwargs) -> tuple[Sequence[nn.Parameter], Sequence[nn.Parameter]]:
         weight_decay, no_weight_decay = super()._create_weight_decay_optim_groups(**kwargs)
@@ -0,0 +1,95 @@
+import unittest
+
+import torch
+from omegaconf import OmegaConf
+
+from simple_recurrent.lm_model import SimpleRecurrentNet
+
+try:
+    from simple_recurrent.layers.delta_net_fla import DeltaNet
+except ImportError:
+    DeltaNet = None
+
+
+class TestSimpleRecurrentNetStep(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+        self.idx = torch.randint(0, 7, (3, 21))
+
+    def create_model(self, layer_type, **layer_kwargs):
+        config = OmegaConf.create(dict(layer_type=layer_type, num_blocks=2, vocab_size=7, embedding_dim=6,
+                                       dropout=0.0, add_embedding_dropout=False, tie_weights=False,
+                                       **layer_kwargs))
+        return SimpleRecurrentNet(config).to(torch.float64).eval()
+
+    def assert_step_matches_forward(self, model):
+        with torch.no_grad():
+            logits = model(self.idx)
+
+            # token by token
+            state = None
+            step_logits = []
+            for t in range(self.idx.shape[1]):
+                logits_t, state = model.step(self.idx[:, t:t + 1], state)
+                step_logits.append(logits_t)
+            self.assertTrue(torch.allclose(logits, torch.cat(step_logits, dim=1), atol=1e-10))
+
+            # uneven chunks
+            state = None
+            chunk_logits = []
+            for start, end in [(0, 5), (5, 6), (6, 21)]:
+                logits_chunk, state = model.step(self.idx[:, start:end], state)
+                chunk_logits.append(logits_chunk)
+            self.assertTrue(torch.allclose(logits, torch.cat(chunk_logits, dim=1), atol=1e-10))
+
+            # reordering the state is the same as reordering the batch
+            batch_idx = torch.tensor([2, 0])
+            _, state = model.step(self.idx[:, :10])
+            logits_reordered, _ = model.step(self.idx[batch_idx, 10:], model.reorder_state(state, batch_idx))
+            self.assertTrue(torch.allclose(logits[batch_idx, 10:], logits_reordered, atol=1e-10))
+
+            # a reset batch entry starts a new sequence
+            state = model.reset_state(state, torch.tensor([1]))
+            logits_reset, _ = model.step(self.idx[:, 10:], state)
+            self.assertTrue(torch.allclose(logits_reset[[0, 2]], logits[[0, 2], 10:], atol=1e-10))
+            self.assertTrue(torch.allclose(logits_reset[1], model(self.idx[1:2, 10:])[0], atol=1e-10))
+
+    def test_full_matrix(self):
+        for recurrence_mode in ['loop', 'scan']:
+            self.assert_step_matches_forward(self.create_model('full_matrix', recurrence_mode=recurrence_mode))
+
+    def test_diagonal(self):
+        for recurrence_mode in ['loop', 'scan']:
+            self.assert_step_matches_forward(
+                self.create_model('diagonal', activation_func='tanh', recurrence_mode=recurrence_mode))
+
+    def test_delta_rule(self):
+        for recurrence_mode in ['loop', 'scan']:
+            self.assert_step_matches_forward(
+                self.create_model('delta_rule', step_size=2.0, recurrence_mode=recurrence_mode, scan_chunk_size=4))
+
+    def test_detach_state(self):
+        model = self.create_model('delta_rule', step_size=2.0)
+        _, state = model.step(self.idx[:, :5])
+        self.assertTrue(state["block_0"]["recurrent_state"].requires_grad)
+        state = model.detach_state(state)
+        self.assertFalse(state["block_0"]["recurrent_state"].requires_grad)
+        self.assertIsNone(model.reset_state(state))
+
+    @unittest.skipUnless(DeltaNet is not None and torch.cuda.is_available(), "requires fla and CUDA")
+    def test_delta_rule_fla_step_keeps_state(self):
+        layer = DeltaNet(d_model=16, num_heads=2).cuda()
+        x = torch.randn(3, 10, 16, device="cuda", requires_grad=True)
+        _, state = layer.step(x[:, :5])
+        state_before = [t.detach().clone() for t in state["recurrent_state"]]
+        o, _ = layer.step(x[:, 5:], **state)
+        for t, t_before in zip(state["recurrent_state"], state_before):
+            self.assertTrue(torch.equal(t, t_before))
+        # the first state stays in the graph, the gradient flows back through both steps
+        o.sum().backward()
+        self.assertIsNotNone(x.grad)
+        self.assertTrue(x.grad[:, :5].abs().sum() > 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
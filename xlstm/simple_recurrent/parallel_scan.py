@@ -0,0 +1,122 @@
+import torch
+import torch.nn.functional as F
+
+from simple_recurrent.structured_operators import (DiagonalOperator, HouseholderProductOperator,
+                                                   IdentityPlusLowRankOperator, LinearOperator)
+
+
+def dense_affine_scan(A, b, offset: int = 1):
+    """
+    Computes h_t = A_t h_{t-1} + b_t (with h_{-1} = 0) for all t by a Hillis-Steele scan over the affine maps,
+    i.e. in O(log L) sequential steps. `offset` allows to continue a scan that was started in another
+    representation, every map then already covers the `offset` previous steps.
+    A: (batch_size, sequence_length, emb_dim, emb_dim), b: (batch_size, sequence_length, emb_dim)
+    """
+    sequence_length = b.shape[1]
+    while offset < sequence_length:
+        # compose every map with the one `offset` steps earlier: A_t (A_s h + b_s) + b_t
+        b = torch.cat((b[:, :offset], torch.matmul(A[:, offset:], b[:, :-offset].unsqueeze(-1)).squeeze(-1)
+                       + b[:, offset:]), dim=1)
+        if 2 * offset < sequence_length:
+            A = torch.cat((A[:, :offset], torch.matmul(A[:, offset:], A[:, :-offset])), dim=1)
+        offset *= 2
+    return b
+
+
+def diagonal_affine_scan(a, b):
+    """
+    Same as `dense_affine_scan` for diagonal transitions A_t = diag(a_t), which are kept as vectors.
+    a: (batch_size, sequence_length, emb_dim), b: (batch_size, sequence_length, emb_dim)
+    """
+    sequence_length = b.shape[1]
+    offset = 1
+    while offset < sequence_length:
+        b = torch.cat((b[:, :offset], a[:, offset:] * b[:, :-offset] + b[:, offset:]), dim=1)
+        if 2 * offset < sequence_length:
+            a = torch.cat((a[:, :offset], a[:, offset:] * a[:, :-offset]), dim=1)
+        offset *= 2
+    return b
+
+
+def wy_affine_scan(W, Y, b):
+    """
+    Same as `dense_affine_scan` for transitions in compact WY form A_t = I - W_t Y_t^T.
+    Composing two maps concatenates their factors, so the rank doubles in every scan step. Once the rank
+    reaches emb_dim the remaining steps continue on dense matrices.
+    W, Y: (batch_size, sequence_length, emb_dim, rank), b: (batch_size, sequence_length, emb_dim)
+    """
+    sequence_length, emb_dim = b.shape[1], b.shape[2]
+    offset = 1
+    while offset < sequence_length:
+        if W.shape[-1] >= emb_dim:
+            A = torch.eye(emb_dim, device=b.device, dtype=b.dtype) - torch.matmul(W, Y.transpose(-1, -2))
+            return dense_affine_scan(A, b, offset=offset)
+        # (I - W_t Y_t^T) b_s + b_t
+        b_prev = b[:, :-offset]
+        Yb = torch.matmul(Y[:, offset:].transpose(-1, -2), b_prev.unsqueeze(-1))
+        b = torch.cat((b[:, :offset], b_prev - torch.matmul(W[:, offset:], Yb).squeeze(-1) + b[:, offset:]), dim=1)
+        if 2 * offset < sequence_length:
+            # (I - W_t Y_t^T)(I - W_s Y_s^T) = I - [W_t, W_s - W_t (Y_t^T W_s)] [Y_t, Y_s]^T
+            W_t, Y_t, W_s, Y_s = W[:, offset:], Y[:, offset:], W[:, :-offset], Y[:, :-offset]
+            W_new = torch.cat((W_t, W_s - torch.matmul(W_t, torch.matmul(Y_t.transpose(-1, -2), W_s))), dim=-1)
+            Y_new = torch.cat((Y_t, Y_s), dim=-1)
+            # the first `offset` maps are not needed anymore, zero factors keep the shapes aligned
+            W = torch.cat((F.pad(W[:, :offset], (0, W.shape[-1])), W_new), dim=1)
+            Y = torch.cat((F.pad(Y[:, :offset], (0, Y.shape[-1])), Y_new), dim=1)
+        offset *= 2
+    return b
+
+
+def rank_one_affine_scan(u, c, b, chunk_size: int = 64):
+    """
+    Computes h_t = (I - c_t u_t u_t^T) h_{t-1} + b_t (with h_{-1} = 0) without materializing any per-step
+    matrix. Within chunks, the recurrence is solved in parallel through the UT transform
+        z = (I + diag(c) tril(U U^T, -1))^{-1} diag(c) (U h_0 + ...),
+    which also gives the chunk transition in WY form I - U^T T U. The chunk transitions are combined by
+    `wy_affine_scan`, so the sequential depth is O(log(L / chunk_size)).
+    u: (batch_size, sequence_length, emb_dim), c: (batch_size, sequence_length), b: like u
+    """
+    batch_size, sequence_length, emb_dim = b.shape
+    chunk_size = min(chunk_size, sequence_length)
+    pad = -sequence_length % chunk_size
+    if pad:
+        # zero padding corresponds to identity maps without input
+        u, b, c = F.pad(u, (0, 0, 0, pad)), F.pad(b, (0, 0, 0, pad)), F.pad(c, (0, pad))
+    num_chunks = u.shape[1] // chunk_size
+    U = u.reshape(batch_size, num_chunks, chunk_size, emb_dim)
+    Bx = b.reshape(batch_size, num_chunks, chunk_size, emb_dim)
+    c = c.reshape(batch_size, num_chunks, chunk_size)
+
+    eye = torch.eye(chunk_size, device=b.device, dtype=b.dtype)
+    M = eye + c.unsqueeze(-1) * torch.tril(torch.matmul(U, U.transpose(-1, -2)), diagonal=-1)
+    T = torch.linalg.solve_triangular(M, eye.expand_as(M), upper=False, unitriangular=True) * c.unsqueeze(-2)
+
+    # chunk-local solution (zero initial state): z_t = c_t u_t^T h_{t-1}, h_t = sum_{s<=t} b_s - u_s z_s
+    r = torch.sum(U * (torch.cumsum(Bx, dim=2) - Bx), dim=-1, keepdim=True)
+    z = torch.matmul(T, r)
+    h_local = torch.cumsum(Bx - U * z, dim=2)
+
+    # chunk transitions I - U^T T U and the states at the chunk borders
+    W = U.transpose(-1, -2)
+    Y = torch.matmul(T, U).transpose(-1, -2)
+    h_end = wy_affine_scan(W, Y, h_local[:, :, -1])
+    h_start = torch.cat((torch.zeros_like(h_end[:, :1]), h_end[:, :-1]), dim=1)
+
+    # propagate the chunk start states through the chunks: (I - U_{<=t}^T T_{<=t} U) h_0
+    y = torch.matmul(T, torch.matmul(U, h_start.unsqueeze(-1)))
+    h = h_local + h_start.unsqueeze(2) - torch.cumsum(U * y, dim=2)
+    return h.reshape(batch_size, num_chunks * chunk_size, emb_dim)[:, :sequence_length]
+
+
+def affine_scan(A: LinearOperator, b, chunk_size: int = 64):
+    """
+    Dispatches to the scan that keeps the transitions A in their structured form.
+    A: operator with batch dimensions (batch_size, sequence_length), b: (batch_size, sequence_length, emb_dim)
+    """
+    if isinstance(A, DiagonalOperator):
+        return diagonal_affine_scan(A.diag, b)
+    if isinstance(A, HouseholderProductOperator) and A.num_reflections == 1:
+        return rank_one_affine_scan(A.vectors[..., 0, :], A.coeffs[..., 0], b, chunk_size=chunk_size)
+    if isinstance(A, IdentityPlusLowRankOperator):
+        return wy_affine_scan(-A.U, A.V, b)
+    return dense_affine_scan(A.to_dense(), b)
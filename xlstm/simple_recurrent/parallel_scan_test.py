@@ -0,0 +1,54 @@
+import unittest
+from types import SimpleNamespace
+
+import torch
+
+from simple_recurrent.layers.delta_rule import DeltaRule
+from simple_recurrent.layers.diagonal import Diagonal
+from simple_recurrent.layers.full_matrix import FullMatrix
+from simple_recurrent.structured_operators import DenseOperator
+
+
+class TestParallelScan(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+        self.embedding_dim = 8
+        self.x = torch.randn((3, 45, self.embedding_dim), dtype=torch.float64)
+
+    def assert_scan_matches_loop(self, model):
+        model = model.to(torch.float64)
+        x_loop = self.x.clone().requires_grad_(True)
+        x_scan = self.x.clone().requires_grad_(True)
+
+        h_loop = model.forward_loop(x_loop)
+        h_scan = model.forward_scan(x_scan)
+        self.assertTrue(torch.allclose(h_loop, h_scan, atol=1e-10))
+        with torch.no_grad():
+            A, B = model.transitions(self.x)
+            h_dense = model.forward_recurrence(DenseOperator(A.to_dense()), DenseOperator(B.to_dense()), self.x)
+        self.assertTrue(torch.allclose(h_loop, h_dense, atol=1e-10))
+
+        grad_out = torch.randn_like(h_loop)
+        loop_grads = torch.autograd.grad(h_loop, [x_loop, *model.parameters()], grad_out)
+        scan_grads = torch.autograd.grad(h_scan, [x_scan, *model.parameters()], grad_out)
+        for loop_grad, scan_grad in zip(loop_grads, scan_grads):
+            self.assertTrue(torch.allclose(loop_grad, scan_grad, atol=1e-10))
+
+    def test_full_matrix(self):
+        self.assert_scan_matches_loop(FullMatrix(SimpleNamespace(embedding_dim=self.embedding_dim)))
+
+    def test_diagonal(self):
+        for activation_func in ['none', 'tanh']:
+            config = SimpleNamespace(embedding_dim=self.embedding_dim, activation_func=activation_func)
+            self.assert_scan_matches_loop(Diagonal(config))
+
+    def test_delta_rule(self):
+        # step_size 2 allows for negative eigenvalues
+        for step_size, scan_chunk_size in [(1.0, 64), (2.0, 4), (2.0, 1)]:
+            config = SimpleNamespace(embedding_dim=self.embedding_dim, step_size=step_size,
+                                     scan_chunk_size=scan_chunk_size)
+            self.assert_scan_matches_loop(DeltaRule(config))
+
+
+if __name__ == '__main__':
+    unittest.main()
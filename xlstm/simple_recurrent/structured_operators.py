@@ -0,0 +1,130 @@
+import torch
+
+
+class LinearOperator:
+    """
+    Batched d x d linear operator that is only accessed through matrix-vector products and composition.
+    All leading dimensions are batch dimensions, e.g. (batch_size, sequence_length) for per-step transitions.
+    """
+
+    def matvec(self, x: torch.Tensor) -> torch.Tensor:
+        raise NotImplementedError
+
+    def compose(self, other: 'LinearOperator') -> 'LinearOperator':
+        """Returns the operator self @ other, i.e. `other` is applied first."""
+        return DenseOperator(torch.matmul(self.to_dense(), other.to_dense()))
+
+    def to_dense(self) -> torch.Tensor:
+        raise NotImplementedError
+
+    def __getitem__(self, idx) -> 'LinearOperator':
+        """Indexes the batch dimensions."""
+        raise NotImplementedError
+
+
+class DenseOperator(LinearOperator):
+    def __init__(self, matrix: torch.Tensor):
+        self.matrix = matrix  # (..., d, d)
+
+    def matvec(self, x):
+        return torch.matmul(self.matrix, x.unsqueeze(-1)).squeeze(-1)
+
+    def to_dense(self):
+        return self.matrix
+
+    def __getitem__(self, idx):
+        return DenseOperator(self.matrix[idx])
+
+
+class DiagonalOperator(LinearOperator):
+    def __init__(self, diag: torch.Tensor):
+        self.diag = diag  # (..., d)
+
+    def matvec(self, x):
+        return self.diag * x
+
+    def compose(self, other):
+        if isinstance(other, DiagonalOperator):
+            return DiagonalOperator(self.diag * other.diag)
+        return DenseOperator(self.diag.unsqueeze(-1) * other.to_dense())
+
+    def to_dense(self):
+        return torch.diag_embed(self.diag)
+
+    def __getitem__(self, idx):
+        return DiagonalOperator(self.diag[idx])
+
+
+class IdentityPlusLowRankOperator(LinearOperator):
+    """I + U V^T with U, V of shape (..., d, rank), O(d * rank) per matrix-vector product."""
+
+    def __init__(self, U: torch.Tensor, V: torch.Tensor):
+        self.U = U
+        self.V = V
+
+    @property
+    def rank(self) -> int:
+        return self.U.shape[-1]
+
+    def matvec(self, x):
+        return x + torch.matmul(self.U, torch.matmul(self.V.transpose(-1, -2), x.unsqueeze(-1))).squeeze(-1)
+
+    def compose(self, other):
+        if isinstance(other, HouseholderProductOperator):
+            other = other.to_low_rank()
+        if isinstance(other, IdentityPlusLowRankOperator):
+            # (I + U_1 V_1^T)(I + U_2 V_2^T) = I + [U_1, U_2 + U_1 (V_1^T U_2)] [V_1, V_2]^T
+            U = torch.cat((self.U, other.U + torch.matmul(self.U, torch.matmul(self.V.transpose(-1, -2), other.U))),
+                          dim=-1)
+            return IdentityPlusLowRankOperator(U, torch.cat((self.V, other.V), dim=-1))
+        return super().compose(other)
+
+    def to_dense(self):
+        eye = torch.eye(self.U.shape[-2], device=self.U.device, dtype=self.U.dtype)
+        return eye + torch.matmul(self.U, self.V.transpose(-1, -2))
+
+    def __getitem__(self, idx):
+        return IdentityPlusLowRankOperator(self.U[idx], self.V[idx])
+
+
+class HouseholderProductOperator(LinearOperator):
+    """
+    Product of generalized Householder reflections (I - c_1 v_1 v_1^T) ... (I - c_k v_k v_k^T) with unit vectors
+    v_i. A coefficient c_i = 2 gives a reflection, c_i in (0, 2) gives eigenvalues in (-1, 1).
+    vectors: (..., k, d), coeffs: (..., k)
+    """
+
+    def __init__(self, vectors: torch.Tensor, coeffs: torch.Tensor):
+        self.vectors = vectors
+        self.coeffs = coeffs
+
+    @property
+    def num_reflections(self) -> int:
+        return self.vectors.shape[-2]
+
+    def matvec(self, x):
+        # the rightmost reflection is applied first
+        for i in reversed(range(self.num_reflections)):
+            v = self.vectors[..., i, :]
+            x = x - (self.coeffs[..., i] * torch.sum(v * x, dim=-1)).unsqueeze(-1) * v
+        return x
+
+    def compose(self, other):
+        if isinstance(other, HouseholderProductOperator):
+            return HouseholderProductOperator(torch.cat((self.vectors, other.vectors), dim=-2),
+                                              torch.cat((self.coeffs, other.coeffs), dim=-1))
+        return self.to_low_rank().compose(other)
+
+    def to_low_rank(self) -> IdentityPlusLowRankOperator:
+        op = IdentityPlusLowRankOperator(-self.coeffs[..., :1, None] * self.vectors[..., :1, :].transpose(-1, -2),
+                                         self.vectors[..., :1, :].transpose(-1, -2))
+        for i in range(1, self.num_reflections):
+            v = self.vectors[..., i:i + 1, :].transpose(-1, -2)
+            op = op.compose(IdentityPlusLowRankOperator(-self.coeffs[..., i:i + 1, None] * v, v))
+        return op
+
+    def to_dense(self):
+        return self.to_low_rank().to_dense()
+
+    def __getitem__(self, idx):
+        return HouseholderProductOperator(self.vectors[idx], self.coeffs[idx])
@@ -0,0 +1,48 @@
+import unittest
+
+import torch
+
+from simple_recurrent.structured_operators import (DenseOperator, DiagonalOperator, HouseholderProductOperator,
+                                                   IdentityPlusLowRankOperator)
+
+
+class TestStructuredOperators(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+        self.batch_shape, self.d = (2, 3), 6
+        self.x = torch.randn(*self.batch_shape, self.d, dtype=torch.float64)
+
+    def random_operators(self):
+        vectors = torch.nn.functional.normalize(torch.randn(*self.batch_shape, 2, self.d, dtype=torch.float64), dim=-1)
+        return [
+            DenseOperator(torch.randn(*self.batch_shape, self.d, self.d, dtype=torch.float64)),
+            DiagonalOperator(torch.randn(*self.batch_shape, self.d, dtype=torch.float64)),
+            IdentityPlusLowRankOperator(torch.randn(*self.batch_shape, self.d, 2, dtype=torch.float64),
+                                        torch.randn(*self.batch_shape, self.d, 2, dtype=torch.float64)),
+            HouseholderProductOperator(vectors, 2 * torch.rand(*self.batch_shape, 2, dtype=torch.float64)),
+        ]
+
+    def test_matvec(self):
+        for op in self.random_operators():
+            dense = torch.matmul(op.to_dense(), self.x.unsqueeze(-1)).squeeze(-1)
+            self.assertTrue(torch.allclose(op.matvec(self.x), dense, atol=1e-12), type(op).__name__)
+            self.assertTrue(torch.allclose(op[:, 1].matvec(self.x[:, 1]), dense[:, 1], atol=1e-12))
+
+    def test_compose(self):
+        for first in self.random_operators():
+            for second in self.random_operators():
+                composed = first.compose(second)
+                dense = torch.matmul(first.to_dense(), second.to_dense())
+                self.assertTrue(torch.allclose(composed.to_dense(), dense, atol=1e-12),
+                                f"{type(first).__name__} @ {type(second).__name__}")
+
+    def test_structure_is_kept(self):
+        diagonal, low_rank, householder = self.random_operators()[1:]
+        self.assertIsInstance(diagonal.compose(diagonal), DiagonalOperator)
+        self.assertIsInstance(low_rank.compose(householder), IdentityPlusLowRankOperator)
+        self.assertEqual(householder.compose(householder).num_reflections, 4)
+        self.assertEqual(householder.to_low_rank().rank, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
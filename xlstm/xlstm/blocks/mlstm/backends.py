@@ -143,3 +143,118 @@ def recurrent_step_stabilized_simple(
     h = h_num / h_denom  # (B, NH, 1, DH) / (B, NH, 1, 1) = (B, NH, 1, DH)
 
     return h, (c_state_new, n_state_new, m_state_new)
+
+
+def chunkwise_stabilized_simple(
+    queries: torch.Tensor,
+    keys: torch.Tensor,
+    values: torch.Tensor,
+    igate_preact: torch.Tensor,
+    fgate_preact: torch.Tensor,
+    chunk_size: int = 64,
+    initial_state: tuple[torch.Tensor, torch.Tensor, torch.Tensor] = None,
+    return_last_state: bool = False,
+    eps: float = 1e-6,
+    **kwargs,
+) -> torch.Tensor:
+    """This is the mLSTM cell in chunkwise form.
+    Within chunks of `chunk_size` timesteps the parallel (quadratic) form is used, between chunks the
+    recurrent state (c, n, m) is carried. The result is the same as `parallel_stabilized_simple` with rowwise
+    stabilization (m is the exact running maximum of the log gate decays), but memory is O(S * chunk_size)
+    instead of O(S^2).
+
+    Args:
+        queries (torch.Tensor): (B, NH, S, DH)
+        keys (torch.Tensor): (B, NH, S, DH)
+        values (torch.Tensor): (B, NH, S, DH)
+        igate_preact (torch.Tensor): (B, NH, S, 1)
+        fgate_preact (torch.Tensor): (B, NH, S, 1)
+        chunk_size (int, optional): Number of timesteps per chunk. Defaults to 64.
+        initial_state (tuple[torch.Tensor, torch.Tensor, torch.Tensor], optional): (c_state, n_state, m_state)
+            as in `recurrent_step_stabilized_simple`. Defaults to None (empty state).
+        return_last_state (bool, optional): Wether to also return the state after the last timestep.
+
+    Returns:
+        torch.Tensor: (B, NH, S, DH), h_tilde_state
+            and if return_last_state: (c_state [B, NH, DH, DH], n_state [B, NH, DH, 1], m_state [B, NH, 1, 1])
+    """
+    B, NH, S, DH = queries.shape
+    _dtype, _device = queries.dtype, queries.device
+    L = min(chunk_size, S)
+    NC = math.ceil(S / L)
+    pad = NC * L - S
+
+    log_fgates = torch.nn.functional.logsigmoid(fgate_preact)  # (B, NH, S, 1)
+    keys_scaled = keys / math.sqrt(DH)
+    if pad:
+        # padded timesteps neither decay (log forget gate 0) nor write (input gate -inf) the state
+        queries, keys_scaled, values = (
+            torch.nn.functional.pad(t, (0, 0, 0, pad)) for t in (queries, keys_scaled, values)
+        )
+        log_fgates = torch.nn.functional.pad(log_fgates, (0, 0, 0, pad), value=0.0)
+        igate_preact = torch.nn.functional.pad(igate_preact, (0, 0, 0, pad), value=-float("inf"))
+
+    q = queries.view(B, NH, NC, L, DH)
+    k = keys_scaled.view(B, NH, NC, L, DH)
+    v = values.view(B, NH, NC, L, DH)
+    igates = igate_preact.view(B, NH, NC, L, 1)
+    log_fgates_cumsum = torch.cumsum(log_fgates.view(B, NH, NC, L, 1), dim=-2)  # (B, NH, NC, L, 1)
+    log_fgates_chunk = log_fgates_cumsum[..., -1:, :]  # (B, NH, NC, 1, 1)
+
+    # intra chunk gate decay matrix, entry (t, s) = sum_{s < r <= t} log f_r + i_s for s <= t
+    ltr = torch.tril(torch.ones((L, L), dtype=torch.bool, device=_device))
+    log_D_matrix = torch.where(
+        ltr, log_fgates_cumsum - log_fgates_cumsum.transpose(-2, -1) + igates.transpose(-2, -1), -float("inf")
+    )  # (B, NH, NC, L, L)
+
+    # chunk local states, stabilized by their own maximum
+    log_w_state = log_fgates_chunk - log_fgates_cumsum + igates  # (B, NH, NC, L, 1)
+    max_log_w_state = torch.max(log_w_state, dim=-2, keepdim=True)[0]  # (B, NH, NC, 1, 1)
+    w_state = torch.exp(log_w_state - max_log_w_state)
+    c_chunk = (k * w_state).transpose(-2, -1) @ v  # (B, NH, NC, DH, DH)
+    n_chunk = (k * w_state).sum(dim=-2).unsqueeze(-1)  # (B, NH, NC, DH, 1)
+
+    # states at the chunk borders, this is the only sequential part
+    if initial_state is None:
+        c_state = torch.zeros((B, NH, DH, DH), dtype=_dtype, device=_device)
+        n_state = torch.zeros((B, NH, DH, 1), dtype=_dtype, device=_device)
+        m_state = torch.full((B, NH, 1, 1), -float("inf"), dtype=_dtype, device=_device)
+    else:
+        c_state, n_state, m_state = initial_state
+    c_states, n_states, m_states = [], [], []
+    for chunk_idx in range(NC):
+        c_states.append(c_state)
+        n_states.append(n_state)
+        m_states.append(m_state)
+        log_fg = log_fgates_chunk[:, :, chunk_idx]
+        m_local = max_log_w_state[:, :, chunk_idx]
+        m_state_new = torch.maximum(log_fg + m_state, m_local)  # (B, NH, 1, 1)
+        fg_act = torch.exp(log_fg + m_state - m_state_new)
+        local_act = torch.exp(m_local - m_state_new)
+        c_state = fg_act * c_state + local_act * c_chunk[:, :, chunk_idx]
+        n_state = fg_act * n_state + local_act * n_chunk[:, :, chunk_idx]
+        m_state = m_state_new
+    c_states = torch.stack(c_states, dim=2)  # (B, NH, NC, DH, DH)
+    n_states = torch.stack(n_states, dim=2)  # (B, NH, NC, DH, 1)
+    m_states = torch.stack(m_states, dim=2)  # (B, NH, NC, 1, 1)
+
+    # rowwise stabilizer over the previous chunks (through the state) and the current chunk
+    log_w_inter = log_fgates_cumsum + m_states  # (B, NH, NC, L, 1)
+    max_log_D = torch.maximum(log_w_inter, torch.max(log_D_matrix, dim=-1, keepdim=True)[0])  # (B, NH, NC, L, 1)
+    w_inter = torch.exp(log_w_inter - max_log_D)
+    C_matrix = (q @ k.transpose(-2, -1)) * torch.exp(log_D_matrix - max_log_D)  # (B, NH, NC, L, L)
+
+    h_num = w_inter * (q @ c_states) + C_matrix @ v  # (B, NH, NC, L, DH)
+    qn_dotproduct = w_inter * (q @ n_states) + C_matrix.sum(dim=-1, keepdim=True)  # (B, NH, NC, L, 1)
+    normalizer = torch.maximum(qn_dotproduct.abs(), torch.exp(-max_log_D))
+    h_tilde_state = (h_num / (normalizer + eps)).view(B, NH, NC * L, DH)[:, :, :S]
+
+    if return_last_state:
+        return h_tilde_state, (c_state, n_state, m_state)
+    return h_tilde_state
+
+
+mlstm_backend_registry = {
+    "parallel": parallel_stabilized_simple,
+    "chunkwise": chunkwise_stabilized_simple,
+}
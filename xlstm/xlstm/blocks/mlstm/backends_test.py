@@ -0,0 +1,50 @@
+import unittest
+
+import torch
+
+from xlstm.blocks.mlstm.backends import chunkwise_stabilized_simple, parallel_stabilized_simple
+from xlstm.blocks.mlstm.layer import mLSTMLayer, mLSTMLayerConfig
+
+
+class TestChunkwiseBackend(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+        B, NH, S, DH = 2, 3, 37, 8
+        self.qkv = [torch.randn(B, NH, S, DH, dtype=torch.float64, requires_grad=True) for _ in range(3)]
+        self.igate_preact = (3.0 * torch.randn(B, NH, S, 1, dtype=torch.float64)).requires_grad_(True)
+        self.fgate_preact = (3.0 * torch.randn(B, NH, S, 1, dtype=torch.float64) + 2.0).requires_grad_(True)
+
+    def test_matches_parallel(self):
+        inputs = [*self.qkv, self.igate_preact, self.fgate_preact]
+        h_parallel = parallel_stabilized_simple(*inputs)
+        grad_out = torch.randn_like(h_parallel)
+        parallel_grads = torch.autograd.grad(h_parallel, inputs, grad_out)
+        # chunk sizes that do not divide the sequence length and one larger than the sequence
+        for chunk_size in [1, 4, 16, 64]:
+            h_chunkwise = chunkwise_stabilized_simple(*inputs, chunk_size=chunk_size)
+            self.assertTrue(torch.allclose(h_parallel, h_chunkwise, atol=1e-10))
+            chunkwise_grads = torch.autograd.grad(h_chunkwise, inputs, grad_out)
+            for parallel_grad, chunkwise_grad in zip(parallel_grads, chunkwise_grads):
+                self.assertTrue(torch.allclose(parallel_grad, chunkwise_grad, atol=1e-9))
+
+    def test_state_continuation(self):
+        inputs = [*self.qkv, self.igate_preact, self.fgate_preact]
+        h_parallel = parallel_stabilized_simple(*inputs)
+        h_first, state = chunkwise_stabilized_simple(
+            *(t[:, :, :20] for t in inputs), chunk_size=8, return_last_state=True
+        )
+        h_second = chunkwise_stabilized_simple(*(t[:, :, 20:] for t in inputs), chunk_size=8, initial_state=state)
+        self.assertTrue(torch.allclose(h_parallel, torch.cat((h_first, h_second), dim=2), atol=1e-10))
+
+    def test_layer(self):
+        config = dict(embedding_dim=16, num_heads=2, context_length=45)
+        parallel_layer = mLSTMLayer(mLSTMLayerConfig(**config)).to(torch.float64)
+        chunkwise_layer = mLSTMLayer(mLSTMLayerConfig(**config, backend="chunkwise", chunk_size=16)).to(torch.float64)
+        chunkwise_layer.load_state_dict(parallel_layer.state_dict())
+        self.assertIsNone(chunkwise_layer.mlstm_cell.causal_mask)
+        x = torch.randn(2, 45, 16, dtype=torch.float64)
+        self.assertTrue(torch.allclose(parallel_layer(x), chunkwise_layer(x), atol=1e-10))
+
+
+if __name__ == '__main__':
+    unittest.main()
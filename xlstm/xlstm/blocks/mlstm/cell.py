@@ -7,7 +7,7 @@ from torch import nn
 
 from ...components.init import bias_linspace_init_
 from ...components.ln import MultiHeadLayerNorm
-from .backends import parallel_stabilized_simple, recurrent_step_stabilized_simple
+from .backends import chunkwise_stabilized_simple, mlstm_backend_registry, recurrent_step_stabilized_simple
 
 
 @dataclass
@@ -15,6 +15,9 @@ class mLSTMCellConfig:
     context_length: int = -1
     embedding_dim: int = -1
     num_heads: int = -1
+    # 'parallel': quadratic in the sequence length, 'chunkwise': parallel within chunks of chunk_size timesteps
+    backend: str = "parallel"
+    chunk_size: int = 64
 
 
 class mLSTMCell(nn.Module):
@@ -24,7 +27,7 @@ class mLSTMCell(nn.Module):
         super().__init__()
         self.config = config
 
-        self.backend_fn = parallel_stabilized_simple
+        self.backend_fn = mlstm_backend_registry[config.backend]
         self.backend_fn_step = recurrent_step_stabilized_simple
 
         self.igate = nn.Linear(3 * config.embedding_dim, config.num_heads)
@@ -34,13 +37,24 @@ class mLSTMCell(nn.Module):
 
         self.register_buffer(
             "causal_mask",
-            torch.tril(torch.ones(config.context_length, config.context_length, dtype=torch.bool)),
+            # the chunkwise backend only needs a (chunk_size, chunk_size) mask, which it creates itself
+            torch.tril(torch.ones(config.context_length, config.context_length, dtype=torch.bool))
+            if config.backend == "parallel"
+            else None,
             persistent=False,
         )
 
         self.reset_parameters()
 
-    def forward(self, q: torch.Tensor, k: torch.Tensor, v: torch.Tensor, **kwargs) -> torch.Tensor:
+    def forward(
+        self,
+        q: torch.Tensor,
+        k: torch.Tensor,
+        v: torch.Tensor,
+        mlstm_state: tuple[torch.Tensor, torch.Tensor, torch.Tensor] = None,
+        return_last_state: bool = False,
+        **kwargs,
+    ) -> torch.Tensor:
         B, S, _ = q.shape  # (B, S, H)
 
         if_gate_input = torch.cat([q, k, v], dim=-1)
@@ -58,18 +72,34 @@ class mLSTMCell(nn.Module):
         fgate_preact = self.fgate(if_gate_input)  # (B, S, NH)
         fgate_preact = fgate_preact.transpose(-1, -2).unsqueeze(-1)  # (B, NH, S, 1)#
 
-        h_state = self.backend_fn(
-            queries=q,
-            keys=k,
-            values=v,
-            igate_preact=igate_preact,
-            fgate_preact=fgate_preact,
-            lower_triangular_matrix=self.causal_mask,
-        )  # (B, NH, S, DH)
+        if mlstm_state is None and not return_last_state:
+            h_state = self.backend_fn(
+                queries=q,
+                keys=k,
+                values=v,
+                igate_preact=igate_preact,
+                fgate_preact=fgate_preact,
+                lower_triangular_matrix=self.causal_mask,
+                chunk_size=self.config.chunk_size,
+            )  # (B, NH, S, DH)
+        else:
+            # the parallel form has no recurrent state, the chunkwise form computes the same and carries one
+            h_state, mlstm_state = chunkwise_stabilized_simple(
+                queries=q,
+                keys=k,
+                values=v,
+                igate_preact=igate_preact,
+                fgate_preact=fgate_preact,
+                chunk_size=self.config.chunk_size,
+                initial_state=mlstm_state,
+                return_last_state=True,
+            )  # (B, NH, S, DH), ((B, NH, DH, DH), (B, NH, DH, 1), (B, NH, 1, 1))
 
         h_state_norm = self.outnorm(h_state)  # (B, NH, S, DH)
         h_state_norm = h_state_norm.transpose(1, 2).reshape(B, S, -1)  # (B, NH, S, DH) -> (B, S, NH, DH) -> (B, S, H)
 
+        if return_last_state:
+            return h_state_norm, mlstm_state
         return h_state_norm
 
     def step(
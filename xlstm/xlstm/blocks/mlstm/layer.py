@@ -10,6 +10,7 @@ from ...components.init import small_init_init_, wang_init_
 from ...components.linear_headwise import (
     LinearHeadwiseExpand,
     LinearHeadwiseExpandConfig,
+    linear_headwise_expand_fused,
 )
 from ...utils import UpProjConfigMixin
 from .cell import mLSTMCell, mLSTMCellConfig
@@ -19,8 +20,15 @@ from .cell import mLSTMCell, mLSTMCellConfig
 class mLSTMLayerConfig(UpProjConfigMixin):
     conv1d_kernel_size: int = 4
     qkv_proj_blocksize: int = 4
+    # 'separate': one einsum per projection, else the mode of linear_headwise_expand_fused for all three
+    # ('grouped' or 'dense'). Whether a fused mode is faster depends on the shapes and the device, compare them
+    # with experiments/linear_headwise_benchmark.py
+    qkv_proj_mode: str = "separate"
     num_heads: int = 4
     proj_factor: float = 2.0
+    # mLSTM cell backend, see mLSTMCellConfig
+    backend: str = "parallel"
+    chunk_size: int = 64
 
     # will be set toplevel config
     embedding_dim: int = -1
@@ -84,6 +92,8 @@ class mLSTMLayer(nn.Module):
                 context_length=self.config.context_length,
                 embedding_dim=self.config._inner_embedding_dim,
                 num_heads=self.config.num_heads,
+                backend=self.config.backend,
+                chunk_size=self.config.chunk_size,
             )
         )
         self.ogate_act_fn = nn.SiLU()
@@ -98,7 +108,23 @@ class mLSTMLayer(nn.Module):
         self.dropout = nn.Dropout(self.config.dropout)
         self.reset_parameters()
 
-    def forward(self, x: torch.Tensor, **kwargs) -> torch.Tensor:
+    def _qkv_proj(self, x_qk: torch.Tensor, x_v: torch.Tensor) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        if self.config.qkv_proj_mode == "separate":
+            return self.q_proj(x_qk), self.k_proj(x_qk), self.v_proj(x_v)
+        return tuple(
+            linear_headwise_expand_fused(
+                [x_qk, x_qk, x_v], [self.q_proj, self.k_proj, self.v_proj], mode=self.config.qkv_proj_mode
+            )
+        )
+
+    def forward(
+        self,
+        x: torch.Tensor,
+        mlstm_state: tuple[torch.Tensor, torch.Tensor, torch.Tensor] = None,
+        conv_state: tuple[torch.Tensor] = None,
+        return_last_state: bool = False,
+        **kwargs,
+    ) -> torch.Tensor:
         B, S, _ = x.shape
 
         # up-projection
@@ -106,14 +132,20 @@ class mLSTMLayer(nn.Module):
         x_mlstm, z = torch.split(x_inner, split_size_or_sections=self.config._inner_embedding_dim, dim=-1)
 
         # mlstm branch
-        x_mlstm_conv = self.conv1d(x_mlstm)
+        if conv_state is not None or return_last_state:
+            x_mlstm_conv, conv_state = self.conv1d.forward_chunk(x_mlstm, conv_state=conv_state)
+        else:
+            x_mlstm_conv = self.conv1d(x_mlstm)
         x_mlstm_conv_act = self.conv_act_fn(x_mlstm_conv)
 
-        q = self.q_proj(x_mlstm_conv_act)
-        k = self.k_proj(x_mlstm_conv_act)
-        v = self.v_proj(x_mlstm)
+        q, k, v = self._qkv_proj(x_mlstm_conv_act, x_mlstm)
 
-        h_tilde_state = self.mlstm_cell(q=q, k=k, v=v)
+        if return_last_state:
+            h_tilde_state, mlstm_state = self.mlstm_cell(
+                q=q, k=k, v=v, mlstm_state=mlstm_state, return_last_state=True
+            )
+        else:
+            h_tilde_state = self.mlstm_cell(q=q, k=k, v=v, mlstm_state=mlstm_state)
 
         h_tilde_state_skip = h_tilde_state + (self.learnable_skip * x_mlstm_conv_act)
 
@@ -122,6 +154,8 @@ class mLSTMLayer(nn.Module):
 
         # down-projection
         y = self.dropout(self.proj_down(h_state))
+        if return_last_state:
+            return y, {"mlstm_state": mlstm_state, "conv_state": conv_state}
         return y
 
     def step(
@@ -140,9 +174,7 @@ class mLSTMLayer(nn.Module):
         x_mlstm_conv, conv_state = self.conv1d.step(x_mlstm, conv_state=conv_state)
         x_mlstm_conv_act = self.conv_act_fn(x_mlstm_conv)
 
-        q = self.q_proj(x_mlstm_conv_act)
-        k = self.k_proj(x_mlstm_conv_act)
-        v = self.v_proj(x_mlstm)
+        q, k, v = self._qkv_proj(x_mlstm_conv_act, x_mlstm)
 
         h_tilde_state, mlstm_state = self.mlstm_cell.step(q=q, k=k, v=v, mlstm_state=mlstm_state)
 
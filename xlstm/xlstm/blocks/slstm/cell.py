@@ -12,6 +12,7 @@ from torch.autograd.function import once_differentiable
 from .src.cuda_init import load
 from .src.vanilla import (
     slstm_forward,
+    slstm_forward_fast,
     slstm_forward_step,
     slstm_pointwise_function_registry,
 )
@@ -48,6 +49,10 @@ rnn_function_registry = {
     "slstm": {
         "states": 4,
     },
+    # compiled version of slstm, vanilla backends only
+    "slstm_compiled": {
+        "states": 4,
+    },
 }
 
 _python_dtype_to_cuda_dtype = {
@@ -65,7 +70,8 @@ class sLSTMCellConfig:
         4  # this must divide the hidden size, is not yet supported by all versions in this directory
     )
     num_states: int = 4  # this is for the sLSTM, a standard LSTM  has 2
-    backend: Literal["vanilla", "cuda"] = "cuda"
+    # 'vanilla_fast' is a restructured vanilla recurrence for CPU, see slstm_forward_fast
+    backend: Literal["vanilla", "vanilla_fast", "cuda"] = "cuda"
     # the type of function a cell computes
     function: str = "slstm"
     bias_init: Literal["powerlaw_blockdependent", "small_init", "standard"] = (
@@ -165,6 +171,10 @@ class sLSTMCellConfig:
         assert (
             self.function in rnn_function_registry
         ), f"RNN function {self.function} not in registry"
+        assert not self.function.endswith("_compiled") or self.backend in ("vanilla", "vanilla_fast"), (
+            f"RNN function {self.function} is torch.compile-based and only available for the vanilla backends, "
+            f"not backend {self.backend}; use {self.function.removesuffix('_compiled')} with backend {self.backend}"
+        )
         self.num_states = rnn_function_registry[self.function]["states"]
         if "initial_val" in rnn_function_registry[self.function]:
             self.initial_val = rnn_function_registry[self.function]["initial_val"]
@@ -676,6 +686,28 @@ class sLSTMCell_vanilla(sLSTMCellBase):
         )[0]
 
 
+class sLSTMCell_vanilla_fast(sLSTMCell_vanilla):
+    config_class = sLSTMCellConfig
+
+    def forward(self, input, state=None, lengths=None):
+        self._check_input(input)
+        input = self._permute_input(input)
+        states = self._get_state(input, state)
+        all_y, state, _ = slstm_forward_fast(
+            input,
+            states,
+            self._recurrent_kernel,
+            self._bias,
+            self.pointwise,
+            constants=self.config.constants,
+        )
+        output = self._permute_output(all_y)
+        if torch.is_autocast_enabled():
+            return output, state
+        else:
+            return output.to(input.dtype), state.to(input.dtype)
+
+
 class sLSTMCell_cuda(sLSTMCellBase):
     config_class = sLSTMCellConfig
 
@@ -780,7 +812,9 @@ class sLSTMCell(sLSTMCellBase):
             return sLSTMCell_cuda(config, skip_backend_init=skip_backend_init)
         elif config.backend == "vanilla":
             return sLSTMCell_vanilla(config)
+        elif config.backend == "vanilla_fast":
+            return sLSTMCell_vanilla_fast(config)
         else:
             raise RuntimeError(
-                f'sLSTMCell unknown backend {config.backend}, choose from ["cuda", "vanilla"]'
+                f'sLSTMCell unknown backend {config.backend}, choose from ["cuda", "vanilla", "vanilla_fast"]'
             )
@@ -0,0 +1,111 @@
+import contextlib
+import unittest
+
+import torch
+
+from xlstm.blocks.slstm.cell import sLSTMCell, sLSTMCellConfig
+from xlstm.blocks.slstm.src.vanilla import slstm_forward, slstm_forward_fast, slstm_pointwise_function_registry
+from xlstm.blocks.slstm.src.vanilla.compiled import compile_pointwise
+
+
+class TestVanillaFastBackend(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+        self.S, self.B, self.NH, self.DH = 13, 3, 2, 4
+        self.x = torch.randn(self.S, self.B, 4 * self.NH * self.DH, dtype=torch.float64, requires_grad=True)
+        self.R = (0.5 * torch.randn(self.NH, 4 * self.DH, self.DH, dtype=torch.float64)).requires_grad_(True)
+        self.b = torch.randn(4 * self.NH * self.DH, dtype=torch.float64, requires_grad=True)
+
+    def test_matches_vanilla(self):
+        for function, num_states in [("slstm", 4), ("lstm", 2)]:
+            pointwise = slstm_pointwise_function_registry[function]
+            states = torch.zeros(num_states, self.B, self.NH * self.DH, dtype=torch.float64)
+            states_all, last_state, g = slstm_forward(self.x, states, self.R, self.b, pointwise)
+            y_fast, last_state_fast, g_fast = slstm_forward_fast(
+                self.x, states, self.R, self.b, pointwise, return_gates=True
+            )
+            self.assertTrue(torch.allclose(states_all[0, 1:], y_fast, atol=1e-10))
+            self.assertTrue(torch.allclose(last_state, last_state_fast, atol=1e-10))
+            self.assertTrue(torch.allclose(g[:-1], g_fast, atol=1e-10))
+
+            grad_out = torch.randn_like(y_fast)
+            inputs = [self.x, self.R, self.b]
+            grads = torch.autograd.grad(states_all[0, 1:], inputs, grad_out)
+            grads_fast = torch.autograd.grad(y_fast, inputs, grad_out)
+            for grad, grad_fast in zip(grads, grads_fast):
+                self.assertTrue(torch.allclose(grad, grad_fast, atol=1e-9))
+
+    def test_skips_gates(self):
+        states = torch.zeros(4, self.B, self.NH * self.DH, dtype=torch.float64)
+        _, _, g = slstm_forward_fast(self.x, states, self.R, self.b, slstm_pointwise_function_registry["slstm"])
+        self.assertIsNone(g)
+
+    def test_cell(self):
+        config = dict(hidden_size=8, num_heads=2, dtype="float32", input_shape="SBGNH", output_shape="SBH")
+        vanilla_cell = sLSTMCell(sLSTMCellConfig(**config, backend="vanilla")).to(torch.float64)
+        fast_cell = sLSTMCell(sLSTMCellConfig(**config, backend="vanilla_fast")).to(torch.float64)
+        state_dict = {name: torch.randn_like(par) for name, par in vanilla_cell.state_dict().items()}
+        vanilla_cell.load_state_dict(state_dict)
+        fast_cell.load_state_dict(state_dict)
+        x = torch.randn(self.S, self.B, 32, dtype=torch.float64)
+        output, state = vanilla_cell(x)
+        output_fast, state_fast = fast_cell(x)
+        self.assertTrue(torch.allclose(output, output_fast, atol=1e-10))
+        self.assertTrue(torch.allclose(state, state_fast, atol=1e-10))
+
+
+class TestCompiledPointwise(unittest.TestCase):
+    def test_matches_eager(self):
+        torch.manual_seed(42)
+        B, H = 4, 16
+        eager = slstm_pointwise_function_registry["slstm"]
+        compiled = slstm_pointwise_function_registry["slstm_compiled"]
+        b = torch.randn(4 * H, requires_grad=True)
+        # the first step starts from zero states, the second from the states of the first
+        states = torch.zeros(4, B, H)
+        for _ in range(2):
+            Wx, Ry = torch.randn(B, 4 * H, requires_grad=True), torch.randn(B, 4 * H, requires_grad=True)
+            states_eager, gates_eager = eager(Wx, Ry, b, states, constants={})
+            states_compiled, gates_compiled = compiled(Wx, Ry, b, states, constants={})
+            self.assertTrue(torch.allclose(states_eager, states_compiled, atol=1e-6))
+            self.assertTrue(torch.allclose(gates_eager, gates_compiled, atol=1e-6))
+
+            grad_out = torch.randn_like(states_eager)
+            grads_eager = torch.autograd.grad(states_eager, [Wx, Ry, b], grad_out)
+            grads_compiled = torch.autograd.grad(states_compiled, [Wx, Ry, b], grad_out)
+            for grad_eager, grad_compiled in zip(grads_eager, grads_compiled):
+                self.assertTrue(torch.allclose(grad_eager, grad_compiled, atol=1e-5))
+            states = states_eager.detach()
+
+    def test_cell(self):
+        torch.manual_seed(42)
+        config = dict(hidden_size=8, num_heads=2, dtype="float32", input_shape="SBGNH", output_shape="SBH")
+        eager_cell = sLSTMCell(sLSTMCellConfig(**config, backend="vanilla_fast"))
+        compiled_cell = sLSTMCell(sLSTMCellConfig(**config, backend="vanilla_fast", function="slstm_compiled"))
+        state_dict = {name: torch.randn_like(par) for name, par in eager_cell.state_dict().items()}
+        eager_cell.load_state_dict(state_dict)
+        compiled_cell.load_state_dict(state_dict)
+        x = torch.randn(7, 2, 32)
+        self.assertTrue(torch.allclose(eager_cell(x)[0], compiled_cell(x)[0], atol=1e-5))
+
+    def test_falls_back_to_eager(self):
+        def graph_break_pointwise(Wx, Ry, b, states, constants):
+            # a no-op in eager mode, fullgraph compilation fails on it
+            torch._dynamo.graph_break()
+            return states * 2, Wx + Ry + b
+
+        pointwise = compile_pointwise(graph_break_pointwise)
+        for B in (2, 3):
+            Wx, Ry, b, states = torch.randn(B, 8), torch.randn(B, 8), torch.randn(8), torch.randn(4, B, 2)
+            with self.assertLogs(level="WARNING") if B == 2 else contextlib.nullcontext():
+                new_states, gates = pointwise(Wx, Ry, b, states, constants={})
+            self.assertTrue(torch.equal(new_states, states * 2))
+            self.assertTrue(torch.equal(gates, Wx + Ry + b))
+
+    def test_rejects_cuda_backend(self):
+        with self.assertRaisesRegex(AssertionError, "vanilla backends"):
+            sLSTMCellConfig(hidden_size=8, num_heads=2, backend="cuda", function="slstm_compiled")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -132,12 +132,11 @@ class sLSTMLayer(nn.Module):
         B, S, _ = x.shape
 
         if self.config.conv1d_kernel_size > 0:
-            if return_last_state:
-                x_conv, conv_state = self.conv1d(
-                    x, conv_state, return_last_state=return_last_state
-                )
+            if conv_state is not None or return_last_state:
+                # conv_state in the format of step
+                x_conv, conv_state = self.conv1d.forward_chunk(x, conv_state=conv_state)
             else:
-                x_conv = self.conv1d(x, conv_state, return_last_state=return_last_state)
+                x_conv = self.conv1d(x)
             x_conv = self.conv_act_fn(x_conv)
         else:
             x_conv = x
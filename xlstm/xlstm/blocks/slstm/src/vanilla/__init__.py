@@ -1,16 +1,19 @@
 # Copyright (c) NXAI GmbH and its affiliates 2023
 # Korbininan Pöppel
 
-from typing import Callable
+from typing import Callable, Optional
 import torch
 
 from .slstm import slstm_forward_pointwise as slstm_forward_pointwise_slstm
 from .lstm import slstm_forward_pointwise as slstm_forward_pointwise_lstm
+from .compiled import slstm_forward_pointwise_slstm_compiled
 
 
 slstm_pointwise_function_registry: dict[str, Callable] = {
     "slstm": slstm_forward_pointwise_slstm,
     "lstm": slstm_forward_pointwise_lstm,
+    # same function, elementwise ops fused by torch.compile
+    "slstm_compiled": slstm_forward_pointwise_slstm_compiled,
 }
 
 
@@ -127,3 +130,83 @@ def slstm_forward_step(
 
     # shapes ([S, B, H], ([B,H], [B,H], [B,H]), [S, B, 4*H])
     return states[:, None, ...], g[:, None, ...]
+
+
+def slstm_recurrent_kernel_dense(
+    R: torch.Tensor,  # [K, R*H, H] - K num_heads
+) -> torch.Tensor:
+    """
+    Lays out the headwise recurrent kernel as one block-diagonal [K*H, R*K*H] matrix,
+    with output columns in the gate-major order the pointwise functions expect.
+    One GEMM per timestep then replaces the per-step transpose / reshape of R.
+
+    >>> R = torch.randn(2, 4 * 3, 3)
+    >>> y = torch.randn(5, 2 * 3)
+    >>> Ry = y.view(5, 2, 1, 3).matmul(R.transpose(1, 2).reshape(1, 2, 3, 4 * 3)).view(5, 2, 4, 3)
+    >>> torch.allclose(y @ slstm_recurrent_kernel_dense(R), Ry.transpose(1, 2).reshape(5, -1), atol=1e-6)
+    True
+    """
+    num_heads, _, head_dim = R.shape
+    num_gates_r = R.shape[1] // head_dim
+    return (
+        torch.block_diag(*R.transpose(1, 2).unbind(dim=0))
+        .view(num_heads * head_dim, num_heads, num_gates_r, head_dim)
+        .transpose(1, 2)
+        .reshape(num_heads * head_dim, num_gates_r * num_heads * head_dim)
+    )
+
+
+def slstm_forward_fast(
+    x: torch.Tensor,  # [S, B, G*I]
+    states: torch.Tensor,  # [4, B, H] only the first is used for recurrence!
+    R: torch.Tensor,  # [K, R*H, H] - K num_heads
+    b: torch.Tensor,  # [T*H]
+    pointwise_forward: Callable[
+        tuple[torch.Tensor, torch.Tensor, torch.Tensor, torch.Tensor, dict[str, float]],
+        tuple[torch.Tensor, torch.Tensor],
+    ],
+    constants: dict[str, float] = {},
+    return_gates: bool = False,
+) -> tuple[torch.Tensor, torch.Tensor, Optional[torch.Tensor]]:
+    """
+    Same recurrence as `slstm_forward`, restructured for CPU:
+    the recurrent kernel is laid out once (see `slstm_recurrent_kernel_dense`),
+    only the hidden state history is kept (written into a preallocated [S, B, H] buffer)
+    while the remaining states are carried, the recurrence runs in the promoted dtype of
+    its inputs with a single cast at the end, and gates are only materialized on request.
+    """
+    sequence_dim, batch_dim = x.shape[0], x.shape[1]
+    num_states, _, hidden_dim = states.shape
+    num_gates_t = b.shape[0] // hidden_dim
+
+    assert batch_dim == states.shape[1]
+    assert hidden_dim == R.shape[0] * R.shape[2]
+
+    sdtype = states.dtype
+    cdtype = torch.promote_types(
+        torch.promote_types(x.dtype, b.dtype), torch.promote_types(R.dtype, sdtype)
+    )
+    R_dense = slstm_recurrent_kernel_dense(R).to(dtype=cdtype)
+    states = states.to(dtype=cdtype)
+
+    y_all = torch.empty(
+        [sequence_dim, batch_dim, hidden_dim], device=x.device, dtype=sdtype
+    )
+    g = (
+        torch.empty(
+            [sequence_dim, num_gates_t, batch_dim, hidden_dim],
+            device=x.device,
+            dtype=cdtype,
+        )
+        if return_gates
+        else None
+    )
+    for i, Wx_t in enumerate(x.unbind(dim=0)):
+        Ry = states[0].matmul(R_dense)
+        states, gates = pointwise_forward(Wx_t, Ry, b, states, constants=constants)
+        y_all[i] = states[0]
+        if g is not None:
+            g[i] = gates
+
+    # shapes ([S, B, H], [4, B, H], [S, 4, B, H] or None)
+    return y_all, states.to(dtype=sdtype), g
@@ -0,0 +1,68 @@
+# Copyright (c) NXAI GmbH and its affiliates 2023
+# Korbininan Pöppel
+
+import logging
+from typing import Callable
+
+import torch
+
+from .slstm import slstm_forward_pointwise as slstm_forward_pointwise_slstm
+
+LOGGER = logging.getLogger(__name__)
+
+
+def compile_pointwise(pointwise_forward: Callable) -> Callable:
+    """
+    Fuses the elementwise ops of a pointwise function into one kernel via torch.compile
+    (inductor also generates vectorized C++ kernels on CPU, no CUDA needed).
+    Compilation happens lazily. Every new input signature (shapes, dtypes, devices, requires_grad)
+    may recompile, so it is first run on copies of the inputs, including the backward pass if
+    gradients are needed. If this or any later call fails, e.g. without a C++ compiler, the eager
+    function is used from then on.
+    """
+    compiled = torch.compile(pointwise_forward, fullgraph=True, dynamic=None)
+    checked_signatures = set()
+
+    def fall_back(e: Exception):
+        nonlocal compiled
+        LOGGER.warning(f"Compiling {pointwise_forward.__module__} failed, using the eager version: {e}")
+        compiled = pointwise_forward
+
+    def check_signature(tensors: tuple[torch.Tensor, ...], constants: dict[str, float]):
+        needs_grad = torch.is_grad_enabled() and any(t.requires_grad for t in tensors)
+        signature = (
+            tuple((t.shape, t.dtype, t.device, t.requires_grad) for t in tensors),
+            tuple(sorted(constants.items())),
+            needs_grad,
+        )
+        if signature in checked_signatures:
+            return
+        copies = [t.detach().clone().requires_grad_(t.requires_grad) for t in tensors]
+        outputs = compiled(*copies, constants=constants)
+        if needs_grad:
+            inputs = [t for t in copies if t.requires_grad]
+            loss = sum(output.sum() for output in outputs if output.requires_grad)
+            torch.autograd.grad(loss, inputs, allow_unused=True)
+        checked_signatures.add(signature)
+
+    def compiled_pointwise_forward(
+        Wx: torch.Tensor,  # dim [B, 4*H]
+        Ry: torch.Tensor,  # dim [B, 4*H]
+        b: torch.Tensor,  # dim [1, 4*H]
+        states: torch.Tensor,  # dim [4, B, H]
+        constants: dict[str, float],
+    ) -> tuple[torch.Tensor, torch.Tensor]:
+        if compiled is not pointwise_forward:
+            try:
+                check_signature((Wx, Ry, b, states), constants)
+                return compiled(Wx, Ry, b, states, constants=constants)
+            except Exception as e:
+                fall_back(e)
+        return pointwise_forward(Wx, Ry, b, states, constants=constants)
+
+    return compiled_pointwise_forward
+
+
+# Only the sLSTM function is compiled: the compiled LSTM function was no faster than the eager one on CPU,
+# see experiments/slstm_pointwise_benchmark.py
+slstm_forward_pointwise_slstm_compiled = compile_pointwise(slstm_forward_pointwise_slstm)
@@ -22,10 +22,9 @@ def slstm_forward_pointwise(
     iraw, fraw, zraw, oraw = torch.unbind(raw.view(raw.shape[0], 4, -1), dim=1)
     # with torch.no_grad():  # THE difference to maxg aka max_gradient (here max / max_static)
     logfplusm = m + logsigmoid(fraw)
-    if torch.all(n == 0.0):
-        mnew = iraw
-    else:
-        mnew = torch.max(iraw, logfplusm)
+    # first step (all normalizers zero): the stabilizer is the input gate alone,
+    # selected on-device to avoid a host sync per timestep
+    mnew = torch.where(torch.all(n == 0.0), iraw, torch.max(iraw, logfplusm))
     ogate = torch.sigmoid(oraw)
     igate = torch.exp(iraw - mnew)
     fgate = torch.exp(logfplusm - mnew)
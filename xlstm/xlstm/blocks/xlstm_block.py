@@ -72,10 +72,16 @@ class xLSTMBlock(nn.Module):
 
         self.reset_parameters()
 
-    def forward(self, x: torch.Tensor, **kwargs) -> torch.Tensor:
-        x = x + self.xlstm(self.xlstm_norm(x), **kwargs)
+    def forward(self, x: torch.Tensor, return_last_state: bool = False, **kwargs) -> torch.Tensor:
+        if return_last_state:
+            x_xlstm, xlstm_state = self.xlstm(self.xlstm_norm(x), return_last_state=True, **kwargs)
+        else:
+            x_xlstm = self.xlstm(self.xlstm_norm(x), **kwargs)
+        x = x + x_xlstm
         if self.ffn is not None:
             x = x + self.ffn(self.ffn_norm(x), **kwargs)
+        if return_last_state:
+            return x, xlstm_state
         return x
 
     def step(self, x: torch.Tensor, **kwargs) -> tuple[torch.Tensor, dict[str, tuple[torch.Tensor, ...]]]:
@@ -128,6 +128,36 @@ class CausalConv1d(nn.Module):
         else:
             return y[:, :, : -self.pad].transpose(2, 1)
 
+    def forward_chunk(
+        self,
+        x: torch.Tensor,
+        conv_state: tuple[torch.Tensor] = None,
+    ) -> tuple[torch.Tensor, tuple[torch.Tensor]]:
+        """
+        Like `forward` for a chunk of any length, but continues from and returns
+        `conv_state` in the format of `step`, i.e. the last kernel_size inputs (B, KS, D).
+        """
+        if self.config.kernel_size == 0:
+            return x, conv_state
+
+        B, S, D = x.shape
+
+        if conv_state is None:
+            conv_state = (
+                torch.zeros(
+                    size=(B, self.config.kernel_size, D),
+                    device=self.conv.weight.device,
+                    dtype=self.conv.weight.dtype,
+                ),
+            )
+
+        # the oldest input of the step state is already outside the receptive field
+        y = self.forward(x, conv_state=conv_state[0][:, 1:].to(dtype=x.dtype))
+        conv_state = torch.cat([conv_state[0].to(dtype=x.dtype), x], dim=1)[
+            :, -self.config.kernel_size :
+        ]
+        return y, (conv_state,)
+
     def step(
         self,
         x: torch.Tensor,
@@ -1,6 +1,7 @@
 # Copyright (c) NXAI GmbH and its affiliates 2024
 # Maximilian Beck, Korbininan Pöppel
 from dataclasses import dataclass
+from typing import Literal, Sequence
 
 from math import sqrt
 import torch
@@ -90,3 +91,59 @@ class LinearHeadwiseExpand(nn.Module):
             f"trainable_weight={self.config.trainable_weight}, "
             f"trainable_bias={self.config.trainable_bias}, "
         )
+
+
+def linear_headwise_expand_fused(
+    xs: Sequence[torch.Tensor],
+    projs: Sequence[LinearHeadwiseExpand],
+    mode: Literal["grouped", "dense"] = "grouped",
+) -> list[torch.Tensor]:
+    """Applies projs[i] to xs[i] for projections of the same shape (e.g. q, k and v) with a single matmul launch.
+
+    grouped: the inputs are laid out head-contiguous and all heads of all projections are one batched matmul.
+    dense: every projection is expanded into its block-diagonal (in_features, out_features) matrix and all
+        projections are one batched matmul. This wastes num_heads times the FLOPs, but is faster for tiny heads.
+
+    Args:
+        xs (Sequence[torch.Tensor]): P inputs of the same shape (..., in_features)
+        projs (Sequence[LinearHeadwiseExpand]): P projections with the same in_features, num_heads and _out_features
+
+    Returns:
+        list[torch.Tensor]: P outputs (..., _out_features)
+    """
+    config = projs[0].config
+    assert all(
+        (proj.config.in_features, proj.config.num_heads, proj.config._out_features)
+        == (config.in_features, config.num_heads, config._out_features)
+        for proj in projs
+    ), "all projections must have the same shape"
+    assert all((proj.bias is None) == (projs[0].bias is None) for proj in projs), "either all or no projections have a bias"
+    P, H = len(projs), config.num_heads
+    d_in, d_out = config.in_features // H, config._out_features // H
+
+    batch_shape = xs[0].shape[:-1]
+    x = torch.stack(xs).view(P, -1, config.in_features)  # (P, N, in_features)
+    N = x.shape[1]
+    weight = torch.stack([proj.weight for proj in projs])  # (P, H, d_out, d_in)
+    bias = torch.stack([proj.bias for proj in projs]) if projs[0].bias is not None else None  # (P, out_features)
+
+    if mode == "grouped":
+        x = x.view(P, N, H, d_in).transpose(1, 2).reshape(P * H, N, d_in)
+        weight = weight.view(P * H, d_out, d_in).transpose(1, 2)  # (P*H, d_in, d_out)
+        if bias is None:
+            y = torch.bmm(x, weight)
+        else:
+            y = torch.baddbmm(bias.view(P * H, 1, d_out), x, weight)
+        y = y.view(P, H, N, d_out).transpose(1, 2)  # (P, N, H, d_out)
+    elif mode == "dense":
+        eye = torch.eye(H, dtype=weight.dtype, device=weight.device)
+        weight = torch.einsum("phoi,hg->phigo", weight, eye).reshape(P, config.in_features, config._out_features)
+        if bias is None:
+            y = torch.bmm(x, weight)
+        else:
+            y = torch.baddbmm(bias.unsqueeze(1), x, weight)
+    else:
+        raise ValueError(f"Unknown mode {mode}, choose from grouped, dense")
+
+    y = y.reshape(P, *batch_shape, config._out_features)
+    return list(y.unbind(0))
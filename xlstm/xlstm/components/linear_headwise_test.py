@@ -0,0 +1,55 @@
+import unittest
+
+import torch
+
+from xlstm.blocks.mlstm.layer import mLSTMLayer, mLSTMLayerConfig
+from xlstm.components.linear_headwise import (
+    LinearHeadwiseExpand,
+    LinearHeadwiseExpandConfig,
+    linear_headwise_expand_fused,
+)
+
+
+class TestLinearHeadwiseExpandFused(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+
+    def test_matches_separate(self):
+        for num_heads, bias in [(16, False), (4, True), (1, True)]:
+            projs = [
+                LinearHeadwiseExpand(LinearHeadwiseExpandConfig(in_features=64, num_heads=num_heads, bias=bias))
+                for _ in range(3)
+            ]
+            for proj in projs:
+                if proj.bias is not None:
+                    torch.nn.init.normal_(proj.bias)
+            xs = [torch.randn(2, 5, 64) for _ in range(3)]
+            expected = [proj(x) for proj, x in zip(projs, xs)]
+            for mode in ["grouped", "dense"]:
+                for y, y_expected in zip(linear_headwise_expand_fused(xs, projs, mode=mode), expected):
+                    self.assertEqual(y.shape, y_expected.shape)
+                    self.assertTrue(torch.allclose(y, y_expected, atol=1e-5))
+
+    def test_gradients(self):
+        projs = [LinearHeadwiseExpand(LinearHeadwiseExpandConfig(in_features=32, num_heads=8)) for _ in range(3)]
+        x = torch.randn(3, 7, 32, requires_grad=True)
+        params = [x] + [proj.weight for proj in projs]
+        grads = torch.autograd.grad(sum(proj(x).square().sum() for proj in projs), params)
+        for mode in ["grouped", "dense"]:
+            ys = linear_headwise_expand_fused([x, x, x], projs, mode=mode)
+            grads_fused = torch.autograd.grad(sum(y.square().sum() for y in ys), params)
+            for grad, grad_fused in zip(grads, grads_fused):
+                self.assertTrue(torch.allclose(grad, grad_fused, atol=1e-4))
+
+    def test_mlstm_layer(self):
+        config = dict(embedding_dim=16, num_heads=2, context_length=9)
+        separate_layer = mLSTMLayer(mLSTMLayerConfig(**config, qkv_proj_mode="separate"))
+        x = torch.randn(2, 9, 16)
+        for mode in ["grouped", "dense"]:
+            fused_layer = mLSTMLayer(mLSTMLayerConfig(**config, qkv_proj_mode=mode))
+            fused_layer.load_state_dict(separate_layer.state_dict())
+            self.assertTrue(torch.allclose(separate_layer(x), fused_layer(x), atol=1e-5))
+
+
+if __name__ == '__main__':
+    unittest.main()
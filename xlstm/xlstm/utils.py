@@ -3,11 +3,23 @@
 import math
 from abc import ABC
 from dataclasses import dataclass
-from typing import Sequence
+from typing import Callable, Sequence
 
+import torch
 from torch import nn
 
 
+def map_state(state, fn: Callable[[torch.Tensor], torch.Tensor]):
+    """Applies `fn` to every tensor of a (nested) recurrent state of the language models."""
+    if state is None:
+        return None
+    if isinstance(state, torch.Tensor):
+        return fn(state)
+    if isinstance(state, dict):
+        return {key: map_state(value, fn) for key, value in state.items()}
+    return type(state)(map_state(value, fn) for value in state)
+
+
 @dataclass
 class UpProjConfigMixin:
     proj_factor: float = None  # will be overridden by subclasses
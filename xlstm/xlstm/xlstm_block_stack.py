@@ -113,13 +113,29 @@ class xLSTMBlockStack(nn.Module):
         if not isinstance(self.post_blocks_norm, nn.Identity):
             self.post_blocks_norm.reset_parameters()
 
-    def forward(self, x: torch.Tensor, **kwargs) -> torch.Tensor:
+    def forward(
+        self,
+        x: torch.Tensor,
+        state: dict[str, dict[str, tuple[torch.Tensor, ...]]] = None,
+        return_last_state: bool = False,
+        **kwargs,
+    ) -> torch.Tensor:
+        """The state has the format of `step`, so chunks can be processed with `forward` and `step` alternately."""
+        if state is None:
+            state = {}
+        new_state = {}
 
-        for block in self.blocks:
-            x = block(x, **kwargs)
+        for block_idx, block in enumerate(self.blocks):
+            block_state = state.get(f"block_{block_idx}", {})
+            if return_last_state:
+                x, new_state[f"block_{block_idx}"] = block(x, return_last_state=True, **block_state, **kwargs)
+            else:
+                x = block(x, **block_state, **kwargs)
 
         x = self.post_blocks_norm(x)
 
+        if return_last_state:
+            return x, new_state
         return x
 
     def step(
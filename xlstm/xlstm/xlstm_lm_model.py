@@ -7,7 +7,7 @@ import torch
 from torch import nn
 
 from .components.init import small_init_init_
-from .utils import WeightDecayOptimGroupMixin
+from .utils import WeightDecayOptimGroupMixin, map_state
 from .xlstm_block_stack import xLSTMBlockStack, xLSTMBlockStackConfig
 
 
@@ -46,11 +46,26 @@ class xLSTMLMModel(WeightDecayOptimGroupMixin, nn.Module):
         if not self.config.tie_weights:
             small_init_init_(self.lm_head.weight, dim=self.config.embedding_dim)
 
-    def forward(self, idx: torch.Tensor) -> torch.Tensor:
+    def forward(
+        self,
+        idx: torch.Tensor,
+        state: dict[str, dict[str, tuple[torch.Tensor, ...]]] = None,
+        return_last_state: bool = False,
+    ) -> torch.Tensor:
+        """
+        Processes idx: (batch_size, num_tokens) starting from `state` (a fresh sequence if None).
+        With return_last_state the state after the last token is returned as well, so a long sequence
+        can be fed in chunks, e.g. for truncated backpropagation through time (see `detach_state`).
+        """
         x = self.token_embedding(idx)
         x = self.emb_dropout(x)
-        x = self.xlstm_block_stack(x)
+        if return_last_state:
+            x, state = self.xlstm_block_stack(x, state=state, return_last_state=True)
+        else:
+            x = self.xlstm_block_stack(x, state=state)
         logits = self.lm_head(x)
+        if return_last_state:
+            return logits, state
         return logits
 
     def step(
@@ -62,6 +77,11 @@ class xLSTMLMModel(WeightDecayOptimGroupMixin, nn.Module):
         logits = self.lm_head(x)
         return logits, state
 
+    @staticmethod
+    def detach_state(state: dict[str, dict[str, tuple[torch.Tensor, ...]]]) -> dict:
+        """Cuts the autograd graph at the state, e.g. between chunks of truncated backpropagation through time."""
+        return map_state(state, torch.Tensor.detach)
+
     def _create_weight_decay_optim_groups(self, **kwargs) -> tuple[Sequence[nn.Parameter], Sequence[nn.Parameter]]:
         weight_decay, no_weight_decay = super()._create_weight_decay_optim_groups(**kwargs)
         # remove token embedding and add it to the correct group, accrording to the config
@@ -0,0 +1,58 @@
+import unittest
+
+import torch
+
+from xlstm.blocks.mlstm.block import mLSTMBlockConfig
+from xlstm.blocks.mlstm.layer import mLSTMLayerConfig
+from xlstm.blocks.slstm.block import sLSTMBlockConfig
+from xlstm.blocks.slstm.layer import sLSTMLayerConfig
+from xlstm.xlstm_lm_model import xLSTMLMModel, xLSTMLMModelConfig
+
+
+class TestxLSTMLMModelState(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(42)
+        config = xLSTMLMModelConfig(
+            mlstm_block=mLSTMBlockConfig(mlstm=mLSTMLayerConfig(num_heads=2, chunk_size=4)),
+            slstm_block=sLSTMBlockConfig(slstm=sLSTMLayerConfig(num_heads=2, backend="vanilla", dtype="float32")),
+            context_length=24,
+            num_blocks=2,
+            embedding_dim=16,
+            slstm_at=[1],
+            vocab_size=7,
+        )
+        self.model = xLSTMLMModel(config)
+        self.model.reset_parameters()
+        self.model = self.model.to(torch.float64).eval()
+        self.idx = torch.randint(0, 7, (3, 24))
+
+    def test_chunks_match_forward(self):
+        with torch.no_grad():
+            logits = self.model(self.idx)
+            state = None
+            chunk_logits = []
+            for start, end in [(0, 5), (5, 6), (6, 24)]:
+                logits_chunk, state = self.model(self.idx[:, start:end], state=state, return_last_state=True)
+                chunk_logits.append(logits_chunk)
+            self.assertTrue(torch.allclose(logits, torch.cat(chunk_logits, dim=1), atol=1e-10))
+
+    def test_step_continues_chunk(self):
+        with torch.no_grad():
+            logits = self.model(self.idx)
+            _, state = self.model(self.idx[:, :10], return_last_state=True)
+            step_logits = []
+            for t in range(10, self.idx.shape[1]):
+                logits_t, state = self.model.step(self.idx[:, t:t + 1], state)
+                step_logits.append(logits_t)
+            self.assertTrue(torch.allclose(logits[:, 10:], torch.cat(step_logits, dim=1), atol=1e-10))
+
+    def test_detach_state(self):
+        _, state = self.model(self.idx[:, :5], return_last_state=True)
+        self.assertTrue(state["block_0"]["mlstm_state"][0].requires_grad)
+        state = self.model.detach_state(state)
+        self.assertFalse(state["block_0"]["mlstm_state"][0].requires_grad)
+        self.assertFalse(state["block_1"]["slstm_state"].requires_grad)
+
+
+if __name__ == '__main__':
+    unittest.main()